@@ -0,0 +1,238 @@
+"""
+Asyncio File Operations
+=======================
+Asyncio-native versions of the backup, organizer and scanner exercises for
+use inside event-loop based services. Blocking syscalls run on a bounded
+thread pool, a fixed number of worker tasks take the work from a bounded
+queue, cancelling the awaiting task stops new work from being started, and
+progress can be followed as an async stream:
+
+    progress = asyncio.Queue()
+    task = asyncio.create_task(backup("source_files", "backup_files", progress=progress))
+    async for update in iter_progress(progress):
+        print(update)
+"""
+
+import os
+import time
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import copy_engine
+import organizer
+import tree_walker
+
+DEFAULT_CONCURRENCY = 8
+SCAN_BATCH = 256
+SCAN_QUEUE_BATCHES = 8
+
+# Marks listing errors travelling with scan() batches
+ERROR = "error"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """Return the shared, bounded executor used for blocking calls"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=DEFAULT_CONCURRENCY,
+                                           thread_name_prefix="async_ops")
+        return _executor
+
+async def run_blocking(func, *args, executor=None):
+    """Run a blocking function on the executor and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor or get_executor(), func, *args)
+
+async def iter_progress(progress):
+    """Yield progress updates from a queue until the operation finishes"""
+    while True:
+        update = await progress.get()
+        if update is None:
+            return
+        yield update
+
+def _report(progress, **update):
+    if progress is not None:
+        progress.put_nowait(update)
+
+async def _run_all(func, pairs, operation, concurrency, executor, progress):
+    """Run func(src, dst) over pairs on `concurrency` worker tasks.
+
+    A feeder task hands pairs to the workers through a small bounded queue,
+    so a million pairs cost a million queue items over time, not a million
+    tasks up front.
+    """
+    pending = asyncio.Queue(concurrency * 2)
+    total = len(pairs)
+    stats = {"files": 0, "bytes": 0, "errors": []}
+    start = time.perf_counter()
+    
+    async def feed():
+        for pair in pairs:
+            await pending.put(pair)
+        for _ in range(concurrency):
+            await pending.put(None)
+    
+    async def worker():
+        while True:
+            pair = await pending.get()
+            if pair is None:
+                return
+            src, dst = pair
+            try:
+                size, _ = await run_blocking(func, src, dst, executor=executor)
+            except OSError as e:
+                stats["errors"].append((src, dst, e))
+                continue
+            stats["files"] += 1
+            stats["bytes"] += size
+            _report(progress, operation=operation, path=dst, done=stats["files"], total=total)
+    
+    tasks = [asyncio.ensure_future(feed())]
+    tasks.extend(asyncio.ensure_future(worker()) for _ in range(concurrency))
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    finally:
+        _report(progress, operation=operation, finished=True,
+                done=stats["files"], total=total)
+        if progress is not None:
+            progress.put_nowait(None)
+    
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+def _list_files(source_dir):
+    return [entry.path for entry in tree_walker.iter_files(source_dir)]
+
+async def backup(source_dir, backup_dir, timestamp=None, concurrency=DEFAULT_CONCURRENCY,
+                 executor=None, progress=None):
+    """Copy every file under source_dir to backup_dir/<path>.<timestamp>"""
+    timestamp = timestamp or time.strftime("%Y%m%d_%H%M%S")
+    sources = await run_blocking(_list_files, source_dir, executor=executor)
+    
+    pairs = []
+    dirs = set()
+    for source_path in sources:
+        rel_path = os.path.relpath(source_path, source_dir)
+        backup_path = os.path.join(backup_dir, f"{rel_path}.{timestamp}")
+        dirs.add(os.path.dirname(backup_path))
+        pairs.append((source_path, backup_path))
+    for dir_path in sorted(dirs):
+        await run_blocking(os.makedirs, dir_path, 0o777, True, executor=executor)
+    
+    return await _run_all(copy_engine.copy_file, pairs, "backup", concurrency,
+                          executor, progress)
+
+async def organize(directory, classify=organizer.extension_category, executor=None,
+                   progress=None):
+    """Organize directory the way organizer.organize does, off the event loop
+
+    The plan is carried out by organizer.execute on one executor thread,
+    with its journal and without replacing existing files, and an
+    interrupted run is resumed. Cancelling stops after the current move and
+    leaves the journal, so the next run resumes. Returns execute()'s stats.
+    """
+    loop = asyncio.get_running_loop()
+    stop = threading.Event()
+    journal = await run_blocking(organizer.read_journal, directory, executor=executor)
+    if journal is None:
+        job = await run_blocking(organizer.plan, directory, classify, executor=executor)
+        start = 0
+    else:
+        job, start = journal
+    total = len(job["moves"])
+    done = start
+    
+    def on_move(src, dst):
+        # Runs on the executor thread
+        nonlocal done
+        done += 1
+        loop.call_soon_threadsafe(functools.partial(
+            _report, progress, operation="organize", path=dst, done=done, total=total))
+        if stop.is_set():
+            raise asyncio.CancelledError()
+    
+    def on_error(src, dst, error):
+        loop.call_soon_threadsafe(functools.partial(
+            _report, progress, operation="organize", path=src, error=error, done=done,
+            total=total))
+    
+    try:
+        stats = await run_blocking(organizer.execute, job, start, True, on_move, on_error,
+                                   executor=executor)
+    except asyncio.CancelledError:
+        stop.set()
+        raise
+    finally:
+        _report(progress, operation="organize", finished=True, done=done, total=total)
+        if progress is not None:
+            progress.put_nowait(None)
+    stats["resumed"] = journal is not None
+    return stats
+
+async def scan(top=".", max_depth=None, on_error=None, executor=None):
+    """Async generator over tree_walker.walk events.
+
+    The walk runs on the executor in batches; it pauses while the consumer
+    is behind and stops as soon as the generator is closed or cancelled.
+    Listing errors are passed to on_error(path, depth, error) on the loop.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=SCAN_QUEUE_BATCHES)
+    stop = threading.Event()
+    
+    def put(item):
+        # Block this worker thread until the consumer has room
+        future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        while not stop.is_set():
+            try:
+                future.result(timeout=0.1)
+                return True
+            except FutureTimeout:
+                continue
+        future.cancel()
+        return False
+    
+    def producer():
+        batch = []
+        try:
+            def report_error(path, depth, error):
+                batch.append((ERROR, depth, path, error))
+            
+            for event in tree_walker.walk(top, max_depth, report_error):
+                if stop.is_set():
+                    return
+                batch.append(event)
+                if len(batch) >= SCAN_BATCH:
+                    if not put(batch):
+                        return
+                    batch = []
+            if batch:
+                put(batch)
+        finally:
+            put(None)
+    
+    worker = loop.run_in_executor(executor or get_executor(), producer)
+    try:
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                break
+            for event in batch:
+                if event[0] == ERROR:
+                    if on_error is not None:
+                        on_error(event[2], event[1], event[3])
+                    continue
+                yield event
+    finally:
+        stop.set()
+        await worker
@@ -0,0 +1,200 @@
+"""
+Backup Archive
+==============
+Streams a whole backup run into one archive file instead of one loose file
+per source file. Files are cut into 1 MB chunks that are compressed with
+zlib on worker threads and written in order; an index of every file (with
+the offset of its first chunk) is appended at the end, followed by a fixed
+size trailer pointing at it:
+
+    MAGIC | chunk data ... | zlib(index records, one JSON line per file) | trailer
+
+Restoring one file reads the trailer and index, then needs a single seek
+to the file's data. Only a bounded number of chunks is in flight while
+writing, and the index is spooled to a temporary file, so memory does not
+grow with the number of files in a run.
+"""
+
+import os
+import json
+import time
+import zlib
+import struct
+import tempfile
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+import tree_walker
+
+MAGIC = b"BKARCH1\n"
+TRAILER = struct.Struct("<QQ8s")   # index offset, index size, magic
+TRAILER_MAGIC = b"BKINDEX1"
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_WORKERS = 4
+DEFAULT_LEVEL = 6
+ARCHIVE_NAME = "archive.bka"
+
+def _compress(data, level):
+    """Compress a chunk, keeping it raw if that is not smaller"""
+    packed = zlib.compress(data, level)
+    return packed if len(packed) < len(data) else data
+
+def _iter_chunks(source_paths, base_dir, on_error):
+    """Yield (record, chunk) per chunk of every file; record is set on the first"""
+    for source_path in source_paths:
+        try:
+            f = open(source_path, 'rb', buffering=0)
+        except OSError as e:
+            if on_error is not None:
+                on_error(source_path, 0, e)
+            continue
+        with f:
+            st = os.fstat(f.fileno())
+            record = {"path": os.path.relpath(source_path, base_dir).replace(os.sep, "/"),
+                      "size": st.st_size, "mode": st.st_mode & 0o7777,
+                      "mtime_ns": st.st_mtime_ns, "chunks": []}
+            chunk = f.read(CHUNK_SIZE)
+            yield record, chunk
+            while len(chunk) == CHUNK_SIZE:
+                chunk = f.read(CHUNK_SIZE)
+                if chunk:
+                    yield None, chunk
+
+def write_archive(source_paths, archive_path, base_dir, workers=DEFAULT_WORKERS,
+                  level=DEFAULT_LEVEL, on_file=None, on_error=None):
+    """Write source_paths (stored relative to base_dir) into one archive.
+
+    on_file(record) is called once a file is fully written. Returns a stats
+    dict with files, bytes_read, bytes_written and seconds.
+    """
+    start = time.perf_counter()
+    stats = {"files": 0, "bytes_read": 0, "bytes_written": 0}
+    tmp_path = f"{archive_path}.tmp"
+    index = zlib.compressobj(level)
+    max_in_flight = workers * 2
+    
+    with open(tmp_path, 'wb') as out, tempfile.TemporaryFile() as index_file:
+        out.write(MAGIC)
+        offset = len(MAGIC)
+        current = None
+        
+        def finish(record):
+            index_file.write(index.compress(json.dumps(record).encode() + b"\n"))
+            stats["files"] += 1
+            if on_file is not None:
+                on_file(record)
+        
+        def write_next():
+            nonlocal offset, current
+            record, raw_size, future = pending.popleft()
+            packed = future.result()
+            if record is not None:
+                if current is not None:
+                    finish(current)
+                record["offset"] = offset
+                current = record
+            out.write(packed)
+            current["chunks"].append([len(packed), raw_size])
+            offset += len(packed)
+            stats["bytes_read"] += raw_size
+        
+        pending = collections.deque()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for record, chunk in _iter_chunks(source_paths, base_dir, on_error):
+                if len(pending) >= max_in_flight:
+                    write_next()
+                pending.append((record, len(chunk), pool.submit(_compress, chunk, level)))
+            while pending:
+                write_next()
+        if current is not None:
+            finish(current)
+        
+        # Append the spooled index and the trailer that locates it
+        index_file.write(index.flush())
+        index_size = index_file.tell()
+        index_file.seek(0)
+        while True:
+            block = index_file.read(CHUNK_SIZE)
+            if not block:
+                break
+            out.write(block)
+        out.write(TRAILER.pack(offset, index_size, TRAILER_MAGIC))
+        stats["bytes_written"] = offset + index_size + TRAILER.size
+        out.flush()
+        os.fsync(out.fileno())
+    
+    os.replace(tmp_path, archive_path)
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+def iter_index(archive_path):
+    """Yield the index record of every file in an archive, in archive order"""
+    with open(archive_path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"not a backup archive: {archive_path}")
+        f.seek(-TRAILER.size, os.SEEK_END)
+        index_offset, index_size, magic = TRAILER.unpack(f.read(TRAILER.size))
+        if magic != TRAILER_MAGIC:
+            raise ValueError(f"truncated backup archive: {archive_path}")
+        f.seek(index_offset)
+        
+        decompressor = zlib.decompressobj()
+        remaining = index_size
+        tail = b""
+        while remaining > 0:
+            block = f.read(min(CHUNK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            lines = (tail + decompressor.decompress(block)).split(b"\n")
+            tail = lines.pop()
+            for line in lines:
+                yield json.loads(line)
+
+def find_record(archive_path, rel_path):
+    """Return the index record of rel_path, or None if it is not archived"""
+    rel_path = rel_path.replace(os.sep, "/")
+    for record in iter_index(archive_path):
+        if record["path"] == rel_path:
+            return record
+    return None
+
+def _extract(f, record, dest_path):
+    """Write one file from an open archive, then restore its mode and times"""
+    os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+    f.seek(record["offset"])
+    with open(dest_path, 'wb') as out:
+        for packed_size, raw_size in record["chunks"]:
+            packed = f.read(packed_size)
+            out.write(packed if packed_size == raw_size else zlib.decompress(packed))
+    os.chmod(dest_path, record["mode"])
+    os.utime(dest_path, ns=(record["mtime_ns"], record["mtime_ns"]))
+
+def restore_file(archive_path, rel_path, dest_path):
+    """Restore a single file from an archive"""
+    record = find_record(archive_path, rel_path)
+    if record is None:
+        raise FileNotFoundError(f"{rel_path} is not in {archive_path}")
+    with open(archive_path, 'rb') as f:
+        _extract(f, record, dest_path)
+    return record["size"]
+
+def restore_archive(archive_path, dest_dir):
+    """Restore every file of an archive under dest_dir, return the file count"""
+    count = 0
+    with open(archive_path, 'rb') as f:
+        for record in iter_index(archive_path):
+            _extract(f, record, os.path.join(dest_dir, *record["path"].split("/")))
+            count += 1
+    return count
+
+def backup_to_archive(source_dir, backup_dir, timestamp=None, workers=DEFAULT_WORKERS,
+                      level=DEFAULT_LEVEL, on_file=None, on_error=None):
+    """Archive every file under source_dir to backup_dir/archive.bka.<timestamp>"""
+    timestamp = timestamp or time.strftime("%Y%m%d_%H%M%S")
+    os.makedirs(backup_dir, exist_ok=True)
+    archive_path = os.path.join(backup_dir, f"{ARCHIVE_NAME}.{timestamp}")
+    source_paths = (entry.path for entry in tree_walker.iter_files(source_dir))
+    stats = write_archive(source_paths, archive_path, source_dir, workers, level,
+                          on_file, on_error)
+    return archive_path, stats
@@ -0,0 +1,197 @@
+"""
+Incremental Backup Index
+========================
+Remembers (path, size, mtime_ns, inode, hash) for every file of the previous
+backup run in a small SQLite database, so the next run only copies files whose
+stat changed and only hashes files whose stat cannot be trusted. Entries are
+looked up one by one and the paths seen by a run are collected in a temporary
+table, so memory use does not grow with the number of files.
+"""
+
+import os
+import time
+import shutil
+import sqlite3
+import hashlib
+
+import hashing
+
+INDEX_NAME = "backup_index.sqlite"
+BUFFER_SIZE = 1024 * 1024
+# Seen paths collected before they are inserted into the temporary table
+SEEN_BATCH = 10000
+
+# Files modified this close to the previous run's start may have changed
+# again after they were indexed without their mtime moving ("racily clean")
+RACY_WINDOW_NS = 2 * 1_000_000_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    ino INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    backup TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+def open_index(index_path):
+    """Open (and create if needed) the index database"""
+    conn = sqlite3.connect(index_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def lookup(conn, rel_path):
+    """Return (size, mtime_ns, ino, hash, backup) of one indexed file, or None.
+
+    Rows are read one primary key lookup at a time, so a run over two
+    million files never holds the whole previous index in memory.
+    """
+    return conn.execute("SELECT size, mtime_ns, ino, hash, backup FROM files "
+                        "WHERE path = ?", (rel_path,)).fetchone()
+
+def last_run_started(conn):
+    """Return the start time (ns) of the previous run, or 0"""
+    row = conn.execute("SELECT value FROM meta WHERE key = 'run_started_ns'").fetchone()
+    return row[0] if row else 0
+
+def iter_files(source_dir, on_error=None):
+    """Yield (relative_path, stat) for every regular file under source_dir.
+
+    Directories that cannot be listed and files that cannot be stat'ed
+    are passed to on_error(path, depth, error) and skipped.
+    """
+    stack = [(source_dir, 0)]
+    while stack:
+        path, depth = stack.pop()
+        try:
+            entries = os.scandir(path)
+        except OSError as e:
+            if on_error is not None:
+                on_error(path, depth, e)
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append((entry.path, depth + 1))
+                    elif entry.is_file(follow_symlinks=False):
+                        yield (os.path.relpath(entry.path, source_dir),
+                               entry.stat(follow_symlinks=False))
+                except OSError as e:
+                    if on_error is not None:
+                        on_error(entry.path, depth + 1, e)
+
+def copy_and_hash(source_path, backup_path):
+    """Copy a file while hashing it in the same pass, keep its metadata"""
+    digest = hashlib.sha256()
+    buf = bytearray(BUFFER_SIZE)
+    view = memoryview(buf)
+    os.makedirs(os.path.dirname(backup_path) or ".", exist_ok=True)
+    with open(source_path, 'rb', buffering=0) as src, open(backup_path, 'wb') as dst:
+        while True:
+            n = src.readinto(buf)
+            if not n:
+                break
+            digest.update(view[:n])
+            dst.write(view[:n])
+    shutil.copystat(source_path, backup_path)
+    return digest.hexdigest()
+
+def _under(rel_dir):
+    """Bounds of the paths inside rel_dir, for a range query"""
+    if rel_dir == ".":
+        return "", "\U0010ffff"
+    return rel_dir + os.sep, rel_dir + chr(ord(os.sep) + 1)
+
+def incremental_backup(source_dir, backup_dir, index_path=None, timestamp=None,
+                       on_error=None):
+    """Back up only what changed since the previous run.
+
+    Changed files are copied to backup_dir/<path>.<timestamp>. Returns a
+    stats dict with scanned, unchanged, hashed, copied, removed and errors
+    counts. Directories and files that cannot be read are passed to
+    on_error(path, depth, error) and keep their previous index entries;
+    the files copied so far are recorded even if the run is interrupted.
+    """
+    timestamp = timestamp or time.strftime("%Y%m%d_%H%M%S")
+    index_path = index_path or os.path.join(backup_dir, INDEX_NAME)
+    os.makedirs(backup_dir, exist_ok=True)
+    
+    run_started_ns = time.time_ns()
+    conn = open_index(index_path)
+    racy_after = last_run_started(conn) - RACY_WINDOW_NS
+    conn.execute("CREATE TEMP TABLE seen (path TEXT PRIMARY KEY) WITHOUT ROWID")
+    
+    stats = {"scanned": 0, "unchanged": 0, "hashed": 0, "copied": 0,
+             "removed": 0, "bytes_copied": 0, "errors": 0}
+    updates = []
+    seen = []
+    unreadable = []   # directories whose files keep their index entries
+    
+    def report_error(path, depth, error):
+        stats["errors"] += 1
+        if os.path.isdir(path):
+            unreadable.append(os.path.relpath(path, source_dir))
+        else:
+            seen.append((os.path.relpath(path, source_dir),))
+        if on_error is not None:
+            on_error(path, depth, error)
+    
+    finished = False
+    try:
+        for rel_path, st in iter_files(source_dir, report_error):
+            stats["scanned"] += 1
+            seen.append((rel_path,))
+            if len(seen) >= SEEN_BATCH:
+                conn.executemany("INSERT OR IGNORE INTO seen VALUES (?)", seen)
+                seen = []
+            source_path = os.path.join(source_dir, rel_path)
+            old = lookup(conn, rel_path)
+            
+            try:
+                if old is not None and old[:3] == (st.st_size, st.st_mtime_ns, st.st_ino):
+                    if st.st_mtime_ns < racy_after:
+                        stats["unchanged"] += 1
+                        continue
+                    # Same stat, but too recent to trust: compare contents
+                    stats["hashed"] += 1
+                    if hashing.hash_file(source_path) == old[3]:
+                        stats["unchanged"] += 1
+                        continue
+                
+                backup_path = os.path.join(backup_dir, f"{rel_path}.{timestamp}")
+                file_hash = copy_and_hash(source_path, backup_path)
+            except OSError as e:
+                # Keeps its old entry: it was seen, just not backed up again
+                stats["errors"] += 1
+                if on_error is not None:
+                    on_error(source_path, rel_path.count(os.sep) + 1, e)
+                continue
+            stats["copied"] += 1
+            stats["bytes_copied"] += st.st_size
+            updates.append((rel_path, st.st_size, st.st_mtime_ns, st.st_ino,
+                            file_hash, os.path.relpath(backup_path, backup_dir)))
+        finished = True
+    finally:
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                             updates)
+            if finished:
+                conn.executemany("INSERT OR IGNORE INTO seen VALUES (?)", seen)
+                for rel_dir in unreadable:
+                    conn.execute("INSERT OR IGNORE INTO seen SELECT path FROM files "
+                                 "WHERE path >= ? AND path < ?", _under(rel_dir))
+                stats["removed"] = conn.execute(
+                    "DELETE FROM files WHERE path NOT IN (SELECT path FROM seen)").rowcount
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('run_started_ns', ?)",
+                             (run_started_ns,))
+        conn.close()
+    return stats
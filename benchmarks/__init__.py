@@ -0,0 +1,10 @@
+"""
+Benchmarks
+==========
+Run a benchmark from the repository root, for example:
+
+    python -m benchmarks.dedup_backup
+
+benchmarks.suite times all the main paths on a generated tree and stores
+the results as JSON under benchmarks/results/.
+"""
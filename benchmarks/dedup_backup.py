@@ -0,0 +1,79 @@
+"""
+Benchmark: Deduplicating Backup vs shutil.copy2
+===============================================
+Backs the same synthetic tree (benchmarks.synthetic_tree, every file
+with its own random contents) up several times, once with the plain
+copy2 loop from exercise_1_file_backup and once with the chunk store,
+and compares bytes written and wall time.
+"""
+
+import os
+import sys
+import time
+import shutil
+import random
+import argparse
+import tempfile
+
+import chunk_store
+import tree_walker
+from benchmarks import synthetic_tree
+
+def touch_some(paths, fraction, seed):
+    """Append a few bytes to a fraction of the files"""
+    rng = random.Random(seed)
+    for path in rng.sample(paths, max(1, int(len(paths) * fraction))):
+        with open(path, 'ab') as f:
+            f.write(rng.randbytes(64))
+
+def copy2_run(paths, source_dir, backup_dir, run_id):
+    """The original exercise_1 loop: one full copy per file per run"""
+    written = 0
+    for path in paths:
+        rel = os.path.relpath(path, source_dir).replace(os.sep, "_")
+        shutil.copy2(path, os.path.join(backup_dir, f"{rel}.{run_id}"))
+        written += os.path.getsize(path)
+    return written
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    synthetic_tree.add_arguments(parser)
+    # Settled files (see the racy window of chunk_store) with their own contents
+    parser.set_defaults(files=500, depth=1, fanout=16, sizes=f"uniform:{32 * 1024}",
+                        age=3600, unique=True)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--change", type=float, default=0.01, help="fraction of files changed between runs")
+    args = parser.parse_args(argv)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        source_dir = os.path.join(tmp, "source")
+        copy_dir = os.path.join(tmp, "copy2")
+        store_dir = os.path.join(tmp, "store")
+        os.makedirs(copy_dir)
+        synthetic_tree.generate(source_dir, args.files, args.depth, args.fanout, args.sizes,
+                                args.seed, args.sparse, age=args.age, unique=args.unique)
+        paths = sorted(entry.path for entry in tree_walker.iter_files(source_dir))
+        
+        results = {"copy2": [0, 0.0], "chunk_store": [0, 0.0]}
+        for run in range(args.runs):
+            if run:
+                touch_some(paths, args.change, seed=run)
+            run_id = f"run{run:03d}"
+            
+            start = time.perf_counter()
+            results["copy2"][0] += copy2_run(paths, source_dir, copy_dir, run_id)
+            results["copy2"][1] += time.perf_counter() - start
+            
+            start = time.perf_counter()
+            _, stats = chunk_store.backup_files(paths, store_dir, source_dir, run_id)
+            results["chunk_store"][0] += stats["bytes_written"] + stats["manifest_bytes"]
+            results["chunk_store"][1] += time.perf_counter() - start
+    
+    print(f"{args.runs} runs over {args.files} files ({args.sizes} bytes), "
+          f"{args.change:.1%} changed per run")
+    print(f"{'engine':<12} {'bytes written':>15} {'wall time':>10}")
+    for name, (written, elapsed) in results.items():
+        print(f"{name:<12} {written:>15,} {elapsed:>9.2f}s")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+Benchmark: inotify vs Polling File Monitor
+==========================================
+Watches a synthetic tree (benchmarks.synthetic_tree) with each
+file_monitor backend and measures the latency from a write to its
+reported event, and the CPU time the monitor uses while the tree is idle.
+"""
+
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+import statistics
+
+import file_monitor
+import tree_walker
+from benchmarks import synthetic_tree
+
+def measure_latency(monitor, paths, writes):
+    """Write to random files one at a time, return latencies in ms"""
+    rng = random.Random(0)
+    latencies = []
+    for _ in range(writes):
+        path = rng.choice(paths)
+        start = time.perf_counter()
+        with open(path, 'a') as f:
+            f.write("x")
+        while True:
+            batch = monitor.wait(timeout=10)
+            if not batch:
+                break
+            if any(changed == path for _, changed in batch):
+                latencies.append((time.perf_counter() - start) * 1000)
+                break
+    return latencies
+
+def measure_idle_cpu(monitor, seconds):
+    """CPU seconds used by the monitor's wait loop over an idle tree"""
+    stop = threading.Event()
+    thread = threading.Thread(target=monitor.run, args=(lambda batch: None, stop.is_set))
+    start = time.process_time()
+    thread.start()
+    time.sleep(seconds)
+    stop.set()
+    thread.join()
+    return time.process_time() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    synthetic_tree.add_arguments(parser)
+    parser.set_defaults(files=20_000, depth=1, fanout=20)
+    parser.add_argument("--writes", type=int, default=20)
+    parser.add_argument("--idle", type=float, default=5.0, help="seconds of idle watching")
+    parser.add_argument("--poll-interval", type=float, default=1.0,
+                        help="poll interval of busy directories")
+    parser.add_argument("--max-poll-interval", type=float, default=60.0,
+                        help="poll interval of quiet directories")
+    args = parser.parse_args(argv)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        synthetic_tree.generate(tmp, args.files, args.depth, args.fanout, args.sizes,
+                                args.seed, args.sparse)
+        paths = sorted(entry.path for entry in tree_walker.iter_files(tmp))
+        print(f"Watching {len(paths)} files, {args.writes} writes, {args.idle:.0f}s idle")
+        print(f"{'backend':<10} {'setup':>8} {'p50 ms':>8} {'max ms':>8} {'idle CPU':>9}")
+        for backend in ("inotify", "polling"):
+            start = time.perf_counter()
+            try:
+                monitor = file_monitor.FileMonitor(tmp, backend=backend,
+                                                   poll_interval=args.poll_interval,
+                                                   max_poll_interval=args.max_poll_interval)
+            except OSError as e:
+                print(f"{backend:<10} unavailable: {e}")
+                continue
+            setup = time.perf_counter() - start
+            with monitor:
+                latencies = measure_latency(monitor, paths, args.writes)
+                cpu = measure_idle_cpu(monitor, args.idle)
+            cpu_share = cpu / args.idle
+            print(f"{backend:<10} {setup:>7.2f}s {statistics.median(latencies):>8.1f} "
+                  f"{max(latencies):>8.1f} {cpu_share:>8.1%}")
+
+if __name__ == "__main__":
+    sys.exit(main())
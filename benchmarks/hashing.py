@@ -0,0 +1,88 @@
+"""
+Benchmark: Hashing Service vs f.read()
+======================================
+Hashes a set of small files and one large file with the naive
+hashlib.sha256(f.read()) approach and with the hashing service (readinto
+buffer, mmap, process pool, HashCache), and reports MB/s. Files are read
+warm from the page cache after the first repeat; use --large-size 4096 for
+a multi-GB file.
+"""
+
+import os
+import sys
+import time
+import hashlib
+import argparse
+import tempfile
+
+import hashing
+
+def naive_hash(path):
+    """The obvious version: read the whole file into one bytes object"""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def make_file(path, size):
+    """Write size pseudo-random bytes in 1 MB blocks"""
+    block = os.urandom(1024 * 1024)
+    with open(path, 'wb') as f:
+        while size > 0:
+            f.write(block[:size])
+            size -= len(block)
+
+def best_of(repeat, func):
+    """Best wall time of running func repeat times"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def report(label, total_bytes, seconds):
+    print(f"  {label:<24} {total_bytes / (1024 * 1024) / seconds:>9.1f} MB/s  ({seconds:.3f}s)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--small-files", type=int, default=2000)
+    parser.add_argument("--small-size", type=int, default=64 * 1024, help="bytes per small file")
+    parser.add_argument("--large-size", type=int, default=512, help="large file size in MB")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--dir", default=None, help="where to create the files")
+    args = parser.parse_args(argv)
+    
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        small = []
+        for i in range(args.small_files):
+            path = os.path.join(tmp, f"small{i:06d}.bin")
+            make_file(path, args.small_size)
+            # Old enough to be outside the cache's racy window
+            os.utime(path, (time.time() - 60, time.time() - 60))
+            small.append(path)
+        large = os.path.join(tmp, "large.bin")
+        large_bytes = args.large_size * 1024 * 1024
+        make_file(large, large_bytes)
+        small_bytes = args.small_files * args.small_size
+        
+        print(f"{args.small_files} small files of {args.small_size} bytes")
+        report("f.read()", small_bytes,
+               best_of(args.repeat, lambda: [naive_hash(p) for p in small]))
+        report("hash_file (readinto)", small_bytes,
+               best_of(args.repeat, lambda: [hashing.hash_file(p) for p in small]))
+        report("hash_files (pool)", small_bytes,
+               best_of(args.repeat, lambda: list(hashing.hash_files(small, args.workers))))
+        
+        with hashing.HashCache() as cache:
+            list(hashing.hash_files(small, args.workers, cache))
+            report("hash_files (cached)", small_bytes,
+                   best_of(args.repeat, lambda: list(hashing.hash_files(small, 0, cache))))
+        
+        print(f"1 large file of {args.large_size} MB")
+        report("f.read()", large_bytes, best_of(args.repeat, lambda: naive_hash(large)))
+        report("hash_file (mmap)", large_bytes,
+               best_of(args.repeat, lambda: hashing.hash_file(large)))
+
+if __name__ == "__main__":
+    sys.exit(main())
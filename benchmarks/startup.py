@@ -0,0 +1,153 @@
+"""
+Startup Benchmark
+=================
+Times the command line entry points from process start to exit, for runs
+that do one small piece of work, and compares them with a bare interpreter:
+
+    python              python -c pass
+    fsctl_du            fsctl.py du on a small directory
+    fsctl_scan          fsctl.py scan
+    fsctl_find          fsctl.py find --ext .txt
+    fsctl_clean         fsctl.py clean of a one file directory
+    oops_section_1      oops.py 1
+    exercise_6          os_practice_exercises.py 6
+    reference_paths     os_module_reference.py paths
+
+Every case runs several times and the fastest run counts. One extra run
+with python -X importtime reports how much of it went to imports and the
+modules that cost the most, which is where startup regressions show up:
+
+    python -m benchmarks.startup --runs 20 --top 5
+
+The exercise scripts (oops_section_1, exercise_6, reference_paths) must
+reach their first work within TARGET_MS. fsctl is checked against its own
+FSCTL_TARGET_MS, since it also loads the parser for every subcommand and
+the daemon client before it can start. The run exits non-zero if any case
+misses its target.
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TARGET_MS = 30.0
+FSCTL_TARGET_MS = 75.0
+
+def _script(name, *args):
+    return [sys.executable, os.path.join(REPO, name), *args]
+
+def cases(work):
+    """{name: (argv, setup)}; setup() prepares work before every run"""
+    tree = os.path.join(work, "tree")
+    doomed = os.path.join(work, "doomed")
+    
+    def make_doomed():
+        os.makedirs(doomed, exist_ok=True)
+        with open(os.path.join(doomed, "file.txt"), 'w') as f:
+            f.write("x")
+    
+    return {
+        "python": ([sys.executable, "-c", "pass"], None),
+        "fsctl_du": (_script("fsctl.py", "du", tree), None),
+        "fsctl_scan": (_script("fsctl.py", "scan", tree), None),
+        "fsctl_find": (_script("fsctl.py", "find", tree, "--ext", ".txt"), None),
+        "fsctl_clean": (_script("fsctl.py", "clean", doomed), make_doomed),
+        "oops_section_1": (_script("oops.py", "1"), None),
+        "exercise_6": (_script("os_practice_exercises.py", "6"), None),
+        "reference_paths": (_script("os_module_reference.py", "paths"), None),
+    }
+
+def make_tree(tree, files=20):
+    """A small tree to run the commands on"""
+    os.makedirs(os.path.join(tree, "sub"))
+    for i in range(files):
+        with open(os.path.join(tree, "sub" if i % 2 else "", f"file{i}.txt"), 'w') as f:
+            f.write("x" * i)
+
+def run_once(argv, cwd, extra=()):
+    """Run argv once; return (seconds, stderr)"""
+    env = dict(os.environ)
+    env.pop("FSCTL_SOCKET", None)
+    env.pop("OS_METRICS", None)
+    start = time.perf_counter()
+    proc = subprocess.run([argv[0], *extra, *argv[1:]], cwd=cwd, env=env,
+                          stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                          stderr=subprocess.PIPE, text=True)
+    seconds = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(argv)} exited with {proc.returncode}:\n{proc.stderr}")
+    return seconds, proc.stderr
+
+def parse_importtime(stderr):
+    """Return (total import microseconds, [(self us, module), ...]) from -X importtime"""
+    total = 0
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except ValueError:
+            continue  # the header line
+        name = fields[2].rstrip()
+        if not name.startswith("  "):
+            total += cumulative_us  # top level imports include their children
+        modules.append((self_us, name.strip()))
+    modules.sort(reverse=True)
+    return total, modules
+
+def measure(argv, setup, cwd, runs):
+    """Return {"seconds": fastest run, "imports": seconds importing, "top": [...]}"""
+    best = None
+    for _ in range(runs):
+        if setup is not None:
+            setup()
+        seconds, _ = run_once(argv, cwd)
+        best = seconds if best is None else min(best, seconds)
+    if setup is not None:
+        setup()
+    _, stderr = run_once(argv, cwd, ("-X", "importtime"))
+    total, modules = parse_importtime(stderr)
+    return {"seconds": best, "imports": total / 1e6, "top": modules}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="runs per case (default: 10)")
+    parser.add_argument("--top", type=int, default=3,
+                        help="slowest imports to show per case (default: 3)")
+    parser.add_argument("--target", type=float, default=TARGET_MS,
+                        help=f"milliseconds to first work for the exercise scripts "
+                             f"(default: {TARGET_MS:g})")
+    parser.add_argument("--fsctl-target", type=float, default=FSCTL_TARGET_MS,
+                        help=f"milliseconds to first work for fsctl "
+                             f"(default: {FSCTL_TARGET_MS:g})")
+    parser.add_argument("--only", nargs="+", help="case names to run")
+    args = parser.parse_args(argv)
+    
+    failed = 0
+    with tempfile.TemporaryDirectory() as work:
+        make_tree(os.path.join(work, "tree"))
+        print(f"{'case':<18} {'wall':>8} {'imports':>8}")
+        for name, (command, setup) in cases(work).items():
+            if args.only and name not in args.only:
+                continue
+            result = measure(command, setup, work, args.runs)
+            wall_ms = result["seconds"] * 1000
+            verdict = ""
+            if name != "python":
+                target = args.fsctl_target if name.startswith("fsctl_") else args.target
+                verdict = "PASS" if wall_ms <= target else "FAIL"
+                failed += verdict == "FAIL"
+            print(f"{name:<18} {wall_ms:>6.1f}ms {result['imports'] * 1000:>6.1f}ms  {verdict}")
+            for self_us, module in result["top"][:args.top]:
+                print(f"{'':<20}{self_us / 1000:>6.1f}ms  {module}")
+    print(f"{failed} case(s) over target ({args.target:g}ms, fsctl {args.fsctl_target:g}ms)")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
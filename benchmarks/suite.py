@@ -0,0 +1,214 @@
+"""
+Benchmark Suite
+===============
+Generates a synthetic tree (see benchmarks.synthetic_tree) and times the
+main filesystem paths of the project on it:
+
+    scan                tree_walker.walk over the whole tree
+    render              tree_render.render of the tree in plain format to /dev/null
+    index               file_index.FileIndex.build
+    du                  disk_usage.du
+    backup_full         backup_index.incremental_backup, first run
+    backup_incremental  the same again with nothing changed
+    backup_archive      backup_archive.backup_to_archive
+    organize            organizer.organize on one flat directory
+    monitor_setup       stat_poller.StatPoller building its snapshots
+    monitor_poll        one poll of every directory with nothing changed
+    cleanup             fast_delete.remove_tree of the whole tree
+
+Results are written as JSON (to benchmarks/results/ unless --output is
+given; the directory is not tracked) together with the tree parameters,
+the git commit and the platform, so runs on different commits can be
+compared:
+
+    python -m benchmarks.suite --files 1000000 --root /dev/shm
+    python -m benchmarks.suite --compare benchmarks/results/<older>.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+
+import tree_walker
+import tree_render
+import file_index
+import disk_usage
+import backup_index
+import backup_archive
+import organizer
+import stat_poller
+import fast_delete
+from benchmarks import synthetic_tree
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+# Seconds the generated files are dated back, well past every racy window
+TREE_AGE = 3600
+
+def git_commit():
+    """Current commit of the repository, or None outside a git checkout"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True,
+                              cwd=os.path.dirname(RESULTS_DIR)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def timed(func):
+    """Run func once, return (seconds, result)"""
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+# Every benchmark returns {name: (seconds, entries handled)}
+
+def bench_scan(tree, work, params):
+    return {"scan": timed(lambda: sum(1 for _ in tree_walker.walk(tree)))}
+
+def bench_render(tree, work, params):
+    with open(os.devnull, 'w') as out:
+        seconds, stats = timed(lambda: tree_render.render(tree, out))
+    return {"render": (seconds, stats["files"] + stats["dirs"] + stats["other"])}
+
+def bench_index(tree, work, params):
+    return {"index": timed(lambda: len(file_index.FileIndex.build(tree)))}
+
+def bench_du(tree, work, params):
+    seconds, summary = timed(lambda: disk_usage.du(tree))
+    return {"du": (seconds, summary["files"] + summary["dirs"])}
+
+def bench_backup(tree, work, params):
+    backup_dir = os.path.join(work, "backup")
+    full, stats = timed(lambda: backup_index.incremental_backup(tree, backup_dir))
+    # The tree is generated with old mtimes (see TREE_AGE), so the second
+    # run trusts every file by stat instead of hashing it again
+    incremental, again = timed(lambda: backup_index.incremental_backup(tree, backup_dir))
+    archive, (_, archived) = timed(
+        lambda: backup_archive.backup_to_archive(tree, os.path.join(work, "archive")))
+    if again["hashed"]:
+        raise RuntimeError(f"incremental backup hashed {again['hashed']} unchanged files")
+    return {"backup_full": (full, stats["scanned"]),
+            "backup_incremental": (incremental, again["scanned"]),
+            "backup_archive": (archive, archived["files"])}
+
+def bench_organize(tree, work, params):
+    flat = os.path.join(work, "flat")
+    synthetic_tree.generate(flat, params["organize_files"], depth=0, sizes=params["sizes"],
+                            seed=params["seed"], sparse=params["sparse"], unique=params["unique"])
+    seconds, stats = timed(lambda: organizer.organize(flat))
+    return {"organize": (seconds, stats["moved"])}
+
+def bench_monitor(tree, work, params):
+    interval = 0.001
+    setup, poller = timed(lambda: stat_poller.StatPoller(tree, interval, interval))
+    # Every directory is due once the interval has passed, and rescheduled after it
+    time.sleep(interval)
+    poll, events = timed(poller.read)
+    if events:
+        raise RuntimeError(f"monitor reported {len(events)} changes in an unchanged tree")
+    files = poller.file_count()
+    poller.close()
+    return {"monitor_setup": (setup, files), "monitor_poll": (poll, files)}
+
+def bench_cleanup(tree, work, params):
+    seconds, stats = timed(lambda: fast_delete.remove_tree(tree))
+    return {"cleanup": (seconds, stats["files"] + stats["dirs"])}
+
+# In run order; cleanup deletes the tree and must stay last
+BENCHMARKS = {
+    "scan": bench_scan,
+    "render": bench_render,
+    "index": bench_index,
+    "du": bench_du,
+    "backup": bench_backup,
+    "organize": bench_organize,
+    "monitor": bench_monitor,
+    "cleanup": bench_cleanup,
+}
+
+def run(tree, work, params, only=None, on_result=None):
+    """Run the benchmarks (all, or those named in only); return {name: result}"""
+    results = {}
+    for group, func in BENCHMARKS.items():
+        if only and group not in only:
+            continue
+        for name, (seconds, entries) in func(tree, work, params).items():
+            results[name] = {"seconds": round(seconds, 6), "entries": entries,
+                             "entries_per_second": round(entries / seconds) if seconds else None}
+            if on_result is not None:
+                on_result(name, results[name])
+    return results
+
+def compare(old, new):
+    """Print the change of every benchmark present in both result files"""
+    for key, value in new["params"].items():
+        if old["params"].get(key) != value:
+            print(f"warning: {key} was {old['params'].get(key)!r}, now {value!r}")
+    print(f"{'benchmark':<20} {'before':>10} {'after':>10} {'change':>8}")
+    for name, result in new["results"].items():
+        before = old["results"].get(name)
+        if before is None or not before["seconds"]:
+            continue
+        change = result["seconds"] / before["seconds"] - 1
+        print(f"{name:<20} {before['seconds']:>9.3f}s {result['seconds']:>9.3f}s "
+              f"{change:>+7.1%}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    synthetic_tree.add_arguments(parser)
+    parser.add_argument("--organize-files", type=int, default=10_000,
+                        help="files in the flat directory for the organize benchmark")
+    parser.add_argument("--root", help="directory to work in (e.g. a tmpfs mount)")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS))
+    parser.add_argument("--output", help="result file (default: benchmarks/results/)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args(argv)
+    
+    # Every generator argument: results are only comparable for the same tree
+    params = {"files": args.files, "depth": args.depth, "fanout": args.fanout,
+              "sizes": args.sizes, "seed": args.seed, "sparse": args.sparse,
+              "age": args.age or TREE_AGE, "unique": args.unique,
+              "organize_files": args.organize_files}
+    with tempfile.TemporaryDirectory(dir=args.root) as work:
+        tree = os.path.join(work, "tree")
+        generated = synthetic_tree.generate(tree, params["files"], params["depth"],
+                                            params["fanout"], params["sizes"], params["seed"],
+                                            params["sparse"], age=params["age"],
+                                            unique=params["unique"])
+        print(f"Generated {generated['files']} files in {generated['dirs']} directories "
+              f"({generated['bytes']} bytes) in {generated['seconds']:.2f}s")
+        
+        def show(name, result):
+            print(f"{name:<20} {result['seconds']:>9.3f}s {result['entries']:>10} entries")
+        
+        results = run(tree, work, params, args.only, show)
+    
+    commit = git_commit()
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "params": params,
+        "results": results,
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d_%H%M%S')}-{commit or 'nogit'}.json"
+        output = os.path.join(RESULTS_DIR, name)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+Synthetic Tree Generator
+========================
+Creates a reproducible directory tree for benchmarks: a complete tree of
+the given depth and fan-out with the files spread evenly over all of its
+directories. Names, extensions and sizes come from a seeded random
+generator, so the same arguments always produce the same tree.
+
+Size distributions:
+
+    empty       every file is 0 bytes
+    fixed:N     every file is N bytes
+    small       uniform 0 - 16 KB
+    uniform:N   uniform N/2 - 3N/2 bytes, N on average
+    lognormal   median 4 KB, long tail, capped at 64 MB (typical home dir)
+
+Files are created relative to an open directory fd and filled from one
+shared random block. With sparse=True they are only truncated to size,
+which keeps huge trees cheap on tmpfs. With unique=True every file gets
+its own random bytes instead, for deduplicating tools that would
+otherwise find the shared block everywhere. With age=N every file gets an
+mtime N seconds in the past, so tools that distrust just-modified files
+(the racy window of backup_index) treat the tree as settled.
+
+    python -m benchmarks.synthetic_tree /mnt/tmpfs/tree --files 10000000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+EXTENSIONS = [".txt", ".md", ".csv", ".py", ".js", ".jpg", ".png", ".pdf", ".mp3",
+              ".mp4", ".zip", ".log", ""]
+BLOCK_SIZE = 1024 * 1024
+MAX_LOGNORMAL = 64 * 1024 * 1024
+
+O_DIRECTORY = getattr(os, "O_DIRECTORY", 0)
+
+def size_sampler(sizes, rng):
+    """Return a function giving the next file size for a distribution name"""
+    if sizes == "empty":
+        return lambda: 0
+    if sizes.startswith("fixed:"):
+        size = int(sizes.split(":", 1)[1])
+        return lambda: size
+    if sizes == "small":
+        return lambda: rng.randrange(16 * 1024 + 1)
+    if sizes.startswith("uniform:"):
+        mean = int(sizes.split(":", 1)[1])
+        return lambda: rng.randint(mean // 2, mean * 3 // 2)
+    if sizes == "lognormal":
+        return lambda: min(MAX_LOGNORMAL, int(rng.lognormvariate(8.3, 2.0)))
+    raise ValueError(f"unknown size distribution: {sizes}")
+
+def directories(depth, fanout):
+    """Relative paths of every directory of a complete tree, parents first"""
+    level = [""]
+    result = [""]
+    for _ in range(depth):
+        level = [os.path.join(parent, f"d{i:03d}") for parent in level for i in range(fanout)]
+        result.extend(level)
+    return result
+
+def _write_file(name, size, dir_fd, block, sparse, mtime_ns, rng=None):
+    fd = os.open(name, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644, dir_fd=dir_fd)
+    try:
+        if sparse:
+            os.ftruncate(fd, size)
+        else:
+            while size > 0:
+                data = block[:size] if rng is None else rng.randbytes(min(size, BLOCK_SIZE))
+                size -= os.write(fd, data)
+        if mtime_ns is not None:
+            os.utime(fd, ns=(mtime_ns, mtime_ns))
+    finally:
+        os.close(fd)
+
+def generate(root, files, depth=3, fanout=10, sizes="empty", seed=0, sparse=False,
+             on_progress=None, age=0, unique=False):
+    """Create the tree under root and return a stats dict.
+
+    on_progress(files_done) is called after every directory. With age,
+    files are dated that many seconds in the past.
+    """
+    start = time.perf_counter()
+    mtime_ns = time.time_ns() - int(age * 1e9) if age else None
+    rng = random.Random(seed)
+    next_size = size_sampler(sizes, rng)
+    block = random.Random(seed).randbytes(BLOCK_SIZE)
+    data_rng = random.Random(seed + 1) if unique else None
+    dir_paths = directories(depth, fanout)
+    per_dir, extra = divmod(files, len(dir_paths))
+    stats = {"files": 0, "dirs": len(dir_paths), "bytes": 0}
+    
+    os.makedirs(root, exist_ok=True)
+    for i, rel_dir in enumerate(dir_paths):
+        dir_path = os.path.join(root, rel_dir) if rel_dir else root
+        if rel_dir:
+            os.mkdir(dir_path)
+        dir_fd = os.open(dir_path, os.O_RDONLY | O_DIRECTORY)
+        try:
+            for _ in range(per_dir + (i < extra)):
+                name = f"f{stats['files']:08d}{rng.choice(EXTENSIONS)}"
+                size = next_size()
+                _write_file(name, size, dir_fd, block, sparse, mtime_ns, data_rng)
+                stats["files"] += 1
+                stats["bytes"] += size
+        finally:
+            os.close(dir_fd)
+        if on_progress is not None:
+            on_progress(stats["files"])
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+def add_arguments(parser):
+    """Tree shape options, shared with benchmarks.suite"""
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--fanout", type=int, default=10)
+    parser.add_argument("--sizes", default="empty",
+                        help="empty, fixed:N, small, uniform:N or lognormal (default: empty)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sparse", action="store_true",
+                        help="truncate files to size instead of writing data")
+    parser.add_argument("--age", type=float, default=0,
+                        help="date files this many seconds in the past")
+    parser.add_argument("--unique", action="store_true",
+                        help="give every file its own random contents")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("root", help="directory to create the tree in (must not exist)")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    if os.path.exists(args.root):
+        parser.error(f"{args.root} already exists")
+    
+    last = 0.0
+    
+    def progress(done):
+        nonlocal last
+        if time.monotonic() - last >= 0.5:
+            last = time.monotonic()
+            print(f"\r{done}/{args.files} files", end="", file=sys.stderr)
+    
+    stats = generate(args.root, args.files, args.depth, args.fanout, args.sizes, args.seed,
+                     args.sparse, progress, args.age, args.unique)
+    print(file=sys.stderr)
+    print(f"Created {stats['files']} files in {stats['dirs']} directories, "
+          f"{stats['bytes']} bytes in {stats['seconds']:.2f}s")
+
+if __name__ == "__main__":
+    sys.exit(main())
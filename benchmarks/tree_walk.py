@@ -0,0 +1,108 @@
+"""
+Benchmark: scandir Walker vs listdir Scanner
+===========================================
+Builds a synthetic tree (benchmarks.synthetic_tree) and walks it with the
+original listdir + isfile + isdir + getsize scanner from exercise_3 and
+with tree_walker.walk, counting stat-type calls and wall time for each.
+"""
+
+import os
+import sys
+import time
+import argparse
+import contextlib
+import tempfile
+
+import tree_walker
+from benchmarks import synthetic_tree
+
+def listdir_scan(path, max_depth, current_depth=0):
+    """The original exercise_3 scan_directory, minus the printing"""
+    if current_depth > max_depth:
+        return 0
+    seen = 0
+    items = os.listdir(path)
+    files = []
+    dirs = []
+    for item in items:
+        item_path = os.path.join(path, item)
+        if os.path.isfile(item_path):
+            files.append(item)
+        elif os.path.isdir(item_path):
+            dirs.append(item)
+    for file in files:
+        os.path.getsize(os.path.join(path, file))
+        seen += 1
+    for dir_name in dirs:
+        seen += listdir_scan(os.path.join(path, dir_name), max_depth, current_depth + 1) + 1
+    return seen
+
+def walker_scan(path, max_depth):
+    """The same scan through tree_walker.walk"""
+    seen = 0
+    for kind, _, _, entry in tree_walker.walk(path, max_depth):
+        if kind == tree_walker.FILE:
+            entry.stat().st_size
+        seen += 1
+    return seen - 1
+
+COUNTED_CALLS = ("stat", "listdir", "scandir")
+
+@contextlib.contextmanager
+def count_calls():
+    """Count calls to os.stat, os.listdir and os.scandir while active"""
+    counts = dict.fromkeys(COUNTED_CALLS + ("DirEntry.stat",), 0)
+    originals = {name: getattr(os, name) for name in COUNTED_CALLS}
+    
+    def wrap(name, original):
+        def wrapper(*args, **kwargs):
+            counts[name] += 1
+            return original(*args, **kwargs)
+        return wrapper
+    
+    for name, original in originals.items():
+        setattr(os, name, wrap(name, original))
+    try:
+        yield counts
+    finally:
+        for name, original in originals.items():
+            setattr(os, name, original)
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    synthetic_tree.add_arguments(parser)
+    parser.add_argument("--max-depth", type=int, default=64)
+    parser.add_argument("--root", help="existing directory to create the tree in (e.g. on tmpfs)")
+    args = parser.parse_args(argv)
+    
+    with tempfile.TemporaryDirectory(dir=args.root) as tmp:
+        tree = os.path.join(tmp, "tree")
+        created = synthetic_tree.generate(tree, args.files, args.depth, args.fanout, args.sizes,
+                                          args.seed, args.sparse)
+        print(f"Created {created['files']} files in {created['dirs']} directories in {tree}")
+        
+        with count_calls() as listdir_calls:
+            seen_listdir, listdir_time = timed(listdir_scan, tree, args.max_depth)
+        
+        with count_calls() as walker_calls:
+            seen_walker, walker_time = timed(walker_scan, tree, args.max_depth)
+        # Each file's DirEntry.stat() is one stat syscall on POSIX
+        walker_calls["DirEntry.stat"] = sum(
+            1 for kind, *_ in tree_walker.walk(tree, args.max_depth) if kind == tree_walker.FILE)
+    
+    print(f"{'scanner':<10} {'entries':>10} {'stat':>10} {'DirEntry.stat':>14} "
+          f"{'listdir':>8} {'scandir':>8} {'wall time':>10}")
+    for name, seen, counter, elapsed in (
+            ("listdir", seen_listdir, listdir_calls, listdir_time),
+            ("scandir", seen_walker, walker_calls, walker_time)):
+        c = counter
+        print(f"{name:<10} {seen:>10} {c['stat']:>10} {c['DirEntry.stat']:>14} "
+              f"{c['listdir']:>8} {c['scandir']:>8} {elapsed:>9.2f}s")
+
+if __name__ == "__main__":
+    sys.exit(main())
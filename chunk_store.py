@@ -0,0 +1,213 @@
+"""
+Content-Addressed Chunk Store
+=============================
+Deduplicating backup storage: files are split into content-defined chunks,
+every chunk is stored once under its SHA-256 hash, and each backup run only
+writes a small JSON manifest describing how to rebuild its files. A file
+whose size and mtime match the previous run's manifest is not read again.
+"""
+
+import os
+import json
+import time
+import hashlib
+
+# Chunk size limits (bytes)
+MIN_CHUNK = 2 * 1024
+MAX_CHUNK = 64 * 1024
+READ_SIZE = 1024 * 1024
+
+# A chunk ends after RUN_LENGTH bytes in a row whose gear value has the
+# top bit set. Such a run appears every 2 ** (RUN_LENGTH + 1) - 2 bytes on
+# average (~8 KB), and depends only on the last RUN_LENGTH bytes.
+RUN_LENGTH = 12
+
+# Files changed this close to the previous run may have changed again
+# within the same mtime tick, so they are read again (as in backup_index)
+RACY_WINDOW_NS = 2 * 1_000_000_000
+
+def _gear_table():
+    """Build a fixed table of 256 pseudo-random 32-bit values"""
+    table = []
+    for value in range(256):
+        digest = hashlib.sha256(bytes([value])).digest()
+        table.append(int.from_bytes(digest[:4], "little"))
+    return table
+
+GEAR = _gear_table()
+# Every byte value to one bit, set for exactly half of them (the upper half
+# of the gear values), so the search for a run of set bits runs in
+# bytes.translate and bytes.find instead of a Python loop per byte
+GEAR_BITS = bytes(value >= sorted(GEAR)[128] for value in GEAR)
+RUN = b"\x01" * RUN_LENGTH
+
+def find_boundary(data, start, end):
+    """Return the offset where the chunk beginning at start should end"""
+    if end - start <= MIN_CHUNK:
+        return end
+    limit = min(end, start + MAX_CHUNK)
+    # A run may begin before the minimum size as long as it ends after it,
+    # so boundaries depend only on content and not on where we started
+    search_from = start + MIN_CHUNK - RUN_LENGTH + 1
+    bits = data[search_from:limit].translate(GEAR_BITS)
+    found = bits.find(RUN)
+    if found < 0:
+        return limit
+    return search_from + found + RUN_LENGTH
+
+def iter_chunks(f):
+    """Yield content-defined chunks from an open binary file"""
+    buf = b""
+    pos = 0
+    eof = False
+    
+    while True:
+        if not eof and len(buf) - pos < MAX_CHUNK:
+            block = f.read(READ_SIZE)
+            buf = buf[pos:] + block
+            pos = 0
+            eof = not block
+            continue
+        if pos >= len(buf):
+            return
+        cut = find_boundary(buf, pos, len(buf))
+        yield buf[pos:cut]
+        pos = cut
+
+def chunk_path(store_dir, digest):
+    """Return the on-disk path of a chunk"""
+    return os.path.join(store_dir, "chunks", digest[:2], digest)
+
+def store_chunk(store_dir, data):
+    """Store a chunk unless it already exists, return (digest, bytes_written)"""
+    digest = hashlib.sha256(data).hexdigest()
+    path = chunk_path(store_dir, digest)
+    if os.path.exists(path):
+        return digest, 0
+    
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return digest, len(data)
+
+def backup_file(store_dir, source_path):
+    """Chunk a single file into the store, return (entry, stats)"""
+    stats = {"bytes_read": 0, "bytes_written": 0, "chunks_new": 0, "chunks_reused": 0}
+    chunks = []
+    
+    with open(source_path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        for data in iter_chunks(f):
+            digest, written = store_chunk(store_dir, data)
+            chunks.append(digest)
+            stats["bytes_read"] += len(data)
+            stats["bytes_written"] += written
+            if written:
+                stats["chunks_new"] += 1
+            else:
+                stats["chunks_reused"] += 1
+    
+    entry = {
+        "size": st.st_size,
+        "mode": st.st_mode & 0o7777,
+        "mtime_ns": st.st_mtime_ns,
+        "chunks": chunks,
+    }
+    return entry, stats
+
+def _previous_files(store_dir):
+    """Entries of the latest run that can be trusted by stat, by name"""
+    runs = list_runs(store_dir)
+    if not runs:
+        return {}, 0
+    manifest = load_manifest(store_dir, runs[-1])
+    # Manifests written before started_ns was recorded are not trusted
+    return manifest["files"], manifest.get("started_ns", 0) - RACY_WINDOW_NS
+
+def backup_files(source_paths, store_dir, base_dir=".", run_id=None):
+    """Back up files into the store and write a manifest for this run.
+
+    Returns (manifest_path, stats). Files are recorded in the manifest by
+    their path relative to base_dir. A file with the size and mtime it had
+    in the previous run keeps that run's chunks without being read.
+    """
+    started_ns = time.time_ns()
+    run_id = run_id or time.strftime("%Y%m%d_%H%M%S")
+    manifest_dir = os.path.join(store_dir, "manifests")
+    os.makedirs(manifest_dir, exist_ok=True)
+    previous, trusted_before = _previous_files(store_dir)
+    
+    totals = {"files": 0, "files_unchanged": 0, "bytes_read": 0, "bytes_written": 0,
+              "chunks_new": 0, "chunks_reused": 0}
+    files = {}
+    for source_path in source_paths:
+        name = os.path.relpath(source_path, base_dir)
+        totals["files"] += 1
+        old = previous.get(name)
+        if old is not None:
+            st = os.stat(source_path)
+            if (st.st_size == old["size"] and st.st_mtime_ns == old["mtime_ns"]
+                    and st.st_mtime_ns < trusted_before):
+                files[name] = dict(old, mode=st.st_mode & 0o7777)
+                totals["files_unchanged"] += 1
+                totals["chunks_reused"] += len(old["chunks"])
+                continue
+        entry, stats = backup_file(store_dir, source_path)
+        files[name] = entry
+        for key, value in stats.items():
+            totals[key] += value
+    
+    manifest_path = write_manifest(store_dir, run_id, files, started_ns)
+    totals["manifest_bytes"] = os.path.getsize(manifest_path)
+    return manifest_path, totals
+
+def write_manifest(store_dir, run_id, files, started_ns=None):
+    """Atomically write the manifest of a backup run"""
+    manifest_path = os.path.join(store_dir, "manifests", f"{run_id}.json")
+    tmp_path = f"{manifest_path}.tmp{os.getpid()}"
+    manifest = {"run_id": run_id, "created": time.time(), "files": files}
+    if started_ns is not None:
+        manifest["started_ns"] = started_ns
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    os.replace(tmp_path, manifest_path)
+    return manifest_path
+
+def load_manifest(store_dir, run_id):
+    """Load the manifest of a backup run"""
+    manifest_path = os.path.join(store_dir, "manifests", f"{run_id}.json")
+    with open(manifest_path) as f:
+        return json.load(f)
+
+def list_runs(store_dir):
+    """Return the ids of all backup runs in the store, oldest first"""
+    manifest_dir = os.path.join(store_dir, "manifests")
+    if not os.path.isdir(manifest_dir):
+        return []
+    return sorted(name[:-5] for name in os.listdir(manifest_dir)
+                  if name.endswith(".json"))
+
+def restore_file(store_dir, entry, dest_path):
+    """Rebuild one file from its manifest entry"""
+    os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+    with open(dest_path, 'wb') as out:
+        for digest in entry["chunks"]:
+            with open(chunk_path(store_dir, digest), 'rb') as f:
+                out.write(f.read())
+    
+    os.chmod(dest_path, entry["mode"])
+    os.utime(dest_path, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+
+def restore_run(store_dir, run_id, dest_dir, names=None):
+    """Restore all files (or only the given names) of a backup run"""
+    manifest = load_manifest(store_dir, run_id)
+    restored = []
+    for name, entry in manifest["files"].items():
+        if names is not None and name not in names:
+            continue
+        dest_path = os.path.join(dest_dir, name)
+        restore_file(store_dir, entry, dest_path)
+        restored.append(dest_path)
+    return restored
@@ -0,0 +1,129 @@
+"""
+Disk Usage
+==========
+A streaming, du-style size calculator. One pass over the tree computes the
+recursive apparent size (st_size) and allocated size (st_blocks * 512) of
+every directory, counts hard-linked files once, and keeps only the top N
+largest directories in a bounded heap, so memory stays O(depth + N).
+"""
+
+import os
+import heapq
+
+BLOCK_SIZE = 512
+DEFAULT_TOP_N = 10
+
+def _allocated(st):
+    """Bytes allocated on disk for a stat result"""
+    blocks = getattr(st, "st_blocks", None)
+    return blocks * BLOCK_SIZE if blocks is not None else st.st_size
+
+def iter_usage(top=".", one_file_system=False, on_error=None):
+    """Yield (path, depth, apparent, allocated, files) per directory, post-order.
+
+    Each directory is reported once everything below it has been counted,
+    with totals that include its subdirectories, like `du`.
+    """
+    seen_links = set()
+    try:
+        top_st = os.stat(top)
+    except OSError as e:
+        if on_error is not None:
+            on_error(top, 0, e)
+        return
+    top_dev = top_st.st_dev
+    
+    def open_frame(path, depth, st):
+        # [path, depth, entries, apparent, allocated, files]
+        return [path, depth, os.scandir(path), st.st_size, _allocated(st), 0]
+    
+    try:
+        stack = [open_frame(top, 0, top_st)]
+    except OSError as e:
+        if on_error is not None:
+            on_error(top, 0, e)
+        return
+    
+    try:
+        while stack:
+            frame = stack[-1]
+            path, depth, entries = frame[0], frame[1], frame[2]
+            descended = False
+            for entry in entries:
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except OSError as e:
+                    if on_error is not None:
+                        on_error(entry.path, depth + 1, e)
+                    continue
+                
+                if entry.is_dir(follow_symlinks=False):
+                    if one_file_system and st.st_dev != top_dev:
+                        continue
+                    try:
+                        stack.append(open_frame(entry.path, depth + 1, st))
+                    except OSError as e:
+                        if on_error is not None:
+                            on_error(entry.path, depth + 1, e)
+                        continue
+                    descended = True
+                    break
+                
+                if st.st_nlink > 1:
+                    key = (st.st_dev, st.st_ino)
+                    if key in seen_links:
+                        continue
+                    seen_links.add(key)
+                frame[3] += st.st_size
+                frame[4] += _allocated(st)
+                frame[5] += 1
+            
+            if descended:
+                continue
+            
+            entries.close()
+            stack.pop()
+            yield path, depth, frame[3], frame[4], frame[5]
+            if stack:
+                parent = stack[-1]
+                parent[3] += frame[3]
+                parent[4] += frame[4]
+                parent[5] += frame[5]
+    finally:
+        # Only left non-empty when the consumer stops early
+        for frame in stack:
+            frame[2].close()
+
+def du(top=".", top_n=DEFAULT_TOP_N, one_file_system=False, on_dir=None, on_error=None):
+    """Summarize the disk usage of a tree.
+
+    on_dir(path, depth, apparent, allocated, files) is called for every
+    directory as it completes. Returns a dict with the totals and the
+    top_n largest directories by allocated size, largest first (none when
+    top_n <= 0).
+    """
+    largest = []
+    summary = {"apparent": 0, "allocated": 0, "files": 0, "dirs": 0}
+    for path, depth, apparent, allocated, files in iter_usage(top, one_file_system, on_error):
+        summary["dirs"] += 1
+        if on_dir is not None:
+            on_dir(path, depth, apparent, allocated, files)
+        if top_n > 0:
+            item = (allocated, apparent, path)
+            if len(largest) < top_n:
+                heapq.heappush(largest, item)
+            elif item > largest[0]:
+                heapq.heapreplace(largest, item)
+        if depth == 0:
+            summary["apparent"] = apparent
+            summary["allocated"] = allocated
+            summary["files"] = files
+    summary["largest"] = sorted(largest, reverse=True)
+    return summary
+
+def format_size(size):
+    """Format a byte count the way du -h would"""
+    for unit in ("B", "K", "M", "G", "T"):
+        if size < 1024 or unit == "T":
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
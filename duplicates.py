@@ -0,0 +1,235 @@
+"""
+Duplicate Finder
+================
+Finds files with identical contents in three narrowing stages:
+
+1. group files by size (a single stat per file, done while walking),
+2. hash the first and last 64 KB of every file whose size is shared,
+3. hash the whole file only where the partial hashes still collide.
+
+The walk spills (dev, inode, size, mtime, path) rows into a temporary SQLite
+file, so only one batch of same-size groups is ever held in memory. Hashing
+reads files through the hashing service on a process pool, and full hashes
+can be reused from a hashing.HashCache. Duplicates can then be replaced with
+hard links or reflinks; files whose stat no longer matches the walk are left
+alone, since their contents may have changed after they were hashed.
+"""
+
+import os
+import shutil
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+import hashing
+import copy_engine
+import tree_walker
+
+PARTIAL_SIZE = 64 * 1024
+BATCH_FILES = 4096
+MAP_CHUNKSIZE = 32
+
+HARDLINK = "hardlink"
+REFLINK = "reflink"
+
+SCHEMA = """
+CREATE TABLE files (
+    dev INTEGER NOT NULL,
+    ino INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    path TEXT NOT NULL
+);
+"""
+
+def partial_hash(job):
+    """Hash the first and last PARTIAL_SIZE bytes of (path, size).
+
+    Files no bigger than 2 * PARTIAL_SIZE are hashed whole. Returns the
+    hex digest, or the OSError raised while reading.
+    """
+    path, size = job
+    if size <= 2 * PARTIAL_SIZE:
+        ranges = [(0, size)]
+    else:
+        ranges = [(0, PARTIAL_SIZE), (size - PARTIAL_SIZE, size)]
+    try:
+        return hashing.hash_file(path, ranges=ranges)
+    except OSError as e:
+        return e
+
+def stamp(st):
+    """What must not change between hashing a file and linking it"""
+    return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+def _index_tree(conn, top, min_size, on_error):
+    """Record (dev, ino, size, mtime, path) of every regular file under top"""
+    def rows():
+        for kind, depth, _, entry in tree_walker.walk(top, on_error=on_error):
+            if kind != tree_walker.FILE:
+                continue
+            try:
+                # walk() reports symlinks to files as FILE, but lstat describes the link
+                if entry.is_symlink():
+                    continue
+                st = entry.stat(follow_symlinks=False)
+            except OSError as e:
+                if on_error is not None:
+                    on_error(entry.path, depth, e)
+                continue
+            if st.st_size >= min_size:
+                yield st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, entry.path
+    
+    with conn:
+        conn.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?)", rows())
+        conn.execute("CREATE INDEX by_size ON files (size, dev, ino)")
+
+def _iter_size_batches(conn):
+    """Yield (jobs, names, stamps) batches holding whole same-size groups.
+
+    jobs has one (path, size) per inode; names maps that path to every
+    name of the inode and stamps every name to its stamp() from the walk.
+    Sizes shared only by hard links are skipped.
+    """
+    cursor = conn.execute(
+        "SELECT path, size, dev, ino, mtime FROM files WHERE size IN "
+        "(SELECT size FROM (SELECT DISTINCT size, dev, ino FROM files) "
+        "GROUP BY size HAVING COUNT(*) > 1) ORDER BY size, dev, ino")
+    jobs = []
+    names = {}
+    stamps = {}
+    inode = None
+    for path, size, dev, ino, mtime in cursor:
+        stamps[path] = (dev, ino, size, mtime)
+        if (dev, ino) == inode:
+            names[jobs[-1][0]].append(path)
+            continue
+        if len(jobs) >= BATCH_FILES and jobs[-1][1] != size:
+            yield jobs, names, stamps
+            jobs = []
+            names = {}
+            stamps = {path: stamps[path]}
+        inode = (dev, ino)
+        jobs.append((path, size))
+        names[path] = [path]
+    if jobs:
+        yield jobs, names, stamps
+
+def _group(results, on_error):
+    """Group ((path, size), digest) pairs by (size, digest), keeping collisions"""
+    groups = {}
+    for job, digest in results:
+        if isinstance(digest, OSError):
+            if on_error is not None:
+                on_error(job[0], 0, digest)
+            continue
+        groups.setdefault((job[1], digest), []).append(job)
+    return [jobs for jobs in groups.values() if len(jobs) > 1]
+
+def _expand(jobs, names, stamps, seen):
+    """Turn one group of inodes into (size, [every name, sorted])"""
+    paths = sorted(name for path, _ in jobs for name in names[path])
+    if seen is not None:
+        for path in paths:
+            seen[path] = stamps[path]
+    return jobs[0][1], paths
+
+def find_duplicates(top=".", min_size=1, workers=None, on_error=None, db_path="",
+                    cache=None, seen=None):
+    """Yield (size, [paths]) for every set of files with identical contents.
+
+    A set spans at least two inodes; all hard-linked names are listed.
+
+    workers is the size of the hashing process pool (None for one per CPU,
+    0 to hash in this process). db_path holds the walk's spill table; the
+    default "" is an anonymous temporary file removed on close. Full hashes
+    are looked up in and added to cache, a hashing.HashCache, if given.
+    If seen is a dict, it gets the stamp() of every yielded path as it was
+    when walked, for link_duplicates to check before linking.
+    """
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    pool = ProcessPoolExecutor(workers) if workers != 0 else None
+    try:
+        _index_tree(conn, top, min_size, on_error)
+        for batch, names, stamps in _iter_size_batches(conn):
+            if pool is None:
+                partials = map(partial_hash, batch)
+            else:
+                partials = pool.map(partial_hash, batch, chunksize=MAP_CHUNKSIZE)
+            candidates = _group(zip(batch, partials), on_error)
+            full_jobs = []
+            for jobs in candidates:
+                if jobs[0][1] <= 2 * PARTIAL_SIZE:
+                    # The partial hash already covered the whole file
+                    yield _expand(jobs, names, stamps, seen)
+                else:
+                    full_jobs.extend(jobs)
+            sizes = dict(full_jobs)
+            digests = hashing.hash_files(sizes, workers=0, cache=cache, on_error=on_error,
+                                         executor=pool)
+            for jobs in _group((((path, sizes[path]), digest) for path, digest in digests),
+                               on_error):
+                yield _expand(jobs, names, stamps, seen)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        conn.close()
+
+def replace_with_link(original, duplicate, mode=HARDLINK):
+    """Atomically replace duplicate with a hard link or reflink of original"""
+    tmp_path = f"{duplicate}.dedup-tmp"
+    if mode == HARDLINK:
+        os.link(original, tmp_path)
+    elif mode == REFLINK:
+        copy_engine.clone_file(original, tmp_path)
+        # A reflink is a separate file: keep the duplicate's own metadata
+        shutil.copystat(duplicate, tmp_path)
+    else:
+        raise ValueError(f"unknown link mode: {mode}")
+    try:
+        os.replace(tmp_path, duplicate)
+    except OSError:
+        os.unlink(tmp_path)
+        raise
+
+def _changed(path, st, size, seen):
+    if seen is None:
+        return st.st_size != size
+    return stamp(st) != seen.get(path)
+
+def link_duplicates(groups, mode=HARDLINK, on_link=None, on_error=None, seen=None):
+    """Replace every file of each group but the first with a link to it.
+
+    groups is an iterable of (size, [paths]) as yielded by find_duplicates;
+    names already linked to the first file are left alone. seen is the dict
+    filled by find_duplicates: a file whose dev, inode, size or mtime no
+    longer match it may have changed since it was hashed and is skipped
+    (counted as "changed"). Without it only the size is compared.
+    on_link(original, duplicate, size) is called per replaced file and
+    on_error(duplicate, 0, error) per failure. Returns a stats dict.
+    """
+    stats = {"linked": 0, "bytes_saved": 0, "changed": 0, "errors": 0}
+    for size, paths in groups:
+        original = paths[0]
+        for duplicate in paths[1:]:
+            try:
+                st = os.stat(duplicate)
+                original_st = os.stat(original)
+                if os.path.samestat(st, original_st):
+                    continue   # already linked
+                if (_changed(duplicate, st, size, seen)
+                        or _changed(original, original_st, size, seen)):
+                    stats["changed"] += 1
+                    continue
+                replace_with_link(original, duplicate, mode)
+            except OSError as e:
+                stats["errors"] += 1
+                if on_error is not None:
+                    on_error(duplicate, 0, e)
+                continue
+            stats["linked"] += 1
+            if st.st_nlink == 1:
+                stats["bytes_saved"] += size   # that was its last name
+            if on_link is not None:
+                on_link(original, duplicate, size)
+    return stats
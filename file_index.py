@@ -0,0 +1,275 @@
+"""
+File Index
+==========
+Keeps the results of a tree scan in a compact columnar form instead of as
+lists of path strings and os.stat_result objects. Every entry is a row in
+typed arrays:
+
+    parent  int32   row of the containing directory (-1 for the root)
+    name    int32   id of the interned name
+    size    int64
+    mtime   int64   st_mtime_ns
+    mode    uint32  st_mode
+    ino     uint64
+
+which is 36 bytes per entry plus each distinct name stored once, so paths
+are rebuilt from parent pointers only when asked for. An index can be
+saved to a single file and loaded back through mmap without copying the
+columns. file_query answers find-style queries over an index.
+"""
+
+import os
+import stat
+import errno
+import time
+import mmap
+import struct
+from array import array
+
+import tree_walker
+import file_query
+
+MAGIC = b"FIDX0001"
+# magic, entries, names, name blob bytes, root bytes
+HEADER = struct.Struct("<8sQQQQ")
+
+# (attribute, array typecode) in file order
+COLUMNS = [
+    ("parent", "i"),
+    ("name", "i"),
+    ("size", "q"),
+    ("mtime", "q"),
+    ("mode", "I"),
+    ("ino", "Q"),
+]
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+class _NameTable:
+    """Read-only name list decoded on access from a saved index's blob"""
+    
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+    
+    def __len__(self):
+        return len(self.offsets) - 1
+    
+    def __getitem__(self, name_id):
+        return os.fsdecode(bytes(self.blob[self.offsets[name_id]:self.offsets[name_id + 1] - 1]))
+    
+    def __iter__(self):
+        return (self[name_id] for name_id in range(len(self)))
+
+class FileIndex:
+    """Columnar index of the entries under one root directory"""
+    
+    def __init__(self, root):
+        self.root = os.path.normpath(root)
+        for column, typecode in COLUMNS:
+            setattr(self, column, array(typecode))
+        self.names = []          # name id -> str
+        self.name_ids = {}       # str -> name id, only while building
+        self.dir_rows = {}       # directory path -> row, only while building
+        self._mmap = None
+    
+    @classmethod
+    def build(cls, top=".", max_depth=None, on_error=None, walk=tree_walker.walk):
+        """Scan a tree into a new index
+
+        walk can be another function producing tree_walker.walk events,
+        such as a TreeCache's walk.
+        """
+        index = cls(top)
+        for event in walk(top, max_depth, on_error):
+            try:
+                index.record(*event)
+            except OSError as e:
+                if on_error is not None:
+                    on_error(event[2], event[1], e)
+        index.finish()
+        return index
+    
+    def __len__(self):
+        return len(self.parent)
+    
+    def _intern(self, name):
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = self.name_ids[name] = len(self.names)
+            self.names.append(name)
+        return name_id
+    
+    def add(self, parent, name, st):
+        """Append one entry and return its row"""
+        row = len(self.parent)
+        self.parent.append(parent)
+        self.name.append(self._intern(name))
+        self.size.append(st.st_size)
+        self.mtime.append(st.st_mtime_ns)
+        self.mode.append(st.st_mode)
+        self.ino.append(st.st_ino)
+        return row
+    
+    def _parent_row(self, path):
+        row = self.dir_rows.get(path)
+        if row is None:
+            # Its directory could not be stat'ed and was reported already
+            raise OSError(errno.ENOENT, "parent directory is not in the index", path)
+        return row
+    
+    def record(self, kind, depth, path, entry):
+        """Add one tree_walker.walk event; OTHER entries are kept as well.
+
+        Raises OSError for an entry that cannot be added; the caller
+        reports it and goes on with the next event.
+        """
+        if kind == tree_walker.DIR:
+            st = os.stat(path, follow_symlinks=False)
+            if depth == 0:
+                # Children name the root as given ("fi/") and subdirectories
+                # through os.path.dirname ("fi"), so it is known by both
+                root = os.path.normpath(path)
+                self.dir_rows[path] = self.dir_rows[root] = self.add(-1, root, st)
+            else:
+                parent = self._parent_row(os.path.dirname(path))
+                self.dir_rows[path] = self.add(parent, os.path.basename(path), st)
+        else:
+            self.add(self._parent_row(path), entry.name, entry.stat(follow_symlinks=False))
+    
+    def finish(self):
+        """Drop the lookup tables only needed while building"""
+        self.name_ids = {}
+        self.dir_rows = {}
+    
+    def path(self, row):
+        """Rebuild the full path of a row from its parent pointers"""
+        parts = []
+        while row >= 0:
+            parts.append(self.names[self.name[row]])
+            row = self.parent[row]
+        return os.path.join(*reversed(parts))
+    
+    def is_dir(self, row):
+        return stat.S_ISDIR(self.mode[row])
+    
+    def refresh(self, rows):
+        """Stat the given rows again and update their columns.
+
+        An index does not notice a file rewritten in place; this brings
+        size, mtime, mode and ino of the rows a query depends on up to date.
+        Entries that are gone get mode 0, which no file type matches. The
+        columns of a loaded index are copied into memory first.
+        """
+        if isinstance(self.size, memoryview):
+            for column, typecode in COLUMNS:
+                values = getattr(self, column)
+                setattr(self, column, array(typecode, values))
+                values.release()
+        for row in rows:
+            try:
+                st = os.stat(self.path(row), follow_symlinks=False)
+            except OSError:
+                self.mode[row] = 0
+                continue
+            self.size[row] = st.st_size
+            self.mtime[row] = st.st_mtime_ns
+            self.mode[row] = st.st_mode
+            self.ino[row] = st.st_ino
+    
+    def nbytes(self):
+        """Bytes used by the columns and the name table"""
+        columns = sum(len(getattr(self, column)) * array(code).itemsize
+                      for column, code in COLUMNS)
+        return columns + sum(len(os.fsencode(name)) + 8 for name in self.names)
+    
+    def filter(self, extensions=None, min_size=None, max_size=None, older_than=None,
+               newer_than=None, files_only=True):
+        """Return the rows matching every given condition, as an array.
+
+        extensions is an iterable like (".txt", ".log"); sizes are in bytes,
+        ages in seconds before now. See file_query for more predicates.
+        """
+        now = time.time()
+        predicates = []
+        if files_only:
+            predicates.append(file_query.file_type("f"))
+        if extensions is not None:
+            predicates.append(file_query.extension(*extensions))
+        if min_size is not None or max_size is not None:
+            predicates.append(file_query.size_between(min_size, max_size))
+        if older_than is not None:
+            predicates.append(file_query.older_than(older_than, now))
+        if newer_than is not None:
+            predicates.append(file_query.newer_than(newer_than, now))
+        return file_query.select(self, *predicates)
+    
+    def save(self, index_path):
+        """Write the index to one file, atomically"""
+        blob = b"\0".join(os.fsencode(name) for name in self.names)
+        offsets = array("Q", [0])
+        for name in self.names:
+            offsets.append(offsets[-1] + len(os.fsencode(name)) + 1)
+        root = os.fsencode(self.root)
+        tmp_path = f"{index_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, len(self), len(self.names), len(blob), len(root)))
+            for column, _ in COLUMNS:
+                f.write(b"\0" * (_align(f.tell()) - f.tell()))
+                f.write(getattr(self, column).tobytes())
+            f.write(b"\0" * (_align(f.tell()) - f.tell()))
+            f.write(offsets.tobytes())
+            f.write(blob)
+            f.write(root)
+        os.replace(tmp_path, index_path)
+    
+    @classmethod
+    def load(cls, index_path):
+        """Map a saved index; its columns are read-only views of the file"""
+        with open(index_path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, entries, name_count, blob_size, root_size = HEADER.unpack_from(mapped)
+        if magic != MAGIC:
+            mapped.close()
+            raise ValueError(f"not a file index: {index_path}")
+        view = memoryview(mapped)
+        offset = HEADER.size
+        columns = {}
+        for column, typecode in COLUMNS:
+            offset = _align(offset)
+            size = entries * array(typecode).itemsize
+            columns[column] = view[offset:offset + size].cast(typecode)
+            offset += size
+        offset = _align(offset)
+        offsets = view[offset:offset + (name_count + 1) * 8].cast("Q")
+        offset += (name_count + 1) * 8
+        blob = view[offset:offset + blob_size]
+        root = os.fsdecode(mapped[offset + blob_size:offset + blob_size + root_size])
+        
+        index = cls(root)
+        for column, values in columns.items():
+            setattr(index, column, values)
+        index.names = _NameTable(blob, offsets)
+        index._mmap = mapped
+        return index
+    
+    def close(self):
+        """Release the mapping of a loaded index"""
+        if self._mmap is not None:
+            for column, typecode in COLUMNS:
+                values = getattr(self, column)
+                if isinstance(values, memoryview):
+                    values.release()
+                setattr(self, column, array(typecode))
+            self.names.offsets.release()
+            self.names.blob.release()
+            self.names = []
+            self._mmap.close()
+            self._mmap = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
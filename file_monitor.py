@@ -0,0 +1,321 @@
+"""
+File Monitor
+============
+Watches a directory tree for changes. On Linux it uses inotify through ctypes
+(no external service), adds watches for new subdirectories as they appear and
+coalesces bursts of events. Everywhere else, or when inotify cannot be used,
+it falls back to stat_poller, which polls each directory at an adaptive rate.
+
+Changes are reported as batches of (kind, path) tuples, where kind is one of
+CREATED, MODIFIED, DELETED or OVERFLOW, through a blocking callback loop
+(FileMonitor.run), a single wait (FileMonitor.wait) or an async iterator
+(async for batch in monitor).
+
+Every directory needs its own inotify watch. When the per-user limit
+(fs.inotify.max_user_watches) runs out, the monitor does not leave part
+of the tree unwatched: it switches to polling for the whole tree and
+reports OVERFLOW for the root, since changes may have been missed.
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import asyncio
+import ctypes
+import ctypes.util
+
+import tree_walker
+import stat_poller
+
+CREATED = stat_poller.CREATED
+MODIFIED = stat_poller.MODIFIED
+DELETED = stat_poller.DELETED
+OVERFLOW = "overflow"
+
+DEFAULT_COALESCE = 0.05
+DEFAULT_POLL_INTERVAL = 1.0
+
+# inotify event bits (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+
+EVENT_HEADER = struct.Struct("iIII")
+READ_SIZE = 64 * 1024
+
+_libc = None
+
+def _load_libc():
+    """Load libc and check that it has the inotify functions"""
+    global _libc
+    if _libc is None:
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        _libc = libc
+    return _libc
+
+def _check(result):
+    """Raise OSError for a failed libc call"""
+    if result < 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+    return result
+
+def coalesce(events):
+    """Merge a burst of (kind, path) events into one event per path"""
+    merged = {}
+    for kind, path in events:
+        if kind == OVERFLOW:
+            merged[path] = OVERFLOW
+            continue
+        previous = merged.get(path)
+        if previous is None or previous == OVERFLOW:
+            merged[path] = previous or kind
+        elif previous == CREATED:
+            if kind == DELETED:
+                del merged[path]   # created and gone again within the burst
+        elif previous == DELETED:
+            if kind == CREATED:
+                merged[path] = MODIFIED   # replaced
+        elif kind == DELETED:
+            merged[path] = DELETED
+    return [(kind, path) for path, kind in merged.items()]
+
+class InotifyBackend:
+    """Recursive inotify watcher for one directory tree.
+
+    Raises OSError(ENOSPC) when it runs out of watches, from the
+    constructor or from read(). Other directories that cannot be watched
+    or listed are passed to on_error(path, depth, error) and skipped.
+    """
+    
+    def __init__(self, root, on_error=None):
+        self.libc = _load_libc()
+        self.root = root
+        self.on_error = on_error
+        self.fd = _check(self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC))
+        self.paths = {}   # watch descriptor -> directory path
+        try:
+            self._watch_tree(root)
+        except OSError:
+            os.close(self.fd)
+            raise
+    
+    def fileno(self):
+        return self.fd
+    
+    def _watch_tree(self, top, events=None):
+        """Watch top and its subdirectories.
+
+        When events is a list, files found inside are reported as created:
+        they appeared in a new directory before its watch existed.
+        """
+        for kind, depth, path, entry in tree_walker.walk(top, on_error=self.on_error):
+            if kind == tree_walker.DIR:
+                wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path),
+                                                 WATCH_MASK | IN_ONLYDIR)
+                if wd < 0:
+                    err = ctypes.get_errno()
+                    error = OSError(err, os.strerror(err), path)
+                    # Out of watches: the rest of the tree would go unwatched too
+                    if err == errno.ENOSPC or (events is None and path == top):
+                        raise error
+                    if self.on_error is not None:
+                        self.on_error(path, depth, error)
+                    continue
+                self.paths[wd] = path
+            elif kind == tree_walker.FILE and events is not None:
+                events.append((CREATED, entry.path))
+    
+    def _unwatch_tree(self, top):
+        """Stop watching a directory that was moved away, and its subdirectories"""
+        prefix = os.path.join(top, "")
+        for wd, path in list(self.paths.items()):
+            if path == top or path.startswith(prefix):
+                del self.paths[wd]
+                self.libc.inotify_rm_watch(self.fd, wd)
+    
+    def read(self):
+        """Read all queued inotify events, return a list of (kind, path)"""
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, READ_SIZE)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                self._translate(wd, mask, os.fsdecode(name), events)
+    
+    def _translate(self, wd, mask, name, events):
+        """Turn one raw inotify event into (kind, path) events"""
+        if mask & IN_Q_OVERFLOW:
+            events.append((OVERFLOW, self.root))
+            return
+        dir_path = self.paths.get(wd)
+        if dir_path is None:
+            return
+        if mask & IN_IGNORED:
+            del self.paths[wd]
+            return
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            if dir_path == self.root:
+                events.append((DELETED, dir_path))
+            return
+        
+        path = os.path.join(dir_path, name)
+        if mask & (IN_CREATE | IN_MOVED_TO):
+            events.append((CREATED, path))
+            if mask & IN_ISDIR:
+                self._watch_tree(path, events)
+        elif mask & (IN_DELETE | IN_MOVED_FROM):
+            events.append((DELETED, path))
+            if mask & IN_MOVED_FROM and mask & IN_ISDIR:
+                self._unwatch_tree(path)
+        elif mask & (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE) and not mask & IN_ISDIR:
+            events.append((MODIFIED, path))
+    
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+class FileMonitor:
+    """Watch a directory tree and report coalesced batches of changes.
+
+    backend is "auto" (inotify when possible, else polling), "inotify" or
+    "polling". coalesce is how long to wait for a burst to settle. When
+    polling, poll_interval is the interval of the busiest directories and
+    max_poll_interval that of the quietest. Directories inotify cannot
+    watch are passed to on_error(path, depth, error); with backend "auto",
+    running out of inotify watches switches to polling instead.
+    """
+    
+    def __init__(self, root, backend="auto", coalesce=DEFAULT_COALESCE,
+                 poll_interval=DEFAULT_POLL_INTERVAL,
+                 max_poll_interval=stat_poller.DEFAULT_MAX_INTERVAL, on_error=None):
+        self.root = root
+        self.coalesce = coalesce
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.fallback = backend == "auto"
+        self.backend = None
+        if backend in ("auto", "inotify"):
+            try:
+                self.backend = InotifyBackend(root, on_error)
+            except OSError:
+                if backend == "inotify":
+                    raise
+        if self.backend is None:
+            self._start_polling()
+    
+    def _start_polling(self):
+        self.backend = stat_poller.StatPoller(self.root, self.poll_interval,
+                                              self.max_poll_interval)
+    
+    @property
+    def kind(self):
+        return "inotify" if isinstance(self.backend, InotifyBackend) else "polling"
+    
+    def _read(self):
+        """Read from the backend, switching to polling when inotify runs out of watches"""
+        try:
+            return self.backend.read()
+        except OSError as e:
+            if e.errno != errno.ENOSPC or not self.fallback:
+                raise
+        self.backend.close()
+        self._start_polling()
+        # Changes under directories that got no watch may have been missed
+        return [(OVERFLOW, self.root)]
+    
+    def wait(self, timeout=None):
+        """Block until changes arrive (or timeout), return one batch"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            fd = self.backend.fileno()
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if fd is not None:
+                ready, _, _ = select.select([fd], [], [], remaining)
+                if not ready:
+                    return []
+                time.sleep(self.coalesce)
+            else:
+                due = self.backend.time_until_due()
+                time.sleep(due if remaining is None else min(due, remaining))
+            batch = coalesce(self._read())
+            if batch or (deadline is not None and time.monotonic() >= deadline):
+                return batch
+    
+    def run(self, callback, stop=None):
+        """Call callback(batch) for every batch until stop() returns true"""
+        while stop is None or not stop():
+            batch = self.wait(timeout=self.poll_interval)
+            if batch:
+                callback(batch)
+    
+    async def events(self):
+        """Async generator of batches; waits without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        fd = None
+        try:
+            while True:
+                # The backend changes when inotify runs out of watches
+                if self.backend.fileno() != fd:
+                    if fd is not None:
+                        loop.remove_reader(fd)
+                    fd = self.backend.fileno()
+                    if fd is not None:
+                        loop.add_reader(fd, ready.set)
+                if fd is None:
+                    await asyncio.sleep(self.backend.time_until_due())
+                    batch = coalesce(await loop.run_in_executor(None, self._read))
+                else:
+                    await ready.wait()
+                    ready.clear()
+                    await asyncio.sleep(self.coalesce)
+                    batch = coalesce(self._read())
+                if batch:
+                    yield batch
+        finally:
+            if fd is not None:
+                loop.remove_reader(fd)
+    
+    def __aiter__(self):
+        return self.events()
+    
+    def close(self):
+        self.backend.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
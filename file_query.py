@@ -0,0 +1,227 @@
+"""
+File Query
+==========
+find-style questions answered from a file_index.FileIndex (built in memory
+or loaded from disk) instead of another walk of the tree:
+
+    import file_index, file_query as q
+    index = file_index.FileIndex.load("scan.idx")
+    old_logs = q.select(index, q.file_type("f"), q.extension(".log"),
+                        q.older_than(30 * 86400))
+    biggest = q.largest(index, 10, q.extension(".iso"))
+
+Every predicate tests one column: a range over size or mtime, a mask over
+the mode bits, or a lookup table over the distinct names (so extension()
+and glob() run once per name, not once per entry). With NumPy installed
+each predicate is one vectorized pass over its column and top-N queries
+use argpartition; without it the rows are filtered in plain Python and
+top-N uses heapq, so neither path sorts more than the requested rows.
+"""
+
+import os
+import stat
+import time
+import heapq
+import fnmatch
+from array import array
+
+try:
+    import numpy
+except ImportError:  # optional: vectorized filters
+    numpy = None
+
+S_IFMT = 0o170000
+
+# find -type letters
+FILE_TYPES = {
+    "f": stat.S_IFREG,
+    "d": stat.S_IFDIR,
+    "l": stat.S_IFLNK,
+    "p": stat.S_IFIFO,
+    "s": stat.S_IFSOCK,
+    "c": stat.S_IFCHR,
+    "b": stat.S_IFBLK,
+}
+
+# os.access() flags as permission bits for owner, group and others
+ACCESS_BITS = {
+    "u": {os.R_OK: stat.S_IRUSR, os.W_OK: stat.S_IWUSR, os.X_OK: stat.S_IXUSR},
+    "g": {os.R_OK: stat.S_IRGRP, os.W_OK: stat.S_IWGRP, os.X_OK: stat.S_IXGRP},
+    "o": {os.R_OK: stat.S_IROTH, os.W_OK: stat.S_IWOTH, os.X_OK: stat.S_IXOTH},
+}
+
+def _column(index, column):
+    values = getattr(index, column)
+    return numpy.frombuffer(values, dtype=values.format if isinstance(values, memoryview)
+                            else values.typecode)
+
+class Range:
+    """lo <= column < hi; either bound may be None"""
+    
+    def __init__(self, column, lo=None, hi=None):
+        self.column = column
+        self.lo = lo
+        self.hi = hi
+    
+    def mask(self, index):
+        values = _column(index, self.column)
+        if self.lo is not None and self.hi is not None:
+            return (values >= self.lo) & (values < self.hi)
+        if self.lo is not None:
+            return values >= self.lo
+        if self.hi is not None:
+            return values < self.hi
+        return numpy.ones(len(values), dtype=bool)
+    
+    def rows(self, index, rows):
+        values, lo, hi = getattr(index, self.column), self.lo, self.hi
+        if lo is not None and hi is not None:
+            return [row for row in rows if lo <= values[row] < hi]
+        if lo is not None:
+            return [row for row in rows if values[row] >= lo]
+        if hi is not None:
+            return [row for row in rows if values[row] < hi]
+        return list(rows)
+
+class Bits:
+    """mode & mask == want, or with any_bit=True: mode & mask != 0"""
+    
+    def __init__(self, mask, want=None, any_bit=False):
+        self.mask_bits = mask
+        self.want = mask if want is None else want
+        self.any_bit = any_bit
+    
+    def mask(self, index):
+        values = _column(index, "mode") & self.mask_bits
+        return values != 0 if self.any_bit else values == self.want
+    
+    def rows(self, index, rows):
+        mode, mask, want = index.mode, self.mask_bits, self.want
+        if self.any_bit:
+            return [row for row in rows if mode[row] & mask]
+        return [row for row in rows if mode[row] & mask == want]
+
+class Names:
+    """test(name) is true, evaluated once per distinct name"""
+    
+    def __init__(self, test):
+        self.test = test
+    
+    def table(self, index):
+        return bytes(1 if self.test(name) else 0 for name in index.names)
+    
+    def mask(self, index):
+        table = numpy.frombuffer(self.table(index), dtype=numpy.uint8).astype(bool)
+        return table[_column(index, "name")]
+    
+    def rows(self, index, rows):
+        table, name = self.table(index), index.name
+        return [row for row in rows if table[name[row]]]
+
+def extension(*extensions):
+    """Names ending in one of the extensions, like ".log" (case-insensitive)"""
+    wanted = {ext.lower() for ext in extensions}
+    return Names(lambda name: os.path.splitext(name)[1].lower() in wanted)
+
+def glob(pattern):
+    """Names matching a shell pattern, like find -name"""
+    match = fnmatch.fnmatchcase
+    return Names(lambda name: match(name, pattern))
+
+def size_between(min_size=None, max_size=None):
+    """Sizes from min_size to max_size bytes, both inclusive"""
+    return Range("size", min_size, None if max_size is None else max_size + 1)
+
+def older_than(seconds, now=None):
+    """Modified more than `seconds` ago"""
+    now = time.time() if now is None else now
+    return Range("mtime", None, int((now - seconds) * 1e9))
+
+def newer_than(seconds, now=None):
+    """Modified within the last `seconds`"""
+    now = time.time() if now is None else now
+    return Range("mtime", int((now - seconds) * 1e9), None)
+
+def file_type(kind):
+    """Entries of one find -type kind: f, d, l, p, s, c or b"""
+    return Bits(S_IFMT, FILE_TYPES[kind])
+
+def permissions(bits, match="all"):
+    """Permission bits like find -perm: match "all" (-perm -bits), "any" (/bits) or "exact" """
+    if match == "exact":
+        return Bits(0o7777, bits)
+    if match == "any":
+        return Bits(bits, any_bit=True)
+    return Bits(bits)
+
+def access(flags, who="u"):
+    """os.access()-style flags (os.R_OK | os.X_OK, ...) granted to owner, group or others.
+
+    Only the mode bits are in the index, so this does not check whose
+    entry it is the way os.access() does for the current user.
+    """
+    bits = 0
+    for flag, bit in ACCESS_BITS[who].items():
+        if flags & flag:
+            bits |= bit
+    return Bits(bits)
+
+def _numpy_select(index, predicates, order_by, limit, descending):
+    mask = None
+    for predicate in predicates:
+        if mask is None:
+            mask = predicate.mask(index)
+        else:
+            mask &= predicate.mask(index)
+    rows = numpy.arange(len(index)) if mask is None else numpy.nonzero(mask)[0]
+    if order_by is not None:
+        values = _column(index, order_by)[rows]
+        if limit is not None and limit < len(rows):
+            # Only the top `limit` rows are partitioned out and then sorted
+            kth = len(rows) - limit if descending else limit - 1
+            part = numpy.argpartition(values, kth)
+            part = part[kth:] if descending else part[:limit]
+            rows, values = rows[part], values[part]
+        order = numpy.argsort(values, kind="stable")
+        rows = rows[order[::-1] if descending else order]
+    if limit is not None:
+        rows = rows[:limit]
+    return array("i", rows.astype(numpy.int32).tobytes())
+
+def select(index, *predicates, order_by=None, limit=None, descending=False):
+    """Return the rows matching every predicate, as an array of row numbers.
+
+    order_by names a column ("size", "mtime", ...); with limit only the
+    first `limit` rows of that order are found, without a full sort.
+    """
+    if limit is not None and limit <= 0:
+        return array("i")
+    if numpy is not None:
+        return _numpy_select(index, predicates, order_by, limit, descending)
+    
+    rows = range(len(index))
+    for predicate in predicates:
+        rows = predicate.rows(index, rows)
+    if order_by is not None:
+        key = getattr(index, order_by).__getitem__
+        if limit is not None and limit < len(rows):
+            pick = heapq.nlargest if descending else heapq.nsmallest
+            rows = pick(limit, rows, key=key)
+        else:
+            rows = sorted(rows, key=key, reverse=descending)
+    if limit is not None:
+        rows = rows[:limit]
+    return array("i", rows)
+
+def largest(index, n, *predicates):
+    """The n biggest files matching the predicates, biggest first"""
+    return select(index, file_type("f"), *predicates, order_by="size", limit=n,
+                  descending=True)
+
+def oldest(index, n, *predicates):
+    """The n least recently modified files matching the predicates, oldest first"""
+    return select(index, file_type("f"), *predicates, order_by="mtime", limit=n)
+
+def paths(index, rows):
+    """Full paths of the given rows"""
+    return [index.path(row) for row in rows]
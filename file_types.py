@@ -0,0 +1,207 @@
+"""
+File Type Sniffing
+==================
+Classifies files by their content instead of their name. Only the first few
+KB of a file are read, into one reusable buffer, and matched against magic
+signatures compiled into a byte trie per offset. Short magics that text can
+start with ("BM", "MZ") only count when the header behind them checks out.
+Results can be cached by (device, inode, size, mtime_ns) in SQLite so repeat
+runs never read a file that has not changed.
+"""
+
+import os
+import time
+import struct
+import sqlite3
+
+HEADER_SIZE = 4096
+
+# Files modified this close to when they were sniffed may change again
+# without their mtime moving ("racily clean"), so they are not cached
+RACY_WINDOW_NS = 2 * 1_000_000_000
+
+# (category, offset, magic). Categories double as organizer directory names.
+SIGNATURES = [
+    ("pdf", 0, b"%PDF-"),
+    ("png", 0, b"\x89PNG\r\n\x1a\n"),
+    ("jpg", 0, b"\xff\xd8\xff"),
+    ("gif", 0, b"GIF87a"),
+    ("gif", 0, b"GIF89a"),
+    ("bmp", 0, b"BM"),
+    ("tif", 0, b"II*\x00"),
+    ("tif", 0, b"MM\x00*"),
+    ("webp", 8, b"WEBP"),
+    ("wav", 8, b"WAVE"),
+    ("avi", 8, b"AVI "),
+    ("mp4", 4, b"ftyp"),
+    ("mkv", 0, b"\x1aE\xdf\xa3"),
+    ("ogg", 0, b"OggS"),
+    ("flac", 0, b"fLaC"),
+    ("mp3", 0, b"ID3"),
+    ("zip", 0, b"PK\x03\x04"),
+    ("zip", 0, b"PK\x05\x06"),
+    ("gz", 0, b"\x1f\x8b"),
+    ("bz2", 0, b"BZh"),
+    ("xz", 0, b"\xfd7zXZ\x00"),
+    ("zst", 0, b"\x28\xb5\x2f\xfd"),
+    ("7z", 0, b"7z\xbc\xaf\x27\x1c"),
+    ("rar", 0, b"Rar!\x1a\x07"),
+    ("tar", 257, b"ustar"),
+    ("elf", 0, b"\x7fELF"),
+    ("exe", 0, b"MZ"),
+    ("class", 0, b"\xca\xfe\xba\xbe"),
+    ("sqlite", 0, b"SQLite format 3\x00"),
+]
+
+# The offset 8 signatures are only valid inside a RIFF container
+RIFF_MAGIC = b"RIFF"
+# BITMAPCOREHEADER, BITMAPINFOHEADER and its later versions
+BMP_HEADER_SIZES = {12, 40, 52, 56, 64, 108, 124}
+PE_MAGIC = b"PE\x00\x00"
+UINT32 = struct.Struct("<I")
+
+def _riff(buf, length):
+    return buf[:4] == RIFF_MAGIC
+
+def _bmp(buf, length):
+    """Reserved fields zero and a known DIB header size"""
+    return (length >= 18 and buf[6:10] == b"\x00\x00\x00\x00"
+            and UINT32.unpack_from(buf, 14)[0] in BMP_HEADER_SIZES)
+
+def _pe(buf, length):
+    """e_lfanew points at a PE signature inside the header"""
+    if length < 0x40:
+        return False
+    pe_offset = UINT32.unpack_from(buf, 0x3c)[0]
+    return 0x40 <= pe_offset <= length - 4 and buf[pe_offset:pe_offset + 4] == PE_MAGIC
+
+# Categories whose magic alone is not enough: check(buf, length) must agree
+CHECKS = {"webp": _riff, "wav": _riff, "avi": _riff, "bmp": _bmp, "exe": _pe}
+
+TERMINAL = None   # trie key holding the category of a complete signature
+TEXT = ""         # sniff() result for a header without a signature or NUL bytes
+
+def compile_signatures(signatures):
+    """Build [(offset, trie)] where each trie is nested dicts keyed by byte"""
+    tries = {}
+    for category, offset, magic in signatures:
+        node = tries.setdefault(offset, {})
+        for byte in magic:
+            node = node.setdefault(byte, {})
+        node[TERMINAL] = category
+    # Deeper offsets first: "ustar" or "ftyp" beat a short prefix like "MZ"
+    return sorted(tries.items(), reverse=True)
+
+TRIES = compile_signatures(SIGNATURES)
+
+def match_header(buf, length, tries=TRIES):
+    """Return the category of the longest signature matching buf[:length]"""
+    for offset, trie in tries:
+        node = trie
+        found = None
+        for i in range(offset, length):
+            node = node.get(buf[i])
+            if node is None:
+                break
+            found = node.get(TERMINAL, found)
+        if found is None:
+            continue
+        check = CHECKS.get(found)
+        if check is not None and not check(buf, length):
+            continue
+        return found
+    return None
+
+def is_text(buf, length):
+    """Treat a header without NUL bytes as text"""
+    return buf.find(b"\x00", 0, length) < 0
+
+class ContentClassifier:
+    """Classify files by content, usable as organizer's classify callable.
+
+    A magic signature wins; otherwise the file keeps its extension category,
+    and extensionless files become "txt" or fallback. With cache_path,
+    what the header showed persists across runs keyed by (dev, ino, size,
+    mtime_ns); the name is applied after the lookup, so a renamed file is
+    classified by its new extension. Files modified less than
+    RACY_WINDOW_NS before this run started are sniffed again next time
+    instead of being cached.
+    """
+    
+    def __init__(self, cache_path=None, fallback="no_extension"):
+        self.buf = bytearray(HEADER_SIZE)
+        self.fallback = fallback
+        self.cache = {}   # (dev, ino) -> (size, mtime_ns, header kind)
+        self.new = []
+        self.conn = None
+        self.reads = 0
+        self.racy_after = time.time_ns() - RACY_WINDOW_NS
+        if cache_path:
+            self.conn = sqlite3.connect(cache_path)
+            self.conn.execute("CREATE TABLE IF NOT EXISTS headers (dev INTEGER, ino INTEGER, "
+                              "size INTEGER, mtime_ns INTEGER, kind TEXT, "
+                              "PRIMARY KEY (dev, ino)) WITHOUT ROWID")
+            for dev, ino, size, mtime_ns, kind in self.conn.execute("SELECT * FROM headers"):
+                self.cache[(dev, ino)] = (size, mtime_ns, kind)
+    
+    def read_header(self, path):
+        """Read up to HEADER_SIZE bytes of path into the shared buffer"""
+        fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        try:
+            if hasattr(os, "readv"):
+                return os.readv(fd, [self.buf])
+            data = os.read(fd, HEADER_SIZE)
+            self.buf[:len(data)] = data
+            return len(data)
+        finally:
+            os.close(fd)
+    
+    def sniff(self, path):
+        """Read one file's header: its magic category, TEXT, or None"""
+        self.reads += 1
+        length = self.read_header(path)
+        category = match_header(self.buf, length)
+        if category is not None:
+            return category
+        return TEXT if length and is_text(self.buf, length) else None
+    
+    def classify(self, name, kind):
+        """Turn what sniff() found into a category, using the name if needed"""
+        if kind is not None and kind != TEXT:
+            return kind
+        _, ext = os.path.splitext(name)
+        if ext:
+            return ext[1:]
+        return "txt" if kind == TEXT else self.fallback
+    
+    def __call__(self, name, entry):
+        if self.conn is None:
+            # Nothing to remember across runs: skip the stat
+            return self.classify(name, self.sniff(entry.path))
+        st = entry.stat()
+        key = (st.st_dev, st.st_ino)
+        cached = self.cache.get(key)
+        if (cached is not None and cached[0] == st.st_size and cached[1] == st.st_mtime_ns
+                and st.st_mtime_ns < self.racy_after):
+            return self.classify(name, cached[2])
+        kind = self.sniff(entry.path)
+        if st.st_mtime_ns < self.racy_after:
+            self.cache[key] = (st.st_size, st.st_mtime_ns, kind)
+            self.new.append((st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, kind))
+        return self.classify(name, kind)
+    
+    def close(self):
+        """Persist newly classified files"""
+        if self.conn is not None:
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO headers VALUES (?, ?, ?, ?, ?)",
+                                      self.new)
+            self.conn.close()
+            self.conn = None
+        self.new = []
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
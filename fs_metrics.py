@@ -0,0 +1,241 @@
+"""
+Filesystem Metrics
+==================
+Opt-in accounting of the os and shutil calls made by the exercises. While
+enabled, the functions listed in OPERATIONS are replaced on the os and
+shutil modules by thin wrappers that count every call, its errors and its
+latency, per operation and per directory:
+
+    import fs_metrics
+    with fs_metrics.instrument() as metrics:
+        exercise_1_file_backup()
+    metrics.write("backup.prom")     # Prometheus text file; .json for JSON
+
+Disabled, the original functions are back in place, so there is no cost
+at all. Latencies go into fixed log-spaced buckets (1us to ~4s), which
+keeps recording O(1) and maps directly onto Prometheus histograms.
+
+Only calls made through the module attributes (os.stat(...)) are seen;
+os.DirEntry methods and file object reads are not.
+"""
+
+import os
+import json
+import time
+import bisect
+import shutil
+import functools
+import threading
+import contextlib
+
+OPERATIONS = {
+    os: ["stat", "lstat", "fstat", "open", "close", "read", "write", "scandir",
+         "listdir", "mkdir", "makedirs", "rename", "replace", "unlink", "remove",
+         "rmdir", "link", "symlink", "readlink", "chmod", "utime", "fsync"],
+    shutil: ["copy", "copy2", "copyfile", "copystat", "copytree", "move", "rmtree"],
+}
+
+# Operations whose path argument is itself the directory being worked on
+DIRECTORY_OPERATIONS = {"scandir", "listdir", "mkdir", "makedirs", "rmdir", "copytree",
+                        "rmtree"}
+
+# Upper bounds in seconds: 1us, 4us, 16us, ... about 4.2s, then +Inf
+BUCKETS = [1e-6 * 4 ** i for i in range(12)]
+
+# Distinct directories tracked before the rest are counted as OTHER
+MAX_DIRECTORIES = 10000
+OTHER = "<other>"
+FD = "<fd>"
+
+_lock = threading.Lock()
+_active = None
+_originals = {}
+
+class Histogram:
+    """Call count, error count, total seconds and bucketed latencies"""
+    
+    __slots__ = ("count", "errors", "seconds", "buckets")
+    
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+    
+    def add(self, seconds, failed):
+        self.count += 1
+        self.errors += failed
+        self.seconds += seconds
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+    
+    def to_dict(self):
+        return {"count": self.count, "errors": self.errors, "seconds": self.seconds,
+                "buckets": self.buckets}
+
+class Metrics:
+    """Histograms per operation and per directory"""
+    
+    def __init__(self):
+        self.operations = {}
+        self.directories = {}
+        self.started = time.time()
+        self.stopped = None
+    
+    def record(self, operation, directory, seconds, failed):
+        with _lock:
+            histogram = self.operations.get(operation)
+            if histogram is None:
+                histogram = self.operations[operation] = Histogram()
+            histogram.add(seconds, failed)
+            if directory not in self.directories and len(self.directories) >= MAX_DIRECTORIES:
+                directory = OTHER
+            histogram = self.directories.get(directory)
+            if histogram is None:
+                histogram = self.directories[directory] = Histogram()
+            histogram.add(seconds, failed)
+    
+    def summary(self, top_directories=20):
+        """Plain dict: every operation, and the directories with most time spent"""
+        with _lock:
+            slowest = sorted(self.directories.items(), key=lambda item: item[1].seconds,
+                             reverse=True)[:top_directories]
+            return {
+                "started": self.started,
+                "stopped": self.stopped,
+                "bucket_bounds": BUCKETS,
+                "operations": {op: h.to_dict() for op, h in sorted(self.operations.items())},
+                "directories": {directory: h.to_dict() for directory, h in slowest},
+            }
+    
+    def to_json(self, top_directories=20):
+        return json.dumps(self.summary(top_directories), indent=2)
+    
+    def to_prometheus(self, top_directories=20):
+        """Prometheus text exposition format, for node_exporter's textfile collector"""
+        summary = self.summary(top_directories)
+        lines = []
+        
+        def histogram(name, label, values):
+            lines.append(f"# TYPE {name} histogram")
+            for key, h in values.items():
+                key = key.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ["+Inf"], h["buckets"]):
+                    cumulative += count
+                    le = bound if bound == "+Inf" else f"{bound:g}"
+                    lines.append(f'{name}_bucket{{{label}="{key}",le="{le}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{label}="{key}"}} {h["seconds"]}')
+                lines.append(f'{name}_count{{{label}="{key}"}} {h["count"]}')
+        
+        histogram("fs_operation_seconds", "operation", summary["operations"])
+        lines.append("# TYPE fs_operation_errors_total counter")
+        for op, h in summary["operations"].items():
+            lines.append(f'fs_operation_errors_total{{operation="{op}"}} {h["errors"]}')
+        histogram("fs_directory_seconds", "directory", summary["directories"])
+        return "\n".join(lines) + "\n"
+    
+    def write(self, path, top_directories=20):
+        """Write JSON, or Prometheus text if path ends in .prom, atomically"""
+        if path.endswith(".prom"):
+            text = self.to_prometheus(top_directories)
+        else:
+            text = self.to_json(top_directories)
+        replace = _originals.get((os, "replace"), os.replace)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        replace(tmp_path, path)
+
+def _directory(operation, args, kwargs):
+    """The directory a call works in, from its first argument"""
+    if not args:
+        return FD
+    path = args[0]
+    if isinstance(path, int) or "dir_fd" in kwargs:
+        return FD
+    try:
+        path = os.fsdecode(path)
+    except TypeError:
+        return FD
+    if operation in DIRECTORY_OPERATIONS:
+        return os.path.normpath(path)
+    return os.path.dirname(os.path.normpath(path)) or os.curdir
+
+def _wrap(operation, func, metrics):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        failed = False
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except OSError:
+            failed = True
+            raise
+        finally:
+            metrics.record(operation, _directory(operation, args, kwargs),
+                           time.perf_counter() - start, failed)
+    return wrapper
+
+def _support_sets():
+    return [getattr(os, name) for name in
+            ("supports_fd", "supports_dir_fd", "supports_follow_symlinks",
+             "supports_effective_ids", "supports_bytes_environ")
+            if isinstance(getattr(os, name, None), set)]
+
+def enable(metrics=None):
+    """Start recording into metrics (a new Metrics by default) and return it"""
+    global _active
+    if _active is not None:
+        raise RuntimeError("filesystem metrics are already enabled")
+    metrics = metrics or Metrics()
+    for module, names in OPERATIONS.items():
+        for name in names:
+            func = getattr(module, name, None)
+            if func is None:
+                continue
+            wrapper = _wrap(name, func, metrics)
+            _originals[module, name] = func
+            setattr(module, name, wrapper)
+            # Keep "os.stat in os.supports_dir_fd" style checks working
+            for supported in _support_sets():
+                if func in supported:
+                    supported.add(wrapper)
+    _active = metrics
+    return metrics
+
+def disable():
+    """Put the original functions back and return the finished Metrics"""
+    global _active
+    metrics = _active
+    if metrics is None:
+        return None
+    for (module, name), func in _originals.items():
+        wrapper = getattr(module, name)
+        for supported in _support_sets():
+            supported.discard(wrapper)
+        setattr(module, name, func)
+    _originals.clear()
+    _active = None
+    metrics.stopped = time.time()
+    return metrics
+
+def active():
+    """The Metrics being recorded into, or None"""
+    return _active
+
+@contextlib.contextmanager
+def instrument(metrics=None):
+    """Record filesystem calls for the duration of a with block"""
+    metrics = enable(metrics)
+    try:
+        yield metrics
+    finally:
+        disable()
+
+def finish(path):
+    """Disable metrics and write them to path"""
+    metrics = disable()
+    if metrics is not None and path:
+        metrics.write(path)
+        print(f"Filesystem metrics written to {path}")
+    return metrics
@@ -0,0 +1,596 @@
+"""
+fsctl
+=====
+One non-interactive command line for the filesystem tools, for cron jobs,
+systemd units and shell loops:
+
+    python fsctl.py backup SOURCE DEST [--mode copy|incremental|archive|dedup]
+    python fsctl.py organize DIR [--classify content] [--rollback]
+    python fsctl.py scan DIR [--max-depth N] [--index FILE] [--format plain|tree|ndjson|null]
+    python fsctl.py find DIR [--ext .log] [--older-than DAYS] [--largest N]
+    python fsctl.py du DIR [--top N]
+    python fsctl.py watch DIR [--seconds N]
+    python fsctl.py clean PATH... [--background]
+
+"python fsctl.py daemon" stays running and serves the same commands over a
+Unix socket. It keeps directory listings (a tree_cache) and the file
+indexes of scanned trees in memory between jobs, so a repeated scan only
+lists the directories that changed and find answers from memory while
+none of the tree's directories has changed. Rewriting a file in place
+does not change its directory, so the files whose size or age a query
+depends on are stat'ed again. The MAX_INDEXES most recently used trees
+are kept. A command goes to the daemon when FSCTL_SOCKET (or --socket)
+names its socket, and runs in-process when nothing is listening there;
+the output is the same either way.
+
+Each connection carries one job: a JSON request line
+{"command": ..., "args": {...}}, answered by JSON lines {"out": text}
+and a final {"status": exit code}. Path arguments are sent absolute,
+with "given" mapping each to the way it was typed.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import lazy_modules
+
+# Loaded on first use: a job only imports the modules its command needs,
+# and the socket modules are only loaded when a daemon is involved
+json = lazy_modules.load("json")
+signal = lazy_modules.load("signal")
+socket = lazy_modules.load("socket")
+tempfile = lazy_modules.load("tempfile")
+threading = lazy_modules.load("threading")
+socketserver = lazy_modules.load("socketserver")
+futures = lazy_modules.load("concurrent.futures")
+
+tree_walker = lazy_modules.load("tree_walker")
+tree_cache = lazy_modules.load("tree_cache")
+tree_render = lazy_modules.load("tree_render")
+file_index = lazy_modules.load("file_index")
+file_query = lazy_modules.load("file_query")
+disk_usage = lazy_modules.load("disk_usage")
+backup_index = lazy_modules.load("backup_index")
+backup_archive = lazy_modules.load("backup_archive")
+chunk_store = lazy_modules.load("chunk_store")
+copy_engine = lazy_modules.load("copy_engine")
+organizer = lazy_modules.load("organizer")
+file_types = lazy_modules.load("file_types")
+file_monitor = lazy_modules.load("file_monitor")
+fast_delete = lazy_modules.load("fast_delete")
+
+# Bytes of output collected before the daemon sends a reply line
+REPLY_BUFFER = 64 * 1024
+DAY = 24 * 3600
+# File indexes the daemon keeps, least recently used dropped first
+MAX_INDEXES = 8
+
+# Arguments holding paths, normalized ("fi/" is "fi") and made absolute
+# before a job is sent to the daemon
+PATH_ARGS = ("source", "dest", "directory", "paths", "index")
+
+def default_socket_path():
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(runtime_dir, f"fsctl-{os.getuid()}.sock")
+
+class State:
+    """Caches kept between the jobs of one process (only warm in the daemon)"""
+    
+    def __init__(self, warm=False):
+        self.warm = warm
+        self.tree_cache = None
+        # absolute root -> (FileIndex, time.time_ns() after its scan), oldest use first
+        self.indexes = {}
+    
+    def listing_cache(self):
+        """The shared tree_cache, or None when jobs do not outlive the process"""
+        if self.warm and self.tree_cache is None:
+            self.tree_cache = tree_cache.TreeCache(":memory:")
+        return self.tree_cache
+    
+    def keep_index(self, root, index):
+        """Keep the index of a finished scan of root for later jobs"""
+        old = self.indexes.pop(root, None)
+        if old is not None and old[0] is not index:
+            old[0].close()
+        self.indexes[root] = (index, time.time_ns())
+        while len(self.indexes) > MAX_INDEXES:
+            self.indexes.pop(next(iter(self.indexes)))[0].close()
+    
+    def kept_index(self, root):
+        """The index kept for root, or None when there is none or it is out of date"""
+        kept = self.indexes.get(root)
+        if kept is None:
+            return None
+        del self.indexes[root]
+        if is_current(*kept):
+            self.indexes[root] = kept   # now the most recently used
+            return kept[0]
+        kept[0].close()
+        return None
+    
+    def close(self):
+        if self.tree_cache is not None:
+            self.tree_cache.close()
+            self.tree_cache = None
+        for index, _ in self.indexes.values():
+            index.close()
+        self.indexes = {}
+
+def is_current(index, scanned_ns):
+    """Whether no directory of an index changed since it was scanned.
+
+    Like tree_cache, this relies on a directory's mtime changing when an
+    entry is added, removed or renamed, with one stat per directory. A
+    file rewritten in place is not noticed, so queries on size or age
+    re-stat their candidates (FileIndex.refresh). Directories changed
+    within the racy window before the scan may have changed again
+    unnoticed.
+    """
+    for row in file_query.select(index, file_query.file_type("d")):
+        try:
+            st = os.stat(index.path(row), follow_symlinks=False)
+        except OSError:
+            return False
+        if (st.st_ino != index.ino[row] or st.st_mtime_ns != index.mtime[row]
+                or scanned_ns - st.st_mtime_ns < tree_cache.RACY_WINDOW_NS):
+            return False
+    return True
+
+def shown(args, path):
+    """path as the user wrote it.
+
+    The daemon is sent absolute paths along with the way each was given
+    ("given"), so its output matches a job run in-process.
+    """
+    given = getattr(args, "given", None)
+    if not given:
+        return path
+    for absolute in sorted(given, key=len, reverse=True):
+        if path == absolute:
+            return given[absolute]
+        prefix = os.path.join(absolute, "")
+        if path.startswith(prefix):
+            return os.path.join(given[absolute], path[len(prefix):])
+    return path
+
+def _error_reporter(out, errors, args):
+    def report_error(path, depth, error):
+        errors.append(path)
+        out.write(f"error: {shown(args, path)}: {error}\n")
+    return report_error
+
+def cmd_backup(args, state, out):
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
+    workers = args.workers or copy_engine.DEFAULT_WORKERS
+    errors = []
+    report_error = _error_reporter(out, errors, args)
+    if args.mode == "incremental":
+        stats = backup_index.incremental_backup(args.source, args.dest, timestamp=timestamp,
+                                                on_error=report_error)
+        out.write(f"{stats['scanned']} scanned, {stats['copied']} copied, "
+                  f"{stats['unchanged']} unchanged, {stats['removed']} removed\n")
+    elif args.mode == "archive":
+        archive_path, stats = backup_archive.backup_to_archive(
+            args.source, args.dest, timestamp, workers, on_error=report_error)
+        out.write(f"{stats['files']} files, {stats['bytes_written']} of "
+                  f"{stats['bytes_read']} bytes written to {shown(args, archive_path)}\n")
+    elif args.mode == "dedup":
+        source_paths = [entry.path for entry in
+                        tree_walker.iter_files(args.source, on_error=report_error)]
+        manifest_path, stats = chunk_store.backup_files(
+            source_paths, os.path.join(args.dest, "store"), args.source, timestamp)
+        out.write(f"{stats['files']} files, {stats['chunks_new']} new chunks, "
+                  f"{stats['chunks_reused']} reused -> {shown(args, manifest_path)}\n")
+    else:
+        pairs = []
+        for entry in tree_walker.iter_files(args.source, on_error=report_error):
+            rel_path = os.path.relpath(entry.path, args.source)
+            backup_path = os.path.join(args.dest, f"{rel_path}.{timestamp}")
+            os.makedirs(os.path.dirname(backup_path), exist_ok=True)
+            pairs.append((entry.path, backup_path))
+        stats = copy_engine.parallel_copy(pairs, workers=workers)
+        for source_path, _, error in stats["errors"]:
+            report_error(source_path, 0, error)
+        out.write(f"{copy_engine.format_throughput(stats)}\n")
+    return 1 if errors else 0
+
+def cmd_organize(args, state, out):
+    if args.rollback:
+        stats = organizer.rollback(args.directory)
+        if stats is None:
+            out.write(f"no interrupted run to roll back in {shown(args, args.directory)}\n")
+            return 1
+        out.write(f"{stats['restored']} files restored, {stats['dirs_removed']} "
+                  f"directories removed\n")
+        return 0
+    
+    errors = []
+    
+    def report_error(src, dst, error):
+        errors.append(src)
+        out.write(f"error: {shown(args, src)}: {error}\n")
+    
+    if args.classify == "content":
+        with file_types.ContentClassifier() as classifier:
+            stats = organizer.organize(args.directory, classifier, on_error=report_error)
+    else:
+        stats = organizer.organize(args.directory, on_error=report_error)
+    resumed = " (resumed)" if stats["resumed"] else ""
+    out.write(f"{stats['moved']} files moved into {stats['dirs_created']} new "
+              f"directories{resumed}\n")
+    return 1 if errors else 0
+
+def cmd_scan(args, state, out):
+    errors = []
+    writer = tree_render.TreeWriter(out, args.format, args.sizes,
+                                    shown=lambda path: shown(args, path))
+    
+    def report_error(path, depth, error):
+        errors.append(path)
+        writer.error(path, depth, error)
+    
+    cache = state.listing_cache()
+    if cache is not None:
+        events = cache.walk(args.directory, args.max_depth, report_error)
+    else:
+        events = tree_walker.walk(args.directory, args.max_depth, report_error)
+    
+    index = file_index.FileIndex(args.directory)
+    for kind, depth, path, entry in events:
+        try:
+            index.record(kind, depth, path, entry)
+        except OSError as e:
+            report_error(path if entry is None else entry.path, depth, e)
+            continue
+        writer.write_event(kind, depth, path, entry)
+    writer.flush()
+    index.finish()
+    
+    if args.index:
+        index.save(args.index)
+    if state.warm and args.max_depth is None:
+        state.keep_index(os.path.abspath(args.directory), index)
+    return 1 if errors else 0
+
+def _load_index(args, state, report_error):
+    root = os.path.abspath(args.directory)
+    index = None if args.rescan else state.kept_index(root)
+    if index is not None:
+        return index, True
+    reused = False
+    if args.index and not args.rescan and os.path.exists(args.index):
+        index = file_index.FileIndex.load(args.index)
+        # The index file was written right after its scan
+        reused = is_current(index, os.stat(args.index).st_mtime_ns)
+        if not reused:
+            index.close()
+            index = None
+    if index is None:
+        # Unchanged directories are not listed again by the daemon's listing cache
+        cache = state.listing_cache()
+        index = file_index.FileIndex.build(args.directory, on_error=report_error,
+                                           walk=tree_walker.walk if cache is None else cache.walk)
+        if args.index:
+            index.save(args.index)
+    if state.warm:
+        state.keep_index(root, index)
+    return index, reused
+
+def cmd_find(args, state, out):
+    errors = []
+    index, reused = _load_index(args, state, _error_reporter(out, errors, args))
+    predicates = []
+    if args.type not in file_query.FILE_TYPES:
+        out.write(f"error: unknown file type {args.type!r}\n")
+        return 2
+    predicates.append(file_query.file_type(args.type))
+    if args.ext:
+        predicates.append(file_query.extension(*args.ext))
+    if args.name:
+        predicates.append(file_query.glob(args.name))
+    if reused and (args.min_size is not None or args.max_size is not None
+                   or args.older_than is not None or args.newer_than is not None
+                   or args.largest or args.oldest or args.long):
+        # Files rewritten in place since the scan kept their directory's mtime
+        index.refresh(file_query.select(index, *predicates))
+    if args.min_size is not None or args.max_size is not None:
+        predicates.append(file_query.size_between(args.min_size, args.max_size))
+    if args.older_than is not None:
+        predicates.append(file_query.older_than(args.older_than * DAY))
+    if args.newer_than is not None:
+        predicates.append(file_query.newer_than(args.newer_than * DAY))
+    
+    if args.largest:
+        rows = file_query.select(index, *predicates, order_by="size", limit=args.largest,
+                                 descending=True)
+    elif args.oldest:
+        rows = file_query.select(index, *predicates, order_by="mtime", limit=args.oldest)
+    else:
+        rows = file_query.select(index, *predicates)
+    for row in rows:
+        if args.long:
+            modified = time.strftime("%Y-%m-%d %H:%M", time.localtime(index.mtime[row] / 1e9))
+            out.write(f"{index.size[row]:>12} {modified} {shown(args, index.path(row))}\n")
+        else:
+            out.write(f"{shown(args, index.path(row))}\n")
+    if not state.warm:
+        index.close()
+    return 1 if errors else 0
+
+def cmd_du(args, state, out):
+    errors = []
+    usage = disk_usage.du(args.directory,
+                          disk_usage.DEFAULT_TOP_N if args.top is None else args.top,
+                          args.one_file_system,
+                          on_error=_error_reporter(out, errors, args))
+    for allocated, apparent, path in usage["largest"]:
+        out.write(f"{disk_usage.format_size(allocated):>10}  {shown(args, path)}\n")
+    out.write(f"{disk_usage.format_size(usage['allocated']):>10}  total "
+              f"({usage['files']} files, {usage['dirs']} directories, "
+              f"{disk_usage.format_size(usage['apparent'])} apparent)\n")
+    return 1 if errors else 0
+
+def cmd_watch(args, state, out):
+    deadline = None if args.seconds is None else time.monotonic() + args.seconds
+    errors = []
+    with file_monitor.FileMonitor(args.directory, args.backend,
+                                  on_error=_error_reporter(out, errors, args)) as monitor:
+        out.write(f"watching {shown(args, args.directory)} ({monitor.kind})\n")
+        out.flush()
+        while deadline is None or time.monotonic() < deadline:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            batch = monitor.wait(remaining)
+            for kind, path in batch:
+                out.write(f"{kind}\t{shown(args, path)}\n")
+            out.flush()
+    return 1 if errors else 0
+
+def cmd_clean(args, state, out):
+    errors = []
+    report_error = _error_reporter(out, errors, args)
+    for path in args.paths:
+        if not os.path.lexists(path):
+            continue
+        if args.background:
+            fast_delete.remove_tree_later(path, on_error=report_error)
+            out.write(f"removing {shown(args, path)} in the background\n")
+            continue
+        stats = fast_delete.remove_tree(path, on_error=report_error)
+        out.write(f"removed {shown(args, path)} ({stats['files']} files, {stats['dirs']} directories)\n")
+    return 1 if errors else 0
+
+COMMANDS = {
+    "backup": cmd_backup,
+    "organize": cmd_organize,
+    "scan": cmd_scan,
+    "find": cmd_find,
+    "du": cmd_du,
+    "watch": cmd_watch,
+    "clean": cmd_clean,
+}
+
+# Commands the daemon runs on the connection's own thread, without the shared state
+CONCURRENT = {"watch"}
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="fsctl", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--socket", help="daemon socket (default: $FSCTL_SOCKET)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    backup = commands.add_parser("backup", help="back up a directory tree")
+    backup.add_argument("source")
+    backup.add_argument("dest")
+    backup.add_argument("--mode", choices=["copy", "incremental", "archive", "dedup"],
+                        default="incremental")
+    backup.add_argument("--workers", type=int, help="copy threads (default: 8)")
+    
+    organize = commands.add_parser("organize", help="sort a directory's files into folders")
+    organize.add_argument("directory")
+    organize.add_argument("--classify", choices=["extension", "content"], default="extension")
+    organize.add_argument("--rollback", action="store_true",
+                          help="undo an interrupted run instead")
+    
+    scan = commands.add_parser("scan", help="list a directory tree")
+    scan.add_argument("directory")
+    scan.add_argument("--max-depth", type=int)
+    scan.add_argument("--index", help="also save the scan as a file index")
+    scan.add_argument("--format", choices=["plain", "tree", "ndjson", "null"], default="plain",
+                      help="null separates paths with NUL bytes, for xargs -0")
+    scan.add_argument("--sizes", action="store_true", help="show file sizes (tree, ndjson)")
+    
+    find = commands.add_parser("find", help="query a file index of a tree")
+    find.add_argument("directory")
+    find.add_argument("--index", help="saved index to use (written if missing)")
+    find.add_argument("--rescan", action="store_true", help="rebuild the index first")
+    find.add_argument("--type", default="f", help="f, d, l, p, s, c or b like find -type")
+    find.add_argument("--ext", nargs="+")
+    find.add_argument("--name", help="shell pattern for the file name")
+    find.add_argument("--min-size", type=int)
+    find.add_argument("--max-size", type=int)
+    find.add_argument("--older-than", type=float, metavar="DAYS")
+    find.add_argument("--newer-than", type=float, metavar="DAYS")
+    find.add_argument("--largest", type=int, metavar="N")
+    find.add_argument("--oldest", type=int, metavar="N")
+    find.add_argument("-l", "--long", action="store_true", help="show size and mtime")
+    
+    du = commands.add_parser("du", help="disk usage of a tree")
+    du.add_argument("directory")
+    du.add_argument("--top", type=int, help="largest directories to list (default: 10)")
+    du.add_argument("-x", "--one-file-system", action="store_true")
+    
+    watch = commands.add_parser("watch", help="print changes in a tree")
+    watch.add_argument("directory")
+    watch.add_argument("--backend", choices=["auto", "inotify", "polling"], default="auto")
+    watch.add_argument("--seconds", type=float, help="stop after this long")
+    
+    clean = commands.add_parser("clean", help="delete directory trees")
+    clean.add_argument("paths", nargs="+")
+    clean.add_argument("--background", action="store_true")
+    
+    commands.add_parser("daemon", help="serve commands over a Unix socket")
+    return parser
+
+class _ReplyWriter:
+    """Text stream sending what is written as {"out": ...} reply lines"""
+    
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.parts = []
+        self.size = 0
+    
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= REPLY_BUFFER:
+            self.flush()
+        return len(text)
+    
+    def flush(self):
+        if self.parts:
+            self._send({"out": "".join(self.parts)})
+            self.parts = []
+            self.size = 0
+    
+    def finish(self, status):
+        self.flush()
+        self._send({"status": status})
+    
+    def _send(self, reply):
+        self.wfile.write(json.dumps(reply).encode() + b"\n")
+        self.wfile.flush()
+
+def serve(socket_path):
+    """Run the daemon until SIGTERM or Ctrl-C"""
+    state = State(warm=True)
+    # One job thread owns the shared state (its sqlite connection is per thread)
+    jobs = futures.ThreadPoolExecutor(max_workers=1)
+    
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            request = json.loads(self.rfile.readline())
+            args = argparse.Namespace(**request["args"])
+            out = _ReplyWriter(self.wfile)
+            command = COMMANDS[request["command"]]
+            try:
+                if request["command"] in CONCURRENT:
+                    status = command(args, State(), out)
+                else:
+                    status = jobs.submit(command, args, state, out).result()
+            except (BrokenPipeError, ConnectionResetError):
+                return   # the client went away
+            except Exception as e:
+                out.write(f"error: {e}\n")
+                status = 1
+            try:
+                out.finish(status)
+            except OSError:
+                pass
+    
+    if os.path.exists(socket_path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_path)
+            raise RuntimeError(f"a daemon is already listening on {socket_path}")
+        except ConnectionRefusedError:
+            os.unlink(socket_path)   # left behind by a daemon that died
+        finally:
+            probe.close()
+    
+    old_umask = os.umask(0o077)
+    try:
+        server = socketserver.ThreadingUnixStreamServer(socket_path, Handler)
+    finally:
+        os.umask(old_umask)
+    server.daemon_threads = True
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    print(f"fsctl daemon listening on {socket_path}", file=sys.stderr)
+    print(f"  export FSCTL_SOCKET={socket_path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(socket_path)
+        jobs.submit(state.close).result()
+        jobs.shutdown()
+    return 0
+
+def _reader_gone():
+    """Stop quietly when stdout's reader went away (e.g. | head), like other tools"""
+    # Whatever is still buffered for stdout would fail again at exit
+    os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    return 1
+
+def send(socket_path, command, args, out):
+    """Run one job on the daemon, copying its output to out; returns the status"""
+    request = {"command": command,
+               "args": {key: value for key, value in vars(args).items()
+                        if key not in ("command", "socket")}}
+    given = request["args"]["given"] = {}
+    for key in PATH_ARGS:
+        value = request["args"].get(key)
+        if isinstance(value, list):
+            request["args"][key] = [os.path.abspath(path) for path in value]
+            given.update(zip(request["args"][key], value))
+        elif value is not None:
+            request["args"][key] = os.path.abspath(value)
+            given[request["args"][key]] = value
+    
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        with sock.makefile('rb') as replies:
+            for line in replies:
+                reply = json.loads(line)
+                if "status" in reply:
+                    return reply["status"]
+                try:
+                    out.write(reply["out"])
+                    out.flush()
+                except BrokenPipeError:
+                    return _reader_gone()
+    raise ConnectionError("the daemon closed the connection before finishing the job")
+
+def normalize_paths(args):
+    """Normalize the PATH_ARGS of parsed arguments in place"""
+    for key in PATH_ARGS:
+        value = getattr(args, key, None)
+        if isinstance(value, list):
+            setattr(args, key, [os.path.normpath(path) for path in value])
+        elif value is not None:
+            setattr(args, key, os.path.normpath(value))
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    normalize_paths(args)
+    if args.command == "daemon":
+        return serve(args.socket or os.environ.get("FSCTL_SOCKET") or default_socket_path())
+    
+    # Names that are not valid in the locale's encoding are written as their original bytes
+    sys.stdout.reconfigure(errors="surrogateescape")
+    socket_path = args.socket or os.environ.get("FSCTL_SOCKET")
+    if socket_path:
+        try:
+            return send(socket_path, args.command, args, sys.stdout)
+        except (FileNotFoundError, ConnectionRefusedError):
+            pass   # no daemon listening: run the job here
+    
+    state = State()
+    try:
+        return COMMANDS[args.command](args, state, sys.stdout)
+    except BrokenPipeError:
+        return _reader_gone()
+    except OSError as e:
+        print(f"fsctl: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        state.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""
+Hashing Service
+===============
+Hashes files without copying their contents into Python objects. Large
+files are hashed straight from a read-only mmap, smaller ones through one
+reusable buffer per thread filled with readv, so no chunk is ever copied.
+hash_files() spreads many files over a process pool and can skip files
+whose digest is already in a HashCache keyed by (dev, ino, size, mtime_ns).
+"""
+
+import os
+import mmap
+import time
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+ALGORITHM = "sha256"
+BUFFER_SIZE = 1024 * 1024
+MMAP_THRESHOLD = 4 * 1024 * 1024
+BATCH_FILES = 1024
+MAP_CHUNKSIZE = 32
+
+# Files modified this close to being hashed may change again without their
+# mtime moving, so their digests are not cached (see backup_index)
+RACY_WINDOW_NS = 2 * 1_000_000_000
+
+O_BINARY = getattr(os, "O_BINARY", 0)
+
+_local = threading.local()
+
+def _buffer():
+    """This thread's reusable read buffer"""
+    view = getattr(_local, "view", None)
+    if view is None:
+        view = _local.view = memoryview(bytearray(BUFFER_SIZE))
+    return view
+
+def _update_mapped(digest, fd, ranges):
+    with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as m:
+        if hasattr(m, "madvise"):
+            m.madvise(mmap.MADV_SEQUENTIAL)
+        view = memoryview(m)
+        try:
+            for start, end in ranges:
+                digest.update(view[start:end])
+        finally:
+            view.release()
+
+def _update_buffered(digest, fd, ranges):
+    view = _buffer()
+    for start, end in ranges:
+        os.lseek(fd, start, os.SEEK_SET)
+        remaining = end - start
+        while remaining > 0:
+            n = os.readv(fd, [view[:min(remaining, BUFFER_SIZE)]])
+            if not n:
+                break   # truncated while we were reading
+            digest.update(view[:n])
+            remaining -= n
+
+def hash_file(path, algorithm=ALGORITHM, ranges=None):
+    """Return the hex digest of a file, or of its (start, end) byte ranges"""
+    digest = hashlib.new(algorithm)
+    fd = os.open(path, os.O_RDONLY | O_BINARY)
+    try:
+        size = os.fstat(fd).st_size
+        if ranges is None:
+            ranges = [(0, size)]
+        if size >= MMAP_THRESHOLD:
+            _update_mapped(digest, fd, ranges)
+        elif size:
+            _update_buffered(digest, fd, ranges)
+    finally:
+        os.close(fd)
+    return digest.hexdigest()
+
+def hash_job(job):
+    """Pool worker: hash (path, algorithm), returning the digest or the OSError"""
+    path, algorithm = job
+    try:
+        return hash_file(path, algorithm)
+    except OSError as e:
+        return e
+
+class HashCache:
+    """Digests of files that have not changed since they were hashed.
+
+    Entries are keyed by (dev, ino, algorithm) and only trusted while size
+    and mtime_ns still match. Without a path the cache lives in memory.
+    """
+    
+    def __init__(self, cache_path=":memory:"):
+        self.conn = sqlite3.connect(cache_path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS hashes (dev INTEGER, ino INTEGER, "
+                          "algorithm TEXT, size INTEGER, mtime_ns INTEGER, digest TEXT, "
+                          "PRIMARY KEY (dev, ino, algorithm)) WITHOUT ROWID")
+        self.pending = []
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, st, algorithm=ALGORITHM):
+        """Return the cached digest for a stat result, or None"""
+        row = self.conn.execute("SELECT size, mtime_ns, digest FROM hashes "
+                                "WHERE dev = ? AND ino = ? AND algorithm = ?",
+                                (st.st_dev, st.st_ino, algorithm)).fetchone()
+        if row is not None and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            self.hits += 1
+            return row[2]
+        self.misses += 1
+        return None
+    
+    def put(self, st, digest, algorithm=ALGORITHM, now_ns=None):
+        """Remember a digest unless the file is too recently modified to trust"""
+        now_ns = now_ns or time.time_ns()
+        if st.st_mtime_ns >= now_ns - RACY_WINDOW_NS:
+            return
+        self.pending.append((st.st_dev, st.st_ino, algorithm, st.st_size,
+                             st.st_mtime_ns, digest))
+        if len(self.pending) >= BATCH_FILES:
+            self.flush()
+    
+    def flush(self):
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?)",
+                                  self.pending)
+        self.pending = []
+    
+    def close(self):
+        self.flush()
+        self.conn.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def hash_files(paths, workers=None, cache=None, algorithm=ALGORITHM, on_error=None,
+               executor=None):
+    """Yield (path, digest) for many files, hashing them on a process pool.
+
+    workers sizes the pool (None for one per CPU, 0 to hash in this
+    process); an existing executor can be passed instead. Files found in
+    cache are not read. Failures go to on_error(path, 0, error).
+    """
+    pool = executor
+    if pool is None and workers != 0:
+        pool = ProcessPoolExecutor(workers)
+    try:
+        for batch in _batches(paths, BATCH_FILES):
+            stats = {}
+            digests = {}
+            misses = []
+            for path in batch:
+                try:
+                    st = os.stat(path)
+                except OSError as e:
+                    if on_error is not None:
+                        on_error(path, 0, e)
+                    continue
+                stats[path] = st
+                digest = cache.get(st, algorithm) if cache is not None else None
+                if digest is None:
+                    misses.append(path)
+                else:
+                    digests[path] = digest
+            
+            jobs = [(path, algorithm) for path in misses]
+            if pool is None:
+                results = map(hash_job, jobs)
+            else:
+                results = pool.map(hash_job, jobs, chunksize=MAP_CHUNKSIZE)
+            now_ns = time.time_ns()
+            for path, digest in zip(misses, results):
+                if isinstance(digest, OSError):
+                    if on_error is not None:
+                        on_error(path, 0, digest)
+                    continue
+                digests[path] = digest
+                if cache is not None:
+                    cache.put(stats[path], digest, algorithm, now_ns)
+            
+            for path in batch:
+                if path in digests:
+                    yield path, digests[path]
+    finally:
+        if executor is None and pool is not None:
+            pool.shutdown(cancel_futures=True)
@@ -0,0 +1,78 @@
+"""
+Lazy Modules
+============
+Defers executing a module until one of its attributes is first used, so a
+command line entry point only pays for the modules that the requested
+operation actually needs:
+
+    tree_walker = lazy_modules.load("tree_walker")
+
+The module is found and registered in sys.modules right away, so a
+missing module still fails at startup; only running its code waits. On
+first use the module object turns into an ordinary module, so later
+attribute access costs nothing extra. This is what importlib.util's
+LazyLoader does, without importing importlib.util (and contextlib and
+collections with it), which alone costs several milliseconds of startup.
+
+Attributes read at import time, such as default argument values, load the
+module immediately and should be avoided in the entry points.
+"""
+
+import sys
+import _thread
+import importlib
+import importlib.machinery
+
+_ModuleType = type(sys)
+_lock = _thread.RLock()
+
+class _LazyModule(_ModuleType):
+    """A module whose code runs on the first attribute access"""
+    
+    def __getattribute__(self, attr):
+        with _lock:
+            if type(self) is _LazyModule:
+                self.__class__ = _ModuleType
+                try:
+                    self.__spec__.loader.exec_module(self)
+                except BaseException:
+                    sys.modules.pop(self.__name__, None)
+                    raise
+        return getattr(self, attr)
+
+def _find_spec(name, path):
+    for finder in sys.meta_path:
+        find_spec = getattr(finder, "find_spec", None)
+        if find_spec is not None:
+            spec = find_spec(name, path)
+            if spec is not None:
+                return spec
+    return None
+
+def load(name):
+    """Return the module called name, executed on first attribute access"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    parent_name, _, child = name.rpartition(".")
+    parent = importlib.import_module(parent_name) if parent_name else None
+    spec = _find_spec(name, parent.__path__ if parent else None)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    if not isinstance(spec.loader, importlib.machinery.SourceFileLoader):
+        # Built-in, frozen and extension modules are cheap to import now
+        return importlib.import_module(name)
+    
+    module = _ModuleType(name)
+    module.__spec__ = spec
+    module.__loader__ = spec.loader
+    module.__package__ = spec.parent
+    module.__file__ = spec.origin
+    module.__cached__ = spec.cached
+    if spec.submodule_search_locations is not None:
+        module.__path__ = spec.submodule_search_locations
+    module.__class__ = _LazyModule
+    sys.modules[name] = module
+    if parent is not None:
+        setattr(parent, child, module)
+    return module
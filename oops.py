@@ -5,9 +5,17 @@ A comprehensive guide to mastering the os module with practical examples and exe
 """
 
 import os
+import sys
 import time
-import shutil
-from pathlib import Path
+
+import lazy_modules
+
+# Loaded on first use, so running one section only imports what it needs
+tree_render = lazy_modules.load("tree_render")
+tree_cache = lazy_modules.load("tree_cache")
+disk_usage = lazy_modules.load("disk_usage")
+fast_delete = lazy_modules.load("fast_delete")
+fs_metrics = lazy_modules.load("fs_metrics")
 
 def print_separator(title):
     """Print a formatted separator with title"""
@@ -68,19 +76,18 @@ def section_2_file_operations():
     print(f"  Is file: {os.path.isfile('test1.txt')}")
     print(f"  Is directory: {os.path.isdir('temp_folder')}")
 
-def section_3_advanced_operations():
-    """Section 3: Advanced Operations"""
+def section_3_advanced_operations(workers=1):
+    """Section 3: Advanced Operations
+
+    With workers > 1 the tree is listed by tree_walker.parallel_walk.
+    The tree is streamed by tree_render in large writes, not one print()
+    per entry.
+    """
     print_separator("SECTION 3: ADVANCED OPERATIONS")
     
     print("3.1 Walking Directory Tree:")
     print("Directory structure:")
-    for root, dirs, files in os.walk('.'):
-        level = root.replace('.', '').count(os.sep)
-        indent = ' ' * 2 * level
-        print(f"{indent}{os.path.basename(root)}/")
-        subindent = ' ' * 2 * (level + 1)
-        for file in files:
-            print(f"{subindent}{file}")
+    tree_render.render('.', sys.stdout, "tree", workers=workers)
     
     print("\n3.2 File Permissions:")
     for file in os.listdir('.'):
@@ -103,8 +110,11 @@ def section_3_advanced_operations():
     print(f"  Name without ext: {os.path.splitext(os.path.basename(sample_path))[0]}")
     print(f"  Extension: {os.path.splitext(sample_path)[1]}")
 
-def section_4_practical_exercises():
-    """Section 4: Practical Exercises"""
+def section_4_practical_exercises(cache_path=None):
+    """Section 4: Practical Exercises
+
+    With cache_path the file counter reads the listing from a tree_cache.
+    """
     print_separator("SECTION 4: PRACTICAL EXERCISES")
     
     print("Exercise 1: File Organizer")
@@ -135,11 +145,19 @@ def section_4_practical_exercises():
     file_count = 0
     dir_count = 0
     
-    for item in os.listdir('.'):
-        if os.path.isfile(item):
-            file_count += 1
-        elif os.path.isdir(item):
-            dir_count += 1
+    if cache_path:
+        with tree_cache.TreeCache(cache_path) as cache:
+            for name, kind in cache.listdir('.'):
+                if kind == tree_cache.KIND_FILE:
+                    file_count += 1
+                elif kind == tree_cache.KIND_DIR:
+                    dir_count += 1
+    else:
+        for item in os.listdir('.'):
+            if os.path.isfile(item):
+                file_count += 1
+            elif os.path.isdir(item):
+                dir_count += 1
     
     print(f"  Files: {file_count}")
     print(f"  Directories: {dir_count}")
@@ -153,6 +171,14 @@ def section_4_practical_exercises():
             print(f"  {file}: {size} bytes")
     
     print(f"  Total size: {total_size} bytes ({total_size/1024:.2f} KB)")
+    
+    print("\nExercise 4: Recursive Disk Usage (du)")
+    usage = disk_usage.du('.', top_n=3)
+    print(f"  Apparent size: {usage['apparent']} bytes in {usage['files']} files")
+    print(f"  Allocated on disk: {disk_usage.format_size(usage['allocated'])}")
+    print("  Largest directories:")
+    for allocated, apparent, path in usage['largest']:
+        print(f"    {disk_usage.format_size(allocated):>8}  {path}")
 
 def section_5_cleanup():
     """Section 5: Cleanup"""
@@ -169,8 +195,8 @@ def section_5_cleanup():
                 os.remove(item)
                 print(f"  Removed file: {item}")
             elif os.path.isdir(item):
-                shutil.rmtree(item)
-                print(f"  Removed directory: {item}")
+                stats = fast_delete.remove_tree(item)
+                print(f"  Removed directory: {item} ({stats['files']} files)")
         except Exception as e:
             print(f"  Error removing {item}: {e}")
 
@@ -237,20 +263,39 @@ def interactive_practice():
         else:
             print("Invalid choice. Please try again.")
 
-def main():
-    """Main function to run the OS module mastery program"""
+def main(sections=None):
+    """Main function to run the OS module mastery program
+
+    sections is a list of section numbers to run instead of all of them
+    followed by the interactive practice.
+    """
     print("🐍 PYTHON OS MODULE MASTERY PROGRAM 🐍")
     print("This program will teach you the OS module through practical examples!")
     
-    # Run all sections
-    section_1_basic_operations()
-    section_2_file_operations()
-    section_3_advanced_operations()
-    section_4_practical_exercises()
-    section_5_cleanup()
+    # Set OS_METRICS=<file.json|file.prom> to record filesystem call metrics
+    metrics_path = os.environ.get("OS_METRICS")
+    if metrics_path:
+        fs_metrics.enable()
+    try:
+        # Run all sections
+        for number in sections or range(1, len(SECTIONS) + 1):
+            SECTIONS[number - 1]()
+    finally:
+        if metrics_path:
+            fs_metrics.finish(metrics_path)
     
-    # Interactive practice
-    interactive_practice()
+    # Interactive practice, only when run from a terminal
+    if not sections and sys.stdin.isatty():
+        interactive_practice()
+
+SECTIONS = [
+    section_1_basic_operations,
+    section_2_file_operations,
+    section_3_advanced_operations,
+    section_4_practical_exercises,
+    section_5_cleanup,
+]
 
 if __name__ == "__main__":
-    main()
+    # python oops.py [number ...] runs only those sections
+    main([int(arg) for arg in sys.argv[1:]])
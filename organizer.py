@@ -0,0 +1,221 @@
+"""
+File Organizer
+==============
+Organizes a directory into one subdirectory per file extension in two steps:
+plan() lists the directory once and decides every move, execute() creates
+each target directory once and renames files relative to an open directory
+fd. A journal next to the files records the plan and progress, so an
+interrupted run can be resumed or rolled back.
+"""
+
+import os
+import sys
+import json
+import errno
+import ctypes
+import ctypes.util
+
+import copy_engine
+
+JOURNAL_NAME = ".organize_journal.jsonl"
+CHECKPOINT_EVERY = 1000
+NO_EXTENSION = "no_extension"
+
+RENAME_NOREPLACE = 1
+
+def extension_category(name, entry=None):
+    """Default classifier: the file extension without its dot"""
+    _, ext = os.path.splitext(name)
+    return ext[1:] if ext else NO_EXTENSION
+
+def _load_renameat2():
+    """Return libc's renameat2 if this is Linux with glibc >= 2.28"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        func = libc.renameat2
+    except (OSError, AttributeError):
+        return None
+    func.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+    return func
+
+_renameat2 = _load_renameat2()
+
+def rename_noreplace(src, dst, dir_fd):
+    """Rename src to dst (both relative to dir_fd) without replacing dst"""
+    if _renameat2 is not None:
+        if _renameat2(dir_fd, os.fsencode(src), dir_fd, os.fsencode(dst), RENAME_NOREPLACE) == 0:
+            return
+        err = ctypes.get_errno()
+        if err not in (errno.ENOSYS, errno.EINVAL):
+            raise OSError(err, os.strerror(err), src, None, dst)
+    # No renameat2 (or unsupported filesystem): check, then rename
+    try:
+        os.stat(dst, dir_fd=dir_fd, follow_symlinks=False)
+    except FileNotFoundError:
+        os.rename(src, dst, src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+        return
+    raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), src, None, dst)
+
+def plan(directory, classify=extension_category):
+    """Decide every move for directory without touching anything.
+
+    classify(name, entry) returns the target subdirectory name of a file.
+    Returns a plan dict with the target directories and (src, dst) moves,
+    both relative to directory.
+    """
+    moves = []
+    dirs = set()
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name == JOURNAL_NAME or not entry.is_file():
+                continue
+            category = classify(entry.name, entry)
+            dirs.add(category)
+            moves.append((entry.name, os.path.join(category, entry.name)))
+    return {"directory": directory, "dirs": sorted(dirs), "moves": moves}
+
+def _journal_path(directory):
+    return os.path.join(directory, JOURNAL_NAME)
+
+def write_journal(job):
+    """Write the plan to the journal in one buffered pass, then fsync it"""
+    path = _journal_path(job["directory"])
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(json.dumps({"dirs": job["dirs"], "moves": len(job["moves"])}) + "\n")
+        for move in job["moves"]:
+            f.write(json.dumps(move) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return path
+
+def read_journal(directory):
+    """Load (plan, done) from a journal, or None if there is none"""
+    try:
+        f = open(_journal_path(directory))
+    except FileNotFoundError:
+        return None
+    with f:
+        header = json.loads(f.readline())
+        moves = []
+        done = 0
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break   # checkpoint cut short by the interruption
+            if isinstance(record, dict):
+                done = max(done, record.get("done", 0))
+            elif len(moves) < header["moves"]:
+                moves.append(tuple(record))
+    return {"directory": directory, "dirs": header["dirs"], "moves": moves}, done
+
+def _checkpoint(journal, done):
+    journal.write(json.dumps({"done": done}) + "\n")
+    journal.flush()
+
+def _move(src, dst, dir_fd, directory):
+    """Rename within the filesystem, or copy and unlink across devices"""
+    try:
+        rename_noreplace(src, dst, dir_fd)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        copy_engine.copy_file(os.path.join(directory, src), os.path.join(directory, dst))
+        os.unlink(src, dir_fd=dir_fd)
+
+def execute(job, start=0, journal=True, on_move=None, on_error=None):
+    """Carry out a plan, checkpointing progress in the journal.
+
+    on_move(src, dst) is called after each move; on_error(src, dst, error)
+    for moves that failed (they are left in place). Returns a stats dict.
+    """
+    directory = job["directory"]
+    moves = job["moves"]
+    stats = {"moved": 0, "skipped": 0, "errors": 0, "dirs_created": 0}
+    if journal and start == 0:
+        write_journal(job)
+    
+    dir_fd = os.open(directory, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+    journal_file = open(_journal_path(directory), 'a') if journal else None
+    try:
+        for name in job["dirs"]:
+            try:
+                os.mkdir(name, dir_fd=dir_fd)
+                stats["dirs_created"] += 1
+            except FileExistsError:
+                pass
+        
+        for index in range(start, len(moves)):
+            src, dst = moves[index]
+            try:
+                _move(src, dst, dir_fd, directory)
+            except FileNotFoundError:
+                # Already moved by the run that was interrupted
+                stats["skipped"] += 1
+            except OSError as e:
+                stats["errors"] += 1
+                if on_error is not None:
+                    on_error(src, dst, e)
+            else:
+                stats["moved"] += 1
+                if on_move is not None:
+                    on_move(src, dst)
+            if journal_file is not None and (index + 1) % CHECKPOINT_EVERY == 0:
+                _checkpoint(journal_file, index + 1)
+    finally:
+        os.close(dir_fd)
+        if journal_file is not None:
+            journal_file.close()
+    
+    if journal:
+        os.unlink(_journal_path(directory))
+    return stats
+
+def resume(directory, on_move=None, on_error=None):
+    """Finish an interrupted run from its journal; None if there is none"""
+    journal = read_journal(directory)
+    if journal is None:
+        return None
+    job, done = journal
+    return execute(job, start=done, on_move=on_move, on_error=on_error)
+
+def rollback(directory):
+    """Undo an interrupted run: move files back and remove empty directories"""
+    journal = read_journal(directory)
+    if journal is None:
+        return None
+    job, _ = journal
+    stats = {"restored": 0, "dirs_removed": 0}
+    dir_fd = os.open(directory, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+    try:
+        # Moves after the last checkpoint may or may not have happened
+        for src, dst in reversed(job["moves"]):
+            try:
+                _move(dst, src, dir_fd, directory)
+                stats["restored"] += 1
+            except (FileNotFoundError, FileExistsError):
+                continue
+        for name in job["dirs"]:
+            try:
+                os.rmdir(name, dir_fd=dir_fd)
+                stats["dirs_removed"] += 1
+            except OSError:
+                continue
+    finally:
+        os.close(dir_fd)
+    os.unlink(_journal_path(directory))
+    return stats
+
+def organize(directory, classify=extension_category, on_move=None, on_error=None):
+    """Organize directory, resuming an interrupted run if there is one"""
+    stats = resume(directory, on_move, on_error)
+    if stats is not None:
+        stats["resumed"] = True
+        return stats
+    stats = execute(plan(directory, classify), on_move=on_move, on_error=on_error)
+    stats["resumed"] = False
+    return stats
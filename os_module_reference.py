@@ -5,8 +5,8 @@ A comprehensive reference of all important os module functions with examples.
 """
 
 import os
+import sys
 import time
-import shutil
 
 def print_header(title):
     """Print a formatted header"""
@@ -209,6 +209,20 @@ def practical_examples():
     print("   import time")
     print("   file_age = time.time() - os.path.getmtime('file.txt')")
     print("   is_old = file_age > 24 * 3600")
+    
+    print("\n7. Get recursive directory sizes in one pass (du-style):")
+    print("   import disk_usage")
+    print("   usage = disk_usage.du('.', top_n=5)")
+    print("   print(usage['apparent'], usage['allocated'])  # st_size vs st_blocks")
+    print("   for allocated, apparent, path in usage['largest']:")
+    print("       print(disk_usage.format_size(allocated), path)")
+    
+    print("\n8. Query a saved scan instead of walking the tree again:")
+    print("   import file_index, file_query as q")
+    print("   index = file_index.FileIndex.load('scan.idx')")
+    print("   old = q.select(index, q.file_type('f'), q.older_than(30 * 24 * 3600))")
+    print("   for row in q.largest(index, 10, q.extension('.log')):")
+    print("       print(index.size[row], index.path(row))")
 
 def common_patterns():
     """Common patterns and best practices"""
@@ -243,21 +257,31 @@ def common_patterns():
     print("       if os.path.exists('temp.txt'):")
     print("           os.remove('temp.txt')")
 
-def main():
-    """Display the complete OS module reference"""
+SECTIONS = {
+    "basic": basic_operations_reference,
+    "files": file_operations_reference,
+    "dirs": directory_operations_reference,
+    "paths": path_operations_reference,
+    "env": environment_reference,
+    "process": process_operations_reference,
+    "permissions": file_permissions_reference,
+    "advanced": advanced_operations_reference,
+    "examples": practical_examples,
+    "patterns": common_patterns,
+}
+
+def main(sections=None):
+    """Display the complete OS module reference, or only the named sections"""
+    if sections:
+        for name in sections:
+            SECTIONS[name]()
+        return
+    
     print("🐍 PYTHON OS MODULE COMPLETE REFERENCE 🐍")
     print("This reference covers all important os module functions and patterns!")
     
-    basic_operations_reference()
-    file_operations_reference()
-    directory_operations_reference()
-    path_operations_reference()
-    environment_reference()
-    process_operations_reference()
-    file_permissions_reference()
-    advanced_operations_reference()
-    practical_examples()
-    common_patterns()
+    for section in SECTIONS.values():
+        section()
     
     print("\n" + "="*60)
     print("  REFERENCE COMPLETE!")
@@ -265,4 +289,5 @@ def main():
     print("="*60)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    # python os_module_reference.py [section ...], e.g. "paths examples"
+    main(sys.argv[1:])
\ No newline at end of file
@@ -5,12 +5,39 @@ More challenging exercises to master the os module
 """
 
 import os
+import sys
 import time
-import shutil
-import glob
 
-def exercise_1_file_backup():
-    """Exercise 1: Create a file backup system"""
+import lazy_modules
+
+# Loaded on first use, so running one exercise only imports what it needs
+chunk_store = lazy_modules.load("chunk_store")
+backup_index = lazy_modules.load("backup_index")
+backup_archive = lazy_modules.load("backup_archive")
+copy_engine = lazy_modules.load("copy_engine")
+tree_walker = lazy_modules.load("tree_walker")
+tree_render = lazy_modules.load("tree_render")
+tree_cache = lazy_modules.load("tree_cache")
+file_monitor = lazy_modules.load("file_monitor")
+organizer = lazy_modules.load("organizer")
+file_types = lazy_modules.load("file_types")
+duplicates = lazy_modules.load("duplicates")
+retention = lazy_modules.load("retention")
+fast_delete = lazy_modules.load("fast_delete")
+path_batch = lazy_modules.load("path_batch")
+file_index = lazy_modules.load("file_index")
+fs_metrics = lazy_modules.load("fs_metrics")
+
+def exercise_1_file_backup(mode="copy", workers=None):
+    """Exercise 1: Create a file backup system
+
+    mode="copy" writes one full copy per file per run, mode="dedup" stores
+    the files in a content-addressed chunk store under backup_dir/store,
+    mode="incremental" only copies files that changed since the last run and
+    mode="archive" streams the whole run into one compressed archive file.
+    Copies (and archive compression) run on a pool of `workers` threads
+    (default: copy_engine.DEFAULT_WORKERS).
+    """
     print("=" * 50)
     print("EXERCISE 1: FILE BACKUP SYSTEM")
     print("=" * 50)
@@ -33,17 +60,69 @@ def exercise_1_file_backup():
     
     # Backup files with timestamp
     timestamp = time.strftime("%Y%m%d_%H%M%S")
+    workers = workers or copy_engine.DEFAULT_WORKERS
+    if mode == "dedup":
+        store_dir = os.path.join(backup_dir, "store")
+        source_paths = [os.path.join(source_dir, file) for file in source_files]
+        manifest_path, stats = chunk_store.backup_files(
+            source_paths, store_dir, base_dir=source_dir, run_id=timestamp)
+        print(f"Backed up {stats['files']} files -> {manifest_path}")
+        print(f"  New chunks: {stats['chunks_new']}, reused chunks: {stats['chunks_reused']}")
+        print(f"  Bytes written: {stats['bytes_written']} of {stats['bytes_read']} read")
+        print(f"Backup completed in {store_dir}/")
+        return
+    
+    if mode == "archive":
+        def report_file(record):
+            print(f"Archived: {record['path']} ({record['size']} bytes)")
+        
+        archive_path, stats = backup_archive.backup_to_archive(
+            source_dir, backup_dir, timestamp, workers, on_file=report_file)
+        print(f"Backed up {stats['files']} files -> {archive_path}")
+        print(f"  Bytes written: {stats['bytes_written']} of {stats['bytes_read']} read")
+        return
+    
+    if mode == "incremental":
+        def report_error(path, depth, error):
+            print(f"Error backing up {path}: {error}")
+        
+        stats = backup_index.incremental_backup(source_dir, backup_dir, timestamp=timestamp,
+                                                on_error=report_error)
+        print(f"Scanned {stats['scanned']} files: {stats['copied']} copied, "
+              f"{stats['unchanged']} unchanged, {stats['hashed']} hashed, "
+              f"{stats['removed']} removed, {stats['errors']} errors")
+        print(f"Backup completed in {backup_dir}/")
+        return
+    
+    pairs = []
     for file in source_files:
         source_path = os.path.join(source_dir, file)
         backup_path = os.path.join(backup_dir, f"{file}.{timestamp}")
-        
-        shutil.copy2(source_path, backup_path)
-        print(f"Backed up: {file} -> {file}.{timestamp}")
+        pairs.append((source_path, backup_path))
+    
+    def report(source_path, backup_path, size, method):
+        print(f"Backed up: {os.path.basename(source_path)} -> "
+              f"{os.path.basename(backup_path)} ({method})")
+    
+    stats = copy_engine.parallel_copy(pairs, workers=workers, on_done=report)
+    for source_path, _, error in stats["errors"]:
+        print(f"Error backing up {source_path}: {error}")
     
     print(f"Backup completed in {backup_dir}/")
+    print(f"  {copy_engine.format_throughput(stats)}")
+
+def exercise_2_file_organizer(classify="extension", cache_path=None):
+    """Exercise 2: Organize files by extension
 
-def exercise_2_file_organizer():
-    """Exercise 2: Organize files by extension"""
+    classify="content" sorts by the magic bytes at the start of each file
+    instead, keeping the extension only for files without a known signature.
+    With cache_path, content types of unchanged files are remembered.
+    
+    Safe to run again: test files already organized by an earlier run are
+    not created a second time. Moves are renames within one directory, so
+    there is no workers option; the kernel serializes them on the directory
+    anyway.
+    """
     print("\n" + "=" * 50)
     print("EXERCISE 2: FILE ORGANIZER BY EXTENSION")
     print("=" * 50)
@@ -57,76 +136,89 @@ def exercise_2_file_organizer():
     organize_dir = "files_to_organize"
     os.makedirs(organize_dir, exist_ok=True)
     
-    # Create test files
+    # Create test files, except those an earlier run already organized
+    created = 0
     for file in test_files:
-        file_path = os.path.join(organize_dir, file)
-        with open(file_path, 'w') as f:
-            f.write(f"Content for {file}")
-    
-    print(f"Created {len(test_files)} test files in {organize_dir}/")
-    
-    # Organize files by extension
-    for file in os.listdir(organize_dir):
-        if os.path.isfile(os.path.join(organize_dir, file)):
-            # Get file extension
-            _, ext = os.path.splitext(file)
-            ext = ext[1:] if ext else "no_extension"  # Remove the dot
-            
-            # Create extension directory
-            ext_dir = os.path.join(organize_dir, ext)
-            os.makedirs(ext_dir, exist_ok=True)
-            
-            # Move file to appropriate directory
-            old_path = os.path.join(organize_dir, file)
-            new_path = os.path.join(ext_dir, file)
-            shutil.move(old_path, new_path)
-            print(f"Moved {file} to {ext}/ directory")
+        content = f"Content for {file}"
+        organized = os.path.join(organize_dir, organizer.extension_category(file), file)
+        try:
+            with open(organized) as f:
+                if f.read() == content:
+                    continue
+        except OSError:
+            pass
+        with open(os.path.join(organize_dir, file), 'w') as f:
+            f.write(content)
+        created += 1
+    
+    print(f"Created {created} test files in {organize_dir}/")
+    
+    # Organize files by extension: plan every move, then execute the plan
+    def report(src, dst):
+        print(f"Moved {src} to {os.path.dirname(dst)}/ directory")
+    
+    def report_error(src, dst, error):
+        print(f"Error moving {src}: {error}")
+    
+    if classify == "content":
+        with file_types.ContentClassifier(cache_path) as classifier:
+            stats = organizer.organize(organize_dir, classifier, report, report_error)
+    else:
+        stats = organizer.organize(organize_dir, on_move=report, on_error=report_error)
+    if stats["resumed"]:
+        print("Resumed an interrupted run from its journal")
+    print(f"Moved {stats['moved']} files into {stats['dirs_created']} new directories")
+
+def exercise_3_directory_scanner(workers=1, cache_path=None, index_path=None):
+    """Exercise 3: Advanced directory scanner
 
-def exercise_3_directory_scanner():
-    """Exercise 3: Advanced directory scanner"""
+    With workers > 1 directories are listed on a thread pool, which helps
+    on high-latency filesystems such as NFS. The output order is the same.
+    With cache_path, unchanged directories are served from a tree_cache.
+    With index_path, the scan is also kept as a file_index saved there.
+    """
     print("\n" + "=" * 50)
     print("EXERCISE 3: ADVANCED DIRECTORY SCANNER")
     print("=" * 50)
     
-    def scan_directory(path=".", max_depth=3, current_depth=0):
-        """Recursively scan directory with depth limit"""
-        if current_depth > max_depth:
-            return
+    def scan_directory(path=".", max_depth=3):
+        """Scan directory tree with depth limit"""
+        # Entries are streamed to stdout in large writes, errors in between
+        writer = tree_render.TreeWriter(sys.stdout, "tree", sizes=True, icons=True)
+        report_error = writer.error
         
-        try:
-            items = os.listdir(path)
-            files = []
-            dirs = []
-            
-            for item in items:
-                item_path = os.path.join(path, item)
-                if os.path.isfile(item_path):
-                    files.append(item)
-                elif os.path.isdir(item_path):
-                    dirs.append(item)
-            
-            # Print current level
-            indent = "  " * current_depth
-            print(f"{indent}📁 {os.path.basename(path)}/")
-            
-            # Print files
-            for file in files:
-                file_path = os.path.join(path, file)
-                size = os.path.getsize(file_path)
-                print(f"{indent}  📄 {file} ({size} bytes)")
-            
-            # Recursively scan subdirectories
-            for dir_name in dirs:
-                dir_path = os.path.join(path, dir_name)
-                scan_directory(dir_path, max_depth, current_depth + 1)
-                
-        except PermissionError:
-            print(f"{indent}❌ Permission denied: {path}")
-        except Exception as e:
-            print(f"{indent}❌ Error scanning {path}: {e}")
+        if cache is not None:
+            events = cache.walk(path, max_depth, report_error)
+        elif workers > 1:
+            events = tree_walker.parallel_walk(path, max_depth, report_error,
+                                               workers=workers, ordered=True)
+        else:
+            events = tree_walker.walk(path, max_depth, report_error)
+        
+        for kind, depth, dir_path, entry in events:
+            if index is not None:
+                try:
+                    index.record(kind, depth, dir_path, entry)
+                except OSError:
+                    pass   # reported below when the entry is written
+            if kind != tree_walker.OTHER:
+                writer.write_event(kind, depth, dir_path, entry)
+        writer.flush()
     
     print("Scanning current directory structure:")
-    scan_directory()
+    cache = tree_cache.TreeCache(cache_path) if cache_path else None
+    index = file_index.FileIndex(".") if index_path else None
+    try:
+        scan_directory()
+    finally:
+        if cache is not None:
+            print(f"Cache: {cache.hits} directories reused, {cache.misses} listed")
+            cache.close()
+    
+    if index is not None:
+        index.finish()
+        index.save(index_path)
+        print(f"Index: {len(index)} entries in {index.nbytes()} bytes saved to {index_path}")
 
 def exercise_4_file_monitor():
     """Exercise 4: Simple file change monitor"""
@@ -148,19 +240,23 @@ def exercise_4_file_monitor():
     initial_stat = os.stat(test_file)
     print(f"Initial modification time: {time.ctime(initial_stat.st_mtime)}")
     
-    # Simulate file change
-    print("Waiting 2 seconds, then modifying file...")
-    time.sleep(2)
-    
-    with open(test_file, 'a') as f:
-        f.write("\nModified content")
+    with file_monitor.FileMonitor(monitor_dir) as monitor:
+        print(f"Watching {monitor_dir}/ using {monitor.kind}")
+        
+        # Simulate file change
+        print("Modifying file...")
+        with open(test_file, 'a') as f:
+            f.write("\nModified content")
+        
+        # Wait for the change to be reported
+        changes = monitor.wait(timeout=5)
     
-    # Check for changes
     new_stat = os.stat(test_file)
     print(f"New modification time: {time.ctime(new_stat.st_mtime)}")
     
-    if new_stat.st_mtime > initial_stat.st_mtime:
-        print("✅ File was modified!")
+    if changes:
+        for kind, path in changes:
+            print(f"✅ {path} was {kind}!")
         print(f"File size changed from {initial_stat.st_size} to {new_stat.st_size} bytes")
     else:
         print("❌ No changes detected")
@@ -180,10 +276,8 @@ def exercise_5_path_utilities():
         return os.path.relpath(to_path, from_path)
     
     def is_subdirectory(parent, child):
-        """Check if child is a subdirectory of parent"""
-        parent = normalize_path(parent)
-        child = normalize_path(child)
-        return child.startswith(parent)
+        """Check if child is a subdirectory of parent (whole components only)"""
+        return path_batch.is_subpath(parent, child)
     
     # Test paths
     test_paths = [
@@ -217,12 +311,21 @@ def exercise_5_path_utilities():
     children = [
         "/home/user/documents",
         "/home/user/documents/work",
-        "/home/other"
+        "/home/other",
+        "/home/username"
     ]
     
     for child in children:
         is_sub = is_subdirectory(parent, child)
         print(f"  {child} is subdirectory of {parent}: {is_sub}")
+    
+    # The same operations over a whole batch of paths at once
+    print("\nBatch examples:")
+    print(f"  Normalized: {path_batch.normalize_paths(test_paths)}")
+    print(f"  Relative to {base_path}: {path_batch.relative_paths(target_paths, base_path)}")
+    roots = path_batch.RootTrie(["/home/user", "/home/user/documents", "/home/other"])
+    for child, root in zip(children, roots.match(children)):
+        print(f"  {child} lies under: {root}")
 
 def exercise_6_environment_explorer():
     """Exercise 6: Environment variables explorer"""
@@ -262,8 +365,78 @@ def exercise_6_environment_explorer():
     
     analyze_environment()
 
-def cleanup_exercises():
-    """Clean up all exercise directories"""
+def exercise_7_duplicate_finder(link=None, workers=0):
+    """Exercise 7: Find files with identical contents
+
+    Scans the trees left behind by the other exercises. With link="hardlink"
+    or link="reflink", every duplicate is replaced by a link to the first
+    copy. workers > 0 hashes on a process pool.
+    """
+    print("\n" + "=" * 50)
+    print("EXERCISE 7: DUPLICATE FILE FINDER")
+    print("=" * 50)
+    
+    def report_error(path, depth, error):
+        print(f"Error reading {path}: {error}")
+    
+    for top in ["source_files", "backup_files", "files_to_organize"]:
+        if not os.path.isdir(top):
+            continue
+        seen = {}
+        groups = list(duplicates.find_duplicates(top, workers=workers, on_error=report_error,
+                                                 seen=seen))
+        copies = sum(len(paths) - 1 for _, paths in groups)
+        print(f"\n{top}/: {len(groups)} sets of duplicates, {copies} redundant copies")
+        for size, paths in groups:
+            print(f"  {size} bytes: {', '.join(paths)}")
+        
+        if link and groups:
+            stats = duplicates.link_duplicates(groups, link, on_error=report_error, seen=seen)
+            print(f"Replaced {stats['linked']} duplicates with {link}s, "
+                  f"saving {stats['bytes_saved']} bytes")
+            if stats["changed"]:
+                print(f"Skipped {stats['changed']} files changed since they were hashed")
+
+def exercise_8_backup_retention(keep_last=3, daily=7, max_bytes=None, dry_run=False):
+    """Exercise 8: Prune old timestamped backups with a retention policy
+
+    Simulates two weeks of backups taken every 6 hours, then keeps the
+    newest keep_last backups of each file plus one per day for `daily` days.
+    """
+    print("\n" + "=" * 50)
+    print("EXERCISE 8: BACKUP RETENTION")
+    print("=" * 50)
+    
+    backup_dir = "backup_files"
+    source_dir = "source_files"
+    if not os.path.isdir(source_dir):
+        print("Run exercise 1 first to create source_files/")
+        return
+    
+    # Back every source file up with timestamps spread over two weeks
+    now = time.time()
+    for step in range(14 * 4):
+        timestamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(now - step * 6 * 3600))
+        for entry in tree_walker.iter_files(source_dir):
+            backup_path = os.path.join(backup_dir, f"{entry.name}.{timestamp}")
+            if not os.path.exists(backup_path):
+                copy_engine.copy_file(entry.path, backup_path)
+    
+    def report(path, size):
+        action = "Would delete" if dry_run else "Deleted"
+        print(f"{action}: {os.path.basename(path)} ({size} bytes)")
+    
+    stats = retention.prune(backup_dir, keep_last=keep_last, daily=daily, max_bytes=max_bytes,
+                            dry_run=dry_run, on_delete=report)
+    print(f"{stats['backups']} backups: {stats['kept']} kept, {stats['deleted']} "
+          f"{'to delete' if dry_run else 'deleted'}, {stats['bytes_freed']} bytes freed")
+
+def cleanup_exercises(background=False):
+    """Clean up all exercise directories
+
+    Trees are deleted with fast_delete; with background=True they are
+    renamed out of the way and deleted on background threads instead.
+    """
     print("\n" + "=" * 50)
     print("CLEANING UP EXERCISE FILES")
     print("=" * 50)
@@ -273,34 +446,61 @@ def cleanup_exercises():
         "monitor_test"
     ]
     
+    def report_progress(stats):
+        print(f"  ... {stats['files']} files, {stats['dirs']} directories removed", end="\r")
+    
+    def report_error(path, depth, error):
+        print(f"Error removing {path}: {error}")
+    
     for dir_name in dirs_to_remove:
         if os.path.exists(dir_name):
             try:
-                shutil.rmtree(dir_name)
-                print(f"Removed directory: {dir_name}")
+                if background:
+                    fast_delete.remove_tree_later(dir_name, on_error=report_error)
+                    print(f"Removing directory in the background: {dir_name}")
+                    continue
+                stats = fast_delete.remove_tree(dir_name, on_progress=report_progress,
+                                                on_error=report_error)
+                print(f"Removed directory: {dir_name} ({stats['files']} files)   ")
             except Exception as e:
                 print(f"Error removing {dir_name}: {e}")
 
-def main():
-    """Run all exercises"""
+def main(cleanup=None, exercises=None):
+    """Run all exercises
+
+    exercises is a list of exercise numbers to run instead of the default
+    set. cleanup=True/False skips the question at the end; without a
+    terminal (cron, pipes) files are kept. See fsctl for single
+    non-interactive tasks.
+    """
     print("🐍 ADDITIONAL OS MODULE PRACTICE EXERCISES 🐍")
     print("These exercises will help you master advanced OS operations!")
+    # Set OS_METRICS=<file.json|file.prom> to record filesystem call metrics
+    metrics_path = os.environ.get("OS_METRICS")
+    if metrics_path:
+        fs_metrics.enable()
     
     try:
-        exercise_1_file_backup()
-        # exercise_2_file_organizer()
-        # exercise_3_directory_scanner()
-        # exercise_4_file_monitor()
-        # exercise_5_path_utilities()
-        # exercise_6_environment_explorer()
+        for number in exercises or []:
+            EXERCISES[number - 1]()
+        if not exercises:
+            exercise_1_file_backup()
+            # exercise_2_file_organizer()
+            # exercise_3_directory_scanner()
+            # exercise_4_file_monitor()
+            # exercise_5_path_utilities()
+            # exercise_6_environment_explorer()
+            # exercise_7_duplicate_finder()
+            # exercise_8_backup_retention()
         
         print("\n" + "=" * 50)
         print("ALL EXERCISES COMPLETED!")
         print("=" * 50)
         
-        # Ask if user wants to clean up
-        cleanup = input("\nDo you want to clean up exercise files? (y/n): ").lower()
-        if cleanup == 'y':
+        # Ask if user wants to clean up (only when someone is there to answer)
+        if cleanup is None and sys.stdin.isatty():
+            cleanup = input("\nDo you want to clean up exercise files? (y/n): ").lower() == 'y'
+        if cleanup:
             cleanup_exercises()
         else:
             print("Exercise files preserved for further practice.")
@@ -308,6 +508,21 @@ def main():
     except KeyboardInterrupt:
         print("\n\nExercise interrupted by user.")
         cleanup_exercises()
+    finally:
+        if metrics_path:
+            fs_metrics.finish(metrics_path)
+
+EXERCISES = [
+    exercise_1_file_backup,
+    exercise_2_file_organizer,
+    exercise_3_directory_scanner,
+    exercise_4_file_monitor,
+    exercise_5_path_utilities,
+    exercise_6_environment_explorer,
+    exercise_7_duplicate_finder,
+    exercise_8_backup_retention,
+]
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    # python os_practice_exercises.py [number ...] runs only those exercises
+    main(exercises=[int(arg) for arg in sys.argv[1:]])
\ No newline at end of file
@@ -0,0 +1,147 @@
+"""
+Batch Path Utilities
+====================
+Bulk versions of the exercise_5 path helpers for lists of millions of
+paths, such as the output of a tree scan. Paths from one scan share most
+of their directories, so each distinct parent directory is split and
+relativized only once, and its components are interned so equal names
+share one string object. Containment is decided component by component with a trie
+of roots, so /home/username is not mistaken for a child of /home/user.
+"""
+
+import os
+
+# Distinct parent directories remembered before the cache is reset
+MAX_CACHED_DIRS = 65536
+
+class PathInterner:
+    """Splits paths into tuples of shared, interned components"""
+    
+    def __init__(self, max_cached_dirs=MAX_CACHED_DIRS):
+        self.names = {}
+        self.dirs = {}
+        self.max_cached_dirs = max_cached_dirs
+    
+    def intern(self, name):
+        return self.names.setdefault(name, name)
+    
+    def _split_dir(self, directory):
+        parts = self.dirs.get(directory)
+        if parts is None:
+            if len(self.dirs) >= self.max_cached_dirs:
+                self.dirs.clear()
+            names = directory.split(os.sep)
+            if len(names) > 1 and not names[-1]:
+                names.pop()   # the filesystem root itself, e.g. "/"
+            parts = tuple(self.intern(name) for name in names)
+            self.dirs[directory] = parts
+        return parts
+    
+    def split(self, path):
+        """Split a normalized path into a tuple of interned components"""
+        directory, name = os.path.split(path)
+        if not name:
+            return self._split_dir(directory)
+        if not directory:
+            return (self.intern(name),)
+        return self._split_dir(directory) + (self.intern(name),)
+
+def normalize_paths(paths, base=None):
+    """Return the absolute, normalized form of every path.
+
+    Relative paths are resolved against base (default: the current
+    directory, looked up once instead of once per path).
+    """
+    base = base or os.getcwd()
+    join = os.path.join
+    normpath = os.path.normpath
+    return [normpath(join(base, path)) for path in paths]
+
+def _relative_parts(parts, start_parts):
+    """Relative path from start_parts to parts, and how many parts they share"""
+    common = 0
+    for a, b in zip(start_parts, parts):
+        if os.path.normcase(a) != os.path.normcase(b):
+            break
+        common += 1
+    rel = [os.pardir] * (len(start_parts) - common) + list(parts[common:])
+    return (os.path.join(*rel) if rel else os.curdir), common
+
+def relative_paths(paths, start, interner=None):
+    """Return every path relative to start, like os.path.relpath in bulk.
+
+    The relative form of each distinct parent directory is computed once.
+    """
+    interner = interner or PathInterner()
+    base = os.getcwd()
+    start_parts = interner.split(normalize_paths([start], base)[0])
+    dirs = {}
+    result = []
+    for path in paths:
+        directory, name = os.path.split(path)
+        if name in ("", ".", ".."):
+            parts = interner.split(normalize_paths([path], base)[0])
+            result.append(_relative_parts(parts, start_parts)[0])
+            continue
+        rel_dir = dirs.get(directory)
+        if rel_dir is None:
+            if len(dirs) >= MAX_CACHED_DIRS:
+                dirs.clear()
+            parts = interner.split(os.path.normpath(os.path.join(base, directory)))
+            rel_dir, common = _relative_parts(parts, start_parts)
+            if common == len(parts) < len(start_parts):
+                rel_dir = parts   # an ancestor of start: the name may lead back into it
+            dirs[directory] = rel_dir
+        if isinstance(rel_dir, tuple):
+            parts = rel_dir + (interner.intern(name),)
+            result.append(_relative_parts(parts, start_parts)[0])
+        else:
+            result.append(name if rel_dir == os.curdir else os.path.join(rel_dir, name))
+    return result
+
+class RootTrie:
+    """A set of root directories answering "which root is this path under?" """
+    
+    def __init__(self, roots=(), interner=None):
+        self.interner = interner or PathInterner()
+        self.children = {}
+        self.roots = []
+        for root in roots:
+            self.add(root)
+    
+    def add(self, root):
+        """Add a root; returns its index in self.roots"""
+        node = self.children
+        for part in self.interner.split(normalize_paths([root])[0]):
+            node = node.setdefault(os.path.normcase(part), {})
+        if None not in node:
+            node[None] = len(self.roots)
+            self.roots.append(root)
+        return node[None]
+    
+    def match_parts(self, parts):
+        """Index of the deepest root containing the split path, or None"""
+        node = self.children
+        found = node.get(None)
+        for part in parts:
+            node = node.get(os.path.normcase(part))
+            if node is None:
+                break
+            found = node.get(None, found)
+        return found
+    
+    def match(self, paths, strict=False):
+        """For each path, the deepest root it lies under, or None.
+
+        With strict=True a path is not considered to lie under itself.
+        """
+        result = []
+        for path in normalize_paths(paths):
+            parts = self.interner.split(path)
+            index = self.match_parts(parts[:-1] if strict else parts)
+            result.append(None if index is None else self.roots[index])
+        return result
+
+def is_subpath(parent, child):
+    """Whether child is parent or lies below it, compared by component"""
+    return RootTrie([parent]).match([child])[0] is not None
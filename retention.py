@@ -0,0 +1,149 @@
+"""
+Backup Retention
+================
+Prunes timestamped backups named <file>.<YYYYmmdd_HHMMSS>, as written by
+exercise_1_file_backup and backup_archive. The backup tree is listed once
+and every name parsed once into a sorted index per backed-up file. The
+policy then keeps a backup if any rule selects it:
+
+    keep_last   the newest N backups of each file
+    hourly      the newest backup in each of the last N hours with backups
+    daily       ... days
+    weekly      ... ISO weeks
+    max_bytes   afterwards, drop the oldest kept backups until the total fits
+
+The newest backup of every file is always kept. Deletions run in parallel
+batches; dry_run only reports what would go and how many bytes it frees.
+"""
+
+import os
+import re
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import tree_walker
+
+BACKUP_NAME = re.compile(r"^(?P<name>.+)\.(?P<stamp>\d{8}_\d{6})$")
+DELETE_BATCH = 256
+DEFAULT_WORKERS = 8
+
+def build_index(backup_dir, on_error=None):
+    """Map each backed-up file to its backups as [(stamp, size, path)], oldest first"""
+    index = {}
+    for entry in tree_walker.iter_files(backup_dir, on_error=on_error):
+        match = BACKUP_NAME.match(entry.name)
+        if match is None:
+            continue
+        try:
+            size = entry.stat(follow_symlinks=False).st_size
+        except OSError as e:
+            if on_error is not None:
+                on_error(entry.path, 0, e)
+            continue
+        key = os.path.join(os.path.dirname(entry.path), match.group("name"))
+        index.setdefault(key, []).append((match.group("stamp"), size, entry.path))
+    for backups in index.values():
+        # The stamp format sorts chronologically as a plain string
+        backups.sort()
+    return index
+
+def _hour(stamp):
+    return stamp[:11]
+
+def _day(stamp):
+    return stamp[:8]
+
+def _week(stamp):
+    return datetime.date(int(stamp[:4]), int(stamp[4:6]), int(stamp[6:8])).isocalendar()[:2]
+
+def _select_buckets(backups, count, bucket, keep):
+    """Keep the newest backup of each of the newest `count` buckets"""
+    seen = None
+    for i in range(len(backups) - 1, -1, -1):
+        if count <= 0:
+            break
+        key = bucket(backups[i][0])
+        if key != seen:
+            seen = key
+            keep.add(i)
+            count -= 1
+
+def plan(index, keep_last=1, hourly=0, daily=0, weekly=0, max_bytes=None):
+    """Decide which backups to delete; returns a list of (stamp, size, path)"""
+    keep_last = max(1, keep_last or 0)
+    kept = []        # (stamp, size, path) that may still go to fit max_bytes
+    delete = []
+    total = 0
+    for backups in index.values():
+        keep = set(range(max(0, len(backups) - keep_last), len(backups)))
+        _select_buckets(backups, hourly, _hour, keep)
+        _select_buckets(backups, daily, _day, keep)
+        _select_buckets(backups, weekly, _week, keep)
+        for i, backup in enumerate(backups):
+            if i not in keep:
+                delete.append(backup)
+                continue
+            total += backup[1]
+            if i != len(backups) - 1:
+                kept.append(backup)
+    
+    if max_bytes is not None and total > max_bytes:
+        kept.sort()
+        for backup in kept:
+            if total <= max_bytes:
+                break
+            delete.append(backup)
+            total -= backup[1]
+    return delete
+
+def _delete_batch(paths):
+    errors = []
+    for path in paths:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            errors.append((path, e))
+    return errors
+
+def delete_paths(paths, workers=DEFAULT_WORKERS, batch_size=DELETE_BATCH):
+    """Unlink paths in parallel batches, return a list of (path, error)"""
+    batches = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+    errors = []
+    if len(batches) <= 1:
+        for batch in batches:
+            errors.extend(_delete_batch(batch))
+        return errors
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for batch_errors in pool.map(_delete_batch, batches):
+            errors.extend(batch_errors)
+    return errors
+
+def prune(backup_dir, keep_last=1, hourly=0, daily=0, weekly=0, max_bytes=None,
+          dry_run=False, workers=DEFAULT_WORKERS, on_delete=None, on_error=None):
+    """Apply a retention policy to backup_dir.
+
+    on_delete(path, size) is called for every backup chosen for deletion
+    (also in a dry run). Returns a stats dict with backups, kept, deleted,
+    bytes_freed and errors.
+    """
+    index = build_index(backup_dir, on_error)
+    doomed = plan(index, keep_last, hourly, daily, weekly, max_bytes)
+    stats = {"backups": sum(len(backups) for backups in index.values()),
+             "deleted": len(doomed), "bytes_freed": sum(size for _, size, _ in doomed),
+             "errors": []}
+    stats["kept"] = stats["backups"] - stats["deleted"]
+    if on_delete is not None:
+        for _, size, path in doomed:
+            on_delete(path, size)
+    if not dry_run:
+        stats["errors"] = delete_paths([path for _, _, path in doomed], workers)
+        sizes = {path: size for _, size, path in doomed}
+        for path, error in stats["errors"]:
+            stats["deleted"] -= 1
+            stats["kept"] += 1
+            stats["bytes_freed"] -= sizes[path]
+            if on_error is not None:
+                on_error(path, 0, error)
+    return stats
@@ -0,0 +1,250 @@
+"""
+Stat Poller
+===========
+Scalable polling for filesystems without change notifications (NFS, FUSE).
+Each directory keeps a compact snapshot of its files: one list of names plus
+array-backed (inode, size, mtime_ns) columns. A poll re-stats a directory's
+files relative to an open directory fd and compares whole columns at once,
+only walking entries one by one when something actually differs.
+
+Every directory has its own poll interval: it halves when the directory
+changes and grows when it stays quiet, so hot directories are checked often
+and cold ones rarely.
+"""
+
+import os
+import time
+import heapq
+import itertools
+from array import array
+
+CREATED = "created"
+MODIFIED = "modified"
+DELETED = "deleted"
+
+DEFAULT_MIN_INTERVAL = 1.0
+DEFAULT_MAX_INTERVAL = 60.0
+BACKOFF = 1.5
+
+O_DIRECTORY = getattr(os, "O_DIRECTORY", 0)
+STAT_DIR_FD = os.stat in os.supports_dir_fd
+
+class DirSnapshot:
+    """Files of one directory as parallel columns"""
+    
+    __slots__ = ("key", "names", "ino", "size", "mtime", "subdirs", "interval")
+    
+    def __init__(self, interval):
+        self.key = None
+        self.names = []
+        self.ino = array("Q")
+        self.size = array("q")
+        self.mtime = array("q")
+        self.subdirs = []
+        self.interval = interval
+
+def _dir_key(st):
+    return (st.st_ino, st.st_mtime_ns, st.st_ctime_ns)
+
+def scan_directory(path, snapshot):
+    """Fill a snapshot from a fresh listing of path"""
+    snapshot.key = _dir_key(os.stat(path))
+    names = []
+    ino = array("Q")
+    size = array("q")
+    mtime = array("q")
+    subdirs = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                    continue
+                st = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            names.append(entry.name)
+            ino.append(st.st_ino)
+            size.append(st.st_size)
+            mtime.append(st.st_mtime_ns)
+    snapshot.names = names
+    snapshot.ino = ino
+    snapshot.size = size
+    snapshot.mtime = mtime
+    snapshot.subdirs = subdirs
+
+def restat_columns(path, names):
+    """Stat known names again, return (ino, size, mtime) columns; size -1 if gone"""
+    ino = array("Q")
+    size = array("q")
+    mtime = array("q")
+    dir_fd = os.open(path, os.O_RDONLY | O_DIRECTORY) if STAT_DIR_FD else None
+    try:
+        for name in names:
+            try:
+                if dir_fd is not None:
+                    st = os.stat(name, dir_fd=dir_fd, follow_symlinks=False)
+                else:
+                    st = os.stat(os.path.join(path, name), follow_symlinks=False)
+            except OSError:
+                ino.append(0)
+                size.append(-1)
+                mtime.append(0)
+                continue
+            ino.append(st.st_ino)
+            size.append(st.st_size)
+            mtime.append(st.st_mtime_ns)
+    finally:
+        if dir_fd is not None:
+            os.close(dir_fd)
+    return ino, size, mtime
+
+class StatPoller:
+    """Poll a directory tree with per-directory adaptive intervals.
+
+    read() polls the directories that are due and returns a list of
+    (kind, path) changes; time_until_due() says when the next one is.
+    """
+    
+    def __init__(self, root, min_interval=DEFAULT_MIN_INTERVAL,
+                 max_interval=DEFAULT_MAX_INTERVAL):
+        self.root = root
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.dirs = {}     # directory path -> DirSnapshot
+        self.queue = []    # heap of (due time, sequence, directory path, snapshot)
+        self.sequence = itertools.count()
+        self.stats = {"polls": 0, "stats": 0, "rescans": 0}
+        self._add_tree(root, time.monotonic(), [], report=False)
+    
+    def fileno(self):
+        return None
+    
+    def file_count(self):
+        return sum(len(snapshot.names) for snapshot in self.dirs.values())
+    
+    def _add_directory(self, path, now, events, report=True):
+        """Start watching a directory (not its subdirectories); returns its snapshot"""
+        snapshot = DirSnapshot(self.min_interval)
+        try:
+            scan_directory(path, snapshot)
+        except OSError:
+            return None
+        self.dirs[path] = snapshot
+        self._schedule(path, snapshot, now)
+        if report:
+            events.extend((CREATED, os.path.join(path, name)) for name in snapshot.names)
+        return snapshot
+    
+    def _schedule(self, path, snapshot, now):
+        heapq.heappush(self.queue, (now + snapshot.interval, next(self.sequence), path, snapshot))
+    
+    def _add_tree(self, top, now, events, report=True):
+        """Start watching a new directory and everything below it"""
+        # Descend through the subdirectories each snapshot found, so every
+        # directory is listed once
+        stack = [top]
+        while stack:
+            path = stack.pop()
+            if path in self.dirs:
+                continue
+            snapshot = self._add_directory(path, now, events, report)
+            if snapshot is not None:
+                stack.extend(reversed(snapshot.subdirs))
+    
+    def _remove_tree(self, top, events):
+        """Forget a directory that disappeared, reporting its files deleted"""
+        snapshot = self.dirs.pop(top, None)
+        if snapshot is None:
+            return
+        events.extend((DELETED, os.path.join(top, name)) for name in snapshot.names)
+        for subdir in snapshot.subdirs:
+            self._remove_tree(subdir, events)
+    
+    def time_until_due(self):
+        """Seconds until the next directory is due for a poll"""
+        if not self.queue:
+            return self.max_interval
+        return max(0.0, self.queue[0][0] - time.monotonic())
+    
+    def read(self):
+        """Poll every directory that is due, return the changes found"""
+        now = time.monotonic()
+        events = []
+        while self.queue and self.queue[0][0] <= now:
+            _, _, path, snapshot = heapq.heappop(self.queue)
+            if self.dirs.get(path) is not snapshot:
+                continue   # removed (or replaced) since it was scheduled
+            changed = self._poll_directory(path, snapshot, now, events)
+            if self.dirs.get(path) is not snapshot:
+                continue
+            if changed:
+                snapshot.interval = max(self.min_interval, snapshot.interval / 2)
+            else:
+                snapshot.interval = min(self.max_interval, snapshot.interval * BACKOFF)
+            self._schedule(path, snapshot, now)
+        return events
+    
+    def _poll_directory(self, path, snapshot, now, events):
+        """Check one directory, append its changes, return whether it changed"""
+        self.stats["polls"] += 1
+        try:
+            key = _dir_key(os.stat(path))
+        except OSError:
+            self._remove_tree(path, events)
+            return True
+        
+        if key != snapshot.key:
+            return self._rescan(path, snapshot, now, events)
+        
+        # Same listing: compare the freshly stat'ed columns in bulk
+        ino, size, mtime = restat_columns(path, snapshot.names)
+        self.stats["stats"] += len(snapshot.names)
+        if mtime == snapshot.mtime and size == snapshot.size and ino == snapshot.ino:
+            return False
+        
+        names = snapshot.names
+        for i in range(len(names)):
+            if size[i] < 0:
+                # Gone without the directory changing yet: rescan next time
+                snapshot.key = None
+            elif (mtime[i] != snapshot.mtime[i] or size[i] != snapshot.size[i]
+                    or ino[i] != snapshot.ino[i]):
+                events.append((MODIFIED, os.path.join(path, names[i])))
+        snapshot.ino = ino
+        snapshot.size = size
+        snapshot.mtime = mtime
+        return True
+    
+    def _rescan(self, path, snapshot, now, events):
+        """List a directory whose entries changed and diff it by name"""
+        self.stats["rescans"] += 1
+        old_index = {name: i for i, name in enumerate(snapshot.names)}
+        old = (snapshot.ino, snapshot.size, snapshot.mtime)
+        old_subdirs = set(snapshot.subdirs)
+        try:
+            scan_directory(path, snapshot)
+        except OSError:
+            self._remove_tree(path, events)
+            return True
+        self.stats["stats"] += len(snapshot.names)
+        
+        for i, name in enumerate(snapshot.names):
+            j = old_index.pop(name, None)
+            if j is None:
+                events.append((CREATED, os.path.join(path, name)))
+            elif (snapshot.mtime[i] != old[2][j] or snapshot.size[i] != old[1][j]
+                    or snapshot.ino[i] != old[0][j]):
+                events.append((MODIFIED, os.path.join(path, name)))
+        events.extend((DELETED, os.path.join(path, name)) for name in old_index)
+        
+        new_subdirs = set(snapshot.subdirs)
+        for subdir in old_subdirs - new_subdirs:
+            self._remove_tree(subdir, events)
+        for subdir in new_subdirs - old_subdirs:
+            self._add_tree(subdir, now, events)
+        return True
+    
+    def close(self):
+        self.dirs.clear()
+        self.queue.clear()
@@ -0,0 +1,83 @@
+"""
+fsctl Tests
+===========
+Runs the command line the way a shell would, in a scratch directory.
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+import subprocess
+
+FSCTL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fsctl.py")
+
+def fsctl(cwd, *args):
+    """Run fsctl in-process (no daemon); return (exit status, stdout, stderr)"""
+    env = dict(os.environ)
+    env.pop("FSCTL_SOCKET", None)
+    proc = subprocess.run([sys.executable, FSCTL, *args], cwd=cwd, env=env,
+                          capture_output=True, text=True)
+    return proc.returncode, proc.stdout, proc.stderr
+
+class TrailingSlashTest(unittest.TestCase):
+    """Shell completion adds a trailing slash to directory names"""
+    
+    def setUp(self):
+        self.work = tempfile.TemporaryDirectory()
+        self.cwd = self.work.name
+        os.makedirs(os.path.join(self.cwd, "fi", "sub"))
+        for name in ("a.txt", os.path.join("sub", "b.txt")):
+            with open(os.path.join(self.cwd, "fi", name), 'w') as f:
+                f.write("x")
+    
+    def tearDown(self):
+        self.work.cleanup()
+    
+    def test_scan(self):
+        status, out, err = fsctl(self.cwd, "scan", "fi/")
+        self.assertEqual((status, err), (0, ""))
+        self.assertEqual(sorted(out.splitlines()),
+                         ["fi/", "fi/a.txt", "fi/sub/", "fi/sub/b.txt"])
+    
+    def test_find(self):
+        status, out, err = fsctl(self.cwd, "find", "fi/", "--ext", ".txt")
+        self.assertEqual((status, err), (0, ""))
+        self.assertEqual(sorted(out.splitlines()), ["fi/a.txt", "fi/sub/b.txt"])
+    
+    def test_saved_index(self):
+        index = os.path.join(self.cwd, "fi.idx")
+        self.assertEqual(fsctl(self.cwd, "scan", "fi/", "--index", index)[0], 0)
+        status, out, _ = fsctl(self.cwd, "find", "fi", "--index", index, "--name", "b.*")
+        self.assertEqual((status, out), (0, "fi/sub/b.txt\n"))
+
+class SavedIndexTest(unittest.TestCase):
+    """A saved index answers size and age queries like a fresh scan"""
+    
+    def setUp(self):
+        self.work = tempfile.TemporaryDirectory()
+        self.cwd = self.work.name
+        os.makedirs(os.path.join(self.cwd, "tree"))
+        for name, size in (("small", 10), ("big", 1000)):
+            with open(os.path.join(self.cwd, "tree", name), 'w') as f:
+                f.write("x" * size)
+        # Old enough that the directory is trusted without a rescan
+        os.utime(os.path.join(self.cwd, "tree"), (1, 1))
+    
+    def tearDown(self):
+        self.work.cleanup()
+    
+    def test_file_rewritten_in_place(self):
+        index = os.path.join(self.cwd, "tree.idx")
+        self.assertEqual(fsctl(self.cwd, "scan", "tree", "--index", index)[0], 0)
+        # Writing to an existing file leaves its directory's mtime alone
+        with open(os.path.join(self.cwd, "tree", "small"), 'a') as f:
+            f.write("x" * 5000)
+        os.utime(os.path.join(self.cwd, "tree"), (1, 1))
+        status, out, _ = fsctl(self.cwd, "find", "tree", "--index", index, "--largest", "1")
+        self.assertEqual((status, out), (0, "tree/small\n"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,218 @@
+"""
+Directory Tree Cache
+====================
+Keeps directory listings on disk between runs, keyed by the directory path
+and validated against the directory's own (inode, mtime_ns, ctime_ns).
+Adding, removing or renaming an entry changes its parent directory's mtime,
+so an unchanged directory can be served from the cache with one stat
+instead of being listed again.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import collections
+
+import tree_walker
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_MEMORY_BYTES = 32 * 1024 * 1024
+
+# Directories changed this recently may change again within the same
+# timestamp tick, so their listings are not cached yet
+RACY_WINDOW_NS = 2 * 1_000_000_000
+
+# Entry kinds stored in the cache
+KIND_DIR = "d"
+KIND_FILE = "f"
+KIND_OTHER = "o"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    path TEXT PRIMARY KEY,
+    ino INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    ctime_ns INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS listings_lru ON listings (last_used);
+"""
+
+class CachedEntry:
+    """A DirEntry look-alike for listings served from the cache"""
+    
+    __slots__ = ("name", "path", "kind", "_stat")
+    
+    def __init__(self, dir_path, name, kind):
+        self.name = name
+        self.path = os.path.join(dir_path, name)
+        self.kind = kind
+        self._stat = None
+    
+    def is_dir(self, follow_symlinks=False):
+        return self.kind == KIND_DIR
+    
+    def is_file(self, follow_symlinks=True):
+        return self.kind == KIND_FILE
+    
+    def stat(self, follow_symlinks=True):
+        if self._stat is None:
+            self._stat = os.stat(self.path, follow_symlinks=follow_symlinks)
+        return self._stat
+    
+    def __repr__(self):
+        return f"<CachedEntry {self.name!r}>"
+
+class TreeCache:
+    """Persistent cache of directory listings with LRU eviction.
+
+    max_bytes bounds the listings kept on disk, memory_bytes the decoded
+    listings kept in memory. Every walk ends with sync(), which records the
+    listings it used, evicts down to max_bytes and commits, so a cache kept
+    open by a long-running process stays within its budget. Call close()
+    when done.
+    """
+    
+    def __init__(self, cache_path, max_bytes=DEFAULT_MAX_BYTES,
+                 memory_bytes=DEFAULT_MEMORY_BYTES):
+        self.conn = sqlite3.connect(cache_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.memory = collections.OrderedDict()  # path -> (key, listing, size)
+        self.memory_used = 0
+        self.touched = set()
+        self.hits = 0
+        self.misses = 0
+    
+    def listdir(self, path):
+        """Return [(name, kind), ...] for path, listing it only if it changed"""
+        st = os.stat(path)
+        key = (st.st_ino, st.st_mtime_ns, st.st_ctime_ns)
+        
+        cached = self.memory.get(path)
+        if cached is not None and cached[0] == key:
+            self.memory.move_to_end(path)
+            self.touched.add(path)
+            self.hits += 1
+            return cached[1]
+        
+        row = self.conn.execute(
+            "SELECT ino, mtime_ns, ctime_ns, data FROM listings WHERE path = ?",
+            (path,)).fetchone()
+        if row is not None and tuple(row[:3]) == key:
+            names, kinds = json.loads(row[3])
+            listing = list(zip(names, kinds))
+            self._remember(path, key, listing, len(row[3]))
+            self.touched.add(path)
+            self.hits += 1
+            return listing
+        
+        self.misses += 1
+        listing = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        kind = KIND_DIR
+                    elif entry.is_file():
+                        kind = KIND_FILE
+                    else:
+                        kind = KIND_OTHER
+                except OSError:
+                    kind = KIND_OTHER
+                listing.append((entry.name, kind))
+        
+        if time.time_ns() - max(st.st_mtime_ns, st.st_ctime_ns) > RACY_WINDOW_NS:
+            names = [name for name, _ in listing]
+            data = json.dumps([names, "".join(kind for _, kind in listing)],
+                              separators=(",", ":"))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, *key, data, len(data), time.time_ns()))
+            self._remember(path, key, listing, len(data))
+        return listing
+    
+    def _remember(self, path, key, listing, size):
+        """Keep a decoded listing in the in-memory LRU"""
+        old = self.memory.pop(path, None)
+        if old is not None:
+            self.memory_used -= old[2]
+        self.memory[path] = (key, listing, size)
+        self.memory_used += size
+        while self.memory_used > self.memory_bytes and len(self.memory) > 1:
+            _, (_, _, evicted) = self.memory.popitem(last=False)
+            self.memory_used -= evicted
+    
+    def walk(self, top=".", max_depth=None, on_error=None):
+        """Walk like tree_walker.walk, serving unchanged directories from cache"""
+        try:
+            yield from self._walk(top, max_depth, on_error)
+        finally:
+            self.sync()
+    
+    def _walk(self, top, max_depth, on_error):
+        stack = [(top, 0)]
+        while stack:
+            path, depth = stack.pop()
+            if max_depth is not None and depth > max_depth:
+                continue
+            try:
+                listing = self.listdir(path)
+            except OSError as e:
+                if on_error is not None:
+                    on_error(path, depth, e)
+                continue
+            
+            yield tree_walker.DIR, depth, path, None
+            subdirs = []
+            for name, kind in listing:
+                if kind == KIND_DIR:
+                    subdirs.append(os.path.join(path, name))
+                elif kind == KIND_FILE:
+                    yield tree_walker.FILE, depth, path, CachedEntry(path, name, kind)
+                else:
+                    yield tree_walker.OTHER, depth, path, CachedEntry(path, name, kind)
+            for subdir in reversed(subdirs):
+                stack.append((subdir, depth + 1))
+    
+    def evict(self):
+        """Drop least recently used listings until the disk budget is met"""
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM listings").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        excess = total - self.max_bytes * 0.9
+        victims = []
+        for path, size in self.conn.execute(
+                "SELECT path, size FROM listings ORDER BY last_used"):
+            if excess <= 0:
+                break
+            victims.append((path,))
+            excess -= size
+        self.conn.executemany("DELETE FROM listings WHERE path = ?", victims)
+        return len(victims)
+    
+    def sync(self):
+        """Record which listings were used, evict, and commit"""
+        now = time.time_ns()
+        self.conn.executemany("UPDATE listings SET last_used = ? WHERE path = ?",
+                              ((now, path) for path in self.touched))
+        self.touched.clear()
+        self.evict()
+        self.conn.commit()
+    
+    def close(self):
+        """Persist the run's changes and close the store"""
+        self.sync()
+        self.conn.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,165 @@
+"""
+Tree Render
+===========
+Streams tree_walker events to a text stream in one of four formats:
+
+    plain     one path per line, directories with a trailing separator
+    tree      names indented by depth, like the exercise scanners print
+    ndjson    one JSON object per entry: {"type", "depth", "path"[, "size"]}
+    null      paths separated by NUL bytes, for xargs -0 and similar tools
+
+Events are formatted as they arrive and nothing is kept per directory, so
+a directory with millions of entries costs no more memory than a small
+one. Lines are collected and written in batches of BATCH_LINES with one
+write() call each, instead of one print() (and, on a terminal, one flush)
+per entry. Listing errors go into the stream as "error:" lines (tree and
+plain) or {"type": "error"} objects (ndjson); the null format keeps its
+output clean and writes them to a separate errors stream.
+"""
+
+import os
+import sys
+
+import lazy_modules
+import tree_walker
+
+# Only the ndjson format needs it
+json = lazy_modules.load("json")
+
+FORMATS = ("plain", "tree", "ndjson", "null")
+# Entries formatted before they are written out in one call
+BATCH_LINES = 16384
+_COUNTERS = {tree_walker.DIR: "dirs", tree_walker.FILE: "files", tree_walker.OTHER: "other"}
+
+class TreeWriter:
+    """Formats walk events into batched writes on out.
+
+    With sizes=True, files also show their size (tree and ndjson); files
+    that cannot be stat'ed are reported as errors and skipped. icons=True
+    decorates the tree format the way the exercises print trees. shown,
+    if given, maps each directory path to the form it is printed in;
+    file paths follow their directory's.
+    """
+    
+    def __init__(self, out=None, fmt="plain", sizes=False, icons=False, errors=None,
+                 shown=None):
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown output format: {fmt}")
+        self.out = sys.stdout if out is None else out
+        self.errors = errors
+        self.sizes = sizes
+        self.icons = icons
+        self.shown = shown or (lambda path: path)
+        self.dir_path = None     # the directory of the last event, and
+        self.dir_prefix = None   # how it is printed, with a trailing separator
+        self.format_event = getattr(self, f"_format_{fmt}")
+        if fmt == "ndjson":
+            # The C string escaper; json.dumps per entry is several times slower
+            self.quote = json.encoder.encode_basestring_ascii
+        self.fmt = fmt
+        self.lines = []
+        self.stats = {"dirs": 0, "files": 0, "other": 0, "errors": 0}
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.flush()
+    
+    def write_event(self, kind, depth, path, entry):
+        """Format one (kind, depth, path, entry) event from tree_walker"""
+        try:
+            line = self.format_event(kind, depth, path, entry)
+        except OSError as e:
+            self.error(entry.path, depth, e)
+            return
+        self.lines.append(line)
+        self.stats[_COUNTERS[kind]] += 1
+        if len(self.lines) >= BATCH_LINES:
+            self.flush()
+    
+    def write_events(self, events):
+        """Format every event of an iterable, consuming it lazily"""
+        write_event = self.write_event
+        for kind, depth, path, entry in events:
+            write_event(kind, depth, path, entry)
+        self.flush()
+        return self.stats
+    
+    def error(self, path, depth, error):
+        """Report a listing or stat error; usable as a walker's on_error"""
+        self.stats["errors"] += 1
+        if self.fmt == "ndjson":
+            self.lines.append(f'{{"type": "error", "depth": {depth}, '
+                              f'"path": {self.quote(self.shown(path))}, '
+                              f'"error": {self.quote(str(error))}}}\n')
+        elif self.fmt == "null":
+            self.flush()
+            (self.errors or sys.stderr).write(f"error: {self.shown(path)}: {error}\n")
+        elif self.fmt == "tree" and self.icons:
+            self.lines.append(f"{'  ' * depth}❌ {self.shown(path)}: {error}\n")
+        else:
+            self.lines.append(f"{'  ' * depth if self.fmt == 'tree' else ''}"
+                              f"error: {self.shown(path)}: {error}\n")
+    
+    def write(self, text):
+        """Add free text (a heading, a summary) in order with the entries"""
+        self.lines.append(text)
+        return len(text)
+    
+    def flush(self):
+        if self.lines:
+            self.out.write("".join(self.lines))
+            self.lines = []
+        self.out.flush()
+    
+    def _prefix(self, path):
+        # Computed once per directory, not once per entry
+        if path is not self.dir_path:
+            self.dir_path = path
+            self.dir_prefix = self.shown(path).rstrip(os.sep) + os.sep
+        return self.dir_prefix
+    
+    def _format_plain(self, kind, depth, path, entry):
+        if kind == tree_walker.DIR:
+            return f"{self._prefix(path)}\n"
+        return f"{self._prefix(path)}{entry.name}\n"
+    
+    def _format_null(self, kind, depth, path, entry):
+        if kind == tree_walker.DIR:
+            return f"{self._prefix(path)}\0"
+        return f"{self._prefix(path)}{entry.name}\0"
+    
+    def _format_tree(self, kind, depth, path, entry):
+        indent = "  " * depth
+        if kind == tree_walker.DIR:
+            prefix = self._prefix(path)
+            name = os.path.basename(prefix[:-1]) or prefix
+            return f"{indent}📁 {name}/\n" if self.icons else f"{indent}{name}/\n"
+        icon = "📄 " if self.icons and kind == tree_walker.FILE else ""
+        if self.sizes and kind == tree_walker.FILE:
+            return f"{indent}  {icon}{entry.name} ({entry.stat().st_size} bytes)\n"
+        return f"{indent}  {icon}{entry.name}\n"
+    
+    def _format_ndjson(self, kind, depth, path, entry):
+        if kind == tree_walker.DIR:
+            return f'{{"type": "dir", "depth": {depth}, "path": {self.quote(self.shown(path))}}}\n'
+        file_path = self.quote(self._prefix(path) + entry.name)
+        if self.sizes and kind == tree_walker.FILE:
+            return (f'{{"type": "file", "depth": {depth}, "path": {file_path}, '
+                    f'"size": {entry.stat().st_size}}}\n')
+        return f'{{"type": "{kind}", "depth": {depth}, "path": {file_path}}}\n'
+
+def render(top=".", out=None, fmt="plain", max_depth=None, sizes=False, workers=1):
+    """Walk top and write it to out (default sys.stdout); returns the counts
+
+    With workers > 1 the tree is listed by tree_walker.parallel_walk, in
+    the same order.
+    """
+    writer = TreeWriter(out, fmt, sizes)
+    if workers > 1:
+        events = tree_walker.parallel_walk(top, max_depth, writer.error, workers=workers,
+                                           ordered=True)
+    else:
+        events = tree_walker.walk(top, max_depth, writer.error)
+    return writer.write_events(events)
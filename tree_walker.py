@@ -0,0 +1,283 @@
+"""
+Tree Walker
+===========
+A lazy directory walker built on os.scandir. It reuses the file type that
+scandir already got from the kernel (no isfile/isdir stat per entry), walks
+with an explicit stack instead of recursion and yields entries one by one.
+parallel_walk() lists directories on several threads for high-latency
+filesystems such as NFS.
+"""
+
+import os
+import threading
+import collections
+
+# Kinds of events produced by walk()
+DIR = "dir"
+FILE = "file"
+OTHER = "other"
+
+# Directories parallel_walk() starts ahead of its output
+MAX_READY = 1024
+# Events per batch handed from a parallel_walk worker to the output, and
+# batches of one directory held before its worker waits for them to go out
+LISTING_BATCH = 1024
+LISTING_BATCHES_AHEAD = 4
+
+def walk(top=".", max_depth=None, on_error=None, follow_symlinks=False):
+    """Walk a tree depth-first, yielding (kind, depth, path, entry) tuples.
+
+    For every directory that could be listed a (DIR, depth, path, None)
+    event comes first, then (FILE, depth, path, entry) for its files and
+    (OTHER, ...) for anything else, then its subdirectories. Directories
+    deeper than max_depth are not listed. Listing errors are passed to
+    on_error(path, depth, error) and the walk continues.
+    """
+    stack = [(top, 0)]
+    while stack:
+        path, depth = stack.pop()
+        if max_depth is not None and depth > max_depth:
+            continue
+        
+        try:
+            entries = os.scandir(path)
+        except OSError as e:
+            if on_error is not None:
+                on_error(path, depth, e)
+            continue
+        
+        subdirs = []
+        with entries:
+            yield DIR, depth, path, None
+            while True:
+                try:
+                    entry = next(entries)
+                except StopIteration:
+                    break
+                except OSError as e:
+                    if on_error is not None:
+                        on_error(path, depth, e)
+                    break
+                
+                try:
+                    if entry.is_dir(follow_symlinks=follow_symlinks):
+                        subdirs.append(entry.path)
+                    elif entry.is_file():
+                        yield FILE, depth, path, entry
+                    else:
+                        yield OTHER, depth, path, entry
+                except OSError:
+                    yield OTHER, depth, path, entry
+        
+        # Reversed so the subdirectories are visited in listing order
+        for subdir in reversed(subdirs):
+            stack.append((subdir, depth + 1))
+
+def iter_files(top=".", max_depth=None, on_error=None):
+    """Yield the DirEntry of every regular file under top"""
+    for kind, _, _, entry in walk(top, max_depth, on_error):
+        if kind == FILE:
+            yield entry
+
+def _scan_batches(path, depth, list_subdirs, follow_symlinks, subdirs):
+    """Yield the events of one directory in lists of up to LISTING_BATCH.
+
+    Subdirectories to descend into are appended to subdirs. A listing
+    error is raised after the batches read before it.
+    """
+    with os.scandir(path) as entries:
+        batch = [(DIR, depth, path, None)]
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=follow_symlinks):
+                    if list_subdirs:
+                        subdirs.append(entry.path)
+                    continue
+                kind = FILE if entry.is_file() else OTHER
+            except OSError:
+                kind = OTHER
+            batch.append((kind, depth, path, entry))
+            if len(batch) >= LISTING_BATCH:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+class _Listing:
+    """One directory of a parallel_walk, handed over in batches as it is read"""
+    
+    __slots__ = ("path", "depth", "batches", "subdirs", "done", "error", "changed")
+    
+    def __init__(self, path, depth, lock):
+        self.path = path
+        self.depth = depth
+        self.batches = collections.deque()
+        self.subdirs = []
+        self.done = False
+        self.error = None
+        # Signalled when a batch is added or taken, and when the listing ends
+        self.changed = threading.Condition(lock)
+
+def parallel_walk(top=".", max_depth=None, on_error=None, workers=8, ordered=False,
+                  follow_symlinks=False, max_ready=MAX_READY):
+    """Walk a tree with a pool of threads listing directories concurrently.
+
+    Yields the same (kind, depth, path, entry) events as walk(). With
+    ordered=True they come out in exactly the order walk() would produce;
+    otherwise directories come out in the order they were started. Each
+    worker takes work from its own deque and steals from the others when
+    it runs dry. Errors are passed to on_error(path, depth, error) from
+    the calling thread.
+    
+    Memory stays bounded however large the tree or a single directory is:
+    a listing is handed over in batches of LISTING_BATCH events, and its
+    worker waits once LISTING_BATCHES_AHEAD of them have not been yielded
+    yet. No more than max_ready directories are started ahead of the
+    output; when ordered output needs one nobody has started, the calling
+    thread lists it itself.
+    """
+    lock = threading.Lock()
+    work_ready = threading.Condition(lock)       # a task or a free slot appeared
+    listing_started = threading.Condition(lock)  # for unordered output
+    deques = [collections.deque() for _ in range(workers)]
+    deques[0].append((top, 0))
+    listings = {}                   # path -> _Listing started and not yet yielded
+    started = collections.deque()   # the same listings in start order (unordered)
+    # pending: directories queued or being listed
+    state = {"pending": 1, "stop": False}
+    
+    def take(index):
+        try:
+            return deques[index].pop()
+        except IndexError:
+            pass
+        # Steal the oldest (shallowest) directory from another worker
+        for offset in range(1, workers):
+            try:
+                return deques[(index + offset) % workers].popleft()
+            except IndexError:
+                continue
+        return None
+    
+    def finish(listing, index):
+        """Queue a listed directory's subdirectories; called with the lock held"""
+        listing.done = True
+        listing.changed.notify_all()
+        depth = listing.depth + 1
+        deques[index].extend((subdir, depth) for subdir in reversed(listing.subdirs))
+        state["pending"] += len(listing.subdirs) - 1
+        if listing.subdirs or state["pending"] == 0:
+            work_ready.notify_all()
+            listing_started.notify_all()
+    
+    def read(listing):
+        list_subdirs = max_depth is None or listing.depth < max_depth
+        return _scan_batches(listing.path, listing.depth, list_subdirs, follow_symlinks,
+                             listing.subdirs)
+    
+    def next_listing(index):
+        with lock:
+            while not state["stop"] and state["pending"]:
+                task = take(index) if len(listings) < max_ready else None
+                if task is not None:
+                    listing = _Listing(*task, lock)
+                    listings[listing.path] = listing
+                    if not ordered:
+                        started.append(listing)
+                        listing_started.notify()
+                    return listing
+                work_ready.wait()
+            return None
+    
+    def worker(index):
+        while True:
+            listing = next_listing(index)
+            if listing is None:
+                return
+            try:
+                for batch in read(listing):
+                    with lock:
+                        while len(listing.batches) >= LISTING_BATCHES_AHEAD and not state["stop"]:
+                            listing.changed.wait()
+                        if state["stop"]:
+                            return
+                        listing.batches.append(batch)
+                        listing.changed.notify_all()
+            except Exception as e:
+                listing.error = e
+            with lock:
+                finish(listing, index)
+    
+    def drain(listing):
+        """Yield a started listing's events as its worker hands them over"""
+        while True:
+            with lock:
+                while not listing.batches and not listing.done:
+                    listing.changed.wait()
+                if not listing.batches:
+                    del listings[listing.path]
+                    work_ready.notify()
+                    break
+                batch = listing.batches.popleft()
+                listing.changed.notify_all()
+            yield from batch
+        if listing.error is not None and on_error is not None:
+            on_error(listing.path, listing.depth, listing.error)
+    
+    def list_here(path, depth):
+        """List a directory no worker has started, in the calling thread"""
+        listing = _Listing(path, depth, lock)
+        try:
+            for batch in read(listing):
+                yield from batch
+        except Exception as e:
+            listing.error = e
+        with lock:
+            finish(listing, 0)
+        if listing.error is not None and on_error is not None:
+            on_error(path, depth, listing.error)
+        return listing
+    
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True)
+               for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    
+    try:
+        if not ordered:
+            while True:
+                with lock:
+                    while not started and state["pending"]:
+                        listing_started.wait()
+                    if not started:
+                        return
+                    listing = started.popleft()
+                yield from drain(listing)
+        
+        # Ordered: replay the depth-first order of walk()
+        stack = [(top, 0)]
+        while stack:
+            path, depth = stack.pop()
+            with lock:
+                listing = listings.get(path)
+                if listing is None:
+                    # Not started yet: take it away from the workers
+                    for tasks in deques:
+                        try:
+                            tasks.remove((path, depth))
+                            break
+                        except ValueError:
+                            continue
+            if listing is None:
+                listing = yield from list_here(path, depth)
+            else:
+                yield from drain(listing)
+            stack.extend((subdir, depth + 1) for subdir in reversed(listing.subdirs))
+    finally:
+        with lock:
+            state["stop"] = True
+            work_ready.notify_all()
+            for listing in listings.values():
+                listing.changed.notify_all()
+        for thread in threads:
+            thread.join()